@@ -0,0 +1,141 @@
+import config_log
+import logging
+import time
+import cv2
+import face
+from config import config_pi_camera
+
+# Detection settings from most to least detailed. 'scale' is applied to
+# the gray image before the cascade runs.
+LEVELS = ({'scale': 1.0, 'scale_factor': 1.1},
+          {'scale': 1.0, 'scale_factor': 1.3},
+          {'scale': 0.75, 'scale_factor': 1.3},
+          {'scale': 0.5, 'scale_factor': 1.3},
+          {'scale': 0.5, 'scale_factor': 1.5})
+
+
+class AdaptiveDetector():
+    """Face detector that keeps detection time within a frame time budget.
+    It moves along LEVELS (downscaling the image and coarsening the
+    cascade's scaleFactor) when the moving average of detection time goes
+    over the budget, and back when the finer level last fitted in the
+    budget. Levels that would shrink the last face seen below min_face
+    pixels are skipped, and the pyramid is cut short around that face's
+    size. Every change of level is logged.
+
+    Call it like face.detect(); it returns boxes in frame coordinates.
+
+    """
+    def __init__(self, budget=None, levels=LEVELS, level=1, alpha=0.2,
+                 cooldown=10, probe_every=300, min_face=40,
+                 size_range=(0.5, 2.0), min_neighbors=5,
+                 detector=face.detect):
+        """
+        Args:
+        budget (float): Seconds per detection to aim for. Defaults to one
+        frame at config_pi_camera['framerate'].
+        levels (tuple): Detection settings, see LEVELS.
+        level (int): Index of the starting level.
+        alpha (float): Weight of the newest time in the moving average.
+        cooldown (int): Frames to wait after a change before the next.
+        probe_every (int): Frames after which the times measured at other
+        levels are forgotten, so finer levels get tried again.
+        min_face (int): Smallest face (pixels, after downscaling) to
+        allow for.
+        size_range (tuple): Smallest and largest face searched for, as
+        fractions of the last face seen.
+        min_neighbors (int): minNeighbors of detectMultiScale.
+        detector (callable): Called like face.detect(), e.g. a backend
+        from detectors.py.
+
+        """
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.DEBUG)
+        self.budget = budget or 1 / config_pi_camera['framerate']
+        self.levels = levels
+        self.level = level
+        self.alpha = alpha
+        self.cooldown = cooldown
+        self.probe_every = probe_every
+        self.min_face = min_face
+        self.size_range = size_range
+        self.min_neighbors = min_neighbors
+        self.detector = detector
+        self.averages = dict()  # level --> moving average of detection time
+        self.since_change = 0
+        self.since_probe = 0
+        self.last_size = None  # side of the last face seen (pixels)
+
+    def set_level(self, level, reason):
+        self.logger.info('Detection level {} --> {} ({}, average {:.1f} ms, '
+                         'budget {:.1f} ms): {}'.format(
+                             self.level, level, reason,
+                             self.averages[self.level] * 1000,
+                             self.budget * 1000, self.levels[level]))
+        self.level = level
+        self.since_change = 0
+
+    def allowed(self, level):
+        """Whether level keeps the last face seen at least min_face big."""
+        return (self.last_size is None or
+                self.last_size * self.levels[level]['scale'] >= self.min_face)
+
+    def adapt(self, elapsed):
+        """Updates the moving average of the current level with elapsed and
+        changes level if needed."""
+        average = self.averages.get(self.level)
+        average = elapsed if average is None else (
+            average + self.alpha * (elapsed - average))
+        self.averages[self.level] = average
+        self.since_change += 1
+        self.since_probe += 1
+        if self.since_probe >= self.probe_every:
+            self.averages = {self.level: average}
+            self.since_probe = 0
+
+        if self.level > 0 and not self.allowed(self.level):
+            finer = [level for level in range(self.level)
+                     if self.allowed(level)]
+            self.set_level(finer[-1] if finer else 0, 'face too small')
+        elif self.since_change < self.cooldown:
+            return
+        elif average > self.budget:
+            coarser = [level for level in range(self.level + 1,
+                                                len(self.levels))
+                       if self.allowed(level)]
+            if coarser:
+                self.set_level(coarser[0], 'over budget')
+        elif self.level > 0:
+            finer = self.averages.get(self.level - 1)
+            if finer is None or finer < self.budget:
+                self.set_level(self.level - 1, 'under budget')
+
+    def __call__(self, image, min_size=None, max_size=None):
+        """Detects faces in image (BGR or gray). min_size and max_size
+        ((w, h), in image pixels) override the sizes worked out from the
+        last face seen.
+
+        """
+        t0 = time.perf_counter()
+        settings = self.levels[self.level]
+        scale = settings['scale']
+        gray = (cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3
+                else image)
+        if scale != 1.0:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale,
+                              interpolation=cv2.INTER_AREA)
+        if min_size is None and self.last_size is not None:
+            low, high = self.size_range
+            min_size = (int(self.last_size * low),) * 2
+            max_size = (int(self.last_size * high),) * 2
+        faces = self.detector(
+            gray, settings['scale_factor'], self.min_neighbors,
+            min_size and tuple(int(side * scale) for side in min_size),
+            max_size and tuple(int(side * scale) for side in max_size))
+        faces = [tuple(int(value / scale) for value in dims)
+                 for dims in faces]
+        # Keep searching all sizes whenever no face is found
+        self.last_size = (max(max(dims[2], dims[3]) for dims in faces)
+                          if faces else None)
+        self.adapt(time.perf_counter() - t0)
+        return faces
@@ -1,58 +1,78 @@
 import config_log
 import logging
-import time
 import servos
+import motion
+import clocks
 
 
 class Arm():
     """Class for arm of CARM."""
-    def __init__(self, config):
+    def __init__(self, config, clock=None):
         """Args: config (dict): Dict with configuration for each of the four
         servos that make up the arm.
+        clock (RealClock or VirtualClock): Clock to sleep on. Defaults to
+        clocks.get_clock().
 
         """
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.DEBUG)
-        self.gripper = servos.ServoMotor(config['gripper'])
-        self.right = servos.ServoMotor(config['right'])
+        self.clock = clock or clocks.get_clock()
+        self.gripper = servos.ServoMotor(config['gripper'], self.clock)
+        self.right = servos.ServoMotor(config['right'], self.clock)
         # Disable base and left servos until finished with rest of arm.
         # self.left = servos.ServoMotor(config['left'])
         # self.base = servos.ServoMotor(config['base'])
         # self.servo_list = (self.gripper, self.left, self.right, self.base)
         self.servo_list = (self.gripper, self.right)
 
-    def grab(self):
+    def grab(self, duration=0.25, settle_time=0.25):
         """Moves the robotic arm forwards to grab (close an open gripper) an
         object and then rectracts the arm for a subsequent dropoff
-        (open a closed gripper).
+        (open a closed gripper). Opening the gripper and retracting the
+        arm at the start happen together.
+
+        Args:
+        duration (float): Time in seconds for each step of the grab.
+        settle_time (float): Pause in seconds after each step.
+
+        Returns:
+        None
 
         """
         dropoff = self.right.config['min_pl']
-        pickup = self.right.config['max_pl']
-        speed = 0.00005
         try:
-            self.gripper.sweep(300, speed)
-            time.sleep(1)
-            self.right.sweep(dropoff, speed)
-            time.sleep(1)
-            self.gripper.sweep(300, speed)
-            time.sleep(1)
-            self.right.sweep(pickup, speed)
-            time.sleep(1)
-            self.gripper.sweep(135, speed)
-            time.sleep(1)
-            self.right.sweep(dropoff, speed)
-            time.sleep(1)
-            self.gripper.sweep(300, speed)
-            time.sleep(1)
+            for step in self.grab_steps():
+                motion.move_together([(servo, end_pl, duration)
+                                      for servo, end_pl in step],
+                                     clock=self.clock)
+                self.clock.sleep(settle_time)
         except KeyboardInterrupt:
-            self.right.sweep(dropoff)
+            self.right.move(dropoff)
+
+    def grab_steps(self):
+        """Steps of Arm.grab(), each a tuple of (servo, end_pl) moved
+        together."""
+        dropoff = self.right.config['min_pl']
+        pickup = self.right.config['max_pl']
+        return (((self.gripper, 300), (self.right, dropoff)),
+                ((self.right, pickup),),
+                ((self.gripper, 135),),
+                ((self.right, dropoff),),
+                ((self.gripper, 300),))
+
+    def power_off_goals(self):
+        """Goals for motion.move_together() that return every servo of the
+        arm to its power on position.
+
+        """
+        return [(servo, servo.config['pow_pl'], None)
+                for servo in self.servo_list]
 
     def power_off(self):
-        """Quick power way to run power_off for each of the 4 servos.
+        """Returns all of the arm's servos to their power on positions at
+        the same time.
         """
-        for servo in self.servo_list:
-            servo.power_off()
+        motion.move_together(self.power_off_goals(), clock=self.clock)
 
     def open_gripper(self):
         self.gripper.sweep(self.gripper.config['max_pl'])
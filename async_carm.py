@@ -0,0 +1,325 @@
+"""asyncio facade over Carm. Every motion is a coroutine that sleeps with
+asyncio instead of blocking its thread, so it can be cancelled between
+control ticks, and motions of different subsystems (car, arm, camera) run
+at the same time in one event loop. Sensors are read in a thread pool so
+the loop stays responsive.
+
+    robot = AsyncCarm(carm.Carm(config.config_carm))
+    robot.start('car', robot.drive(1, 2))  # drive for 2 s...
+    robot.start('arm', robot.grab())       # ...while grabbing
+    robot.start('car', robot.point_turn(1, 0.5))  # pre-empts the drive
+
+Timing follows the event loop's clock, not robot.clock. Commands with no
+coroutine version run in a thread pool and can't be cancelled once they
+have started; a motion started on the same subsystem waits for them.
+
+"""
+import config_log
+import logging
+import asyncio
+import motion
+import servos
+
+
+async def sleep_until(deadline):
+    """Sleeps until the event loop's time reaches deadline."""
+    loop = asyncio.get_running_loop()
+    await asyncio.sleep(max(deadline - loop.time(), 0))
+
+
+async def play(moves):
+    """Coroutine version of motion.play()."""
+    t0 = asyncio.get_running_loop().time()
+    for tick, updates in motion.schedule(moves):
+        await sleep_until(t0 + tick / motion.trajectory.CONTROL_RATE)
+        motion.apply(updates)
+
+
+class AsyncCarm():
+    """Runs a Carm's actions as asyncio tasks, one task per subsystem. A new
+    action started on a subsystem cancels the one running there (the
+    new one carries on from wherever the old one left the motors). If the
+    subsystem is busy with a command running in a thread, the new action
+    waits for it instead, so two moves never drive the same servo.
+
+    A car task that is cancelled without being pre-empted (cancel(),
+    stop(), or the event loop shutting down) brakes.
+
+    """
+    SUBSYSTEMS = ('car', 'arm', 'cam', 'sensors')
+
+    def __init__(self, robot):
+        """
+        Args:
+        robot (Carm): Robot to drive.
+
+        """
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.DEBUG)
+        self.robot = robot
+        self.car = robot.car
+        self.arm = robot.arm
+        self.cam = robot.cam
+        self.tasks = dict()  # subsystem --> running asyncio.Task
+        self.threads = dict()  # subsystem --> Future of a command in a thread
+
+    def start(self, subsystem, coro):
+        """Runs coro as the subsystem's task, cancelling the task running
+        there before.
+
+        Returns:
+        asyncio.Task: Await it to wait for the action to finish.
+
+        """
+        previous = self.tasks.get(subsystem)
+        if previous is not None and not previous.done():
+            self.logger.debug('Pre-empting {} task'.format(subsystem))
+            previous.cancel()
+        thread = self.threads.get(subsystem)
+        if thread is not None and not thread.done():
+            self.logger.debug('{} busy in a thread, waiting for it'.format(
+                subsystem))
+            coro = self.after(thread, coro)
+        if subsystem == 'car':
+            coro = self.braking(coro)
+        task = asyncio.ensure_future(coro)
+        self.tasks[subsystem] = task
+        return task
+
+    async def after(self, future, coro):
+        """Runs coro once future (a command running in a thread) is done."""
+        try:
+            await asyncio.wait([future])
+        except asyncio.CancelledError:
+            coro.close()
+            raise
+        return await coro
+
+    async def braking(self, coro):
+        """Runs coro, braking if it is cancelled by anything but a newer car
+        task."""
+        try:
+            return await coro
+        except asyncio.CancelledError:
+            if self.tasks.get('car') in (None, asyncio.current_task()):
+                self.car.brake()
+            raise
+
+    async def in_thread(self, subsystem, cmd):
+        """Runs cmd in the thread pool. It can't be cancelled: cancelling
+        only stops waiting for it."""
+        future = asyncio.get_running_loop().run_in_executor(None, cmd)
+        if subsystem is not None:
+            self.threads[subsystem] = future
+        return await asyncio.shield(future)  # done only once cmd returns
+
+    async def cancel(self, subsystem):
+        """Cancels the subsystem's task and waits for it to end, including a
+        command of the subsystem running in a thread. Cancelling the car's
+        task also brakes.
+
+        """
+        task = self.tasks.pop(subsystem, None)
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        thread = self.threads.pop(subsystem, None)
+        if thread is not None and not thread.done():
+            await asyncio.wait([thread])
+        if subsystem == 'car':
+            self.car.brake()
+
+    async def stop(self):
+        """Cancels every task and brakes."""
+        for subsystem in list(self.tasks):
+            await self.cancel(subsystem)
+        self.car.brake()
+
+    # Car
+
+    async def set_speeds(self, left, right):
+        """Coroutine version of Car.set_speeds()."""
+        with self.car.lock:
+            brakes = self.car.brakes
+        t0 = asyncio.get_running_loop().time()
+        for t, left_speed, right_speed in self.car.speed_ramp(left, right):
+            await sleep_until(t0 + t)
+            with self.car.lock:
+                if self.car.brakes != brakes:  # braked by the watchdog
+                    return
+                self.car.apply_speeds(left_speed, right_speed)
+
+    async def timed(self, left, right, run_time, num_runs=1,
+                    wait_interval=0.25):
+        """Runs the motors at (left, right) for run_time seconds (forever if
+        negative), num_runs times with a stop in between.
+
+        """
+        if run_time < 0:
+            await self.set_speeds(left, right)
+            return
+        for i in range(num_runs):
+            await self.set_speeds(left, right)
+            await asyncio.sleep(run_time)
+            await self.set_speeds(0, 0)
+            self.car.brake()
+            await asyncio.sleep(wait_interval if i < num_runs - 1 else 0)
+
+    async def drive(self, direction, drive_time=-1, speed=None):
+        """Coroutine version of Car.drive()."""
+        speed = self.car.speed if speed is None else speed
+        await self.timed(direction * speed, direction * speed, drive_time)
+
+    async def swing_turn(self, horizontal_direction, vertical_direction,
+                         turn_time=-1, num_turns=1, wait_interval=.25,
+                         speed=None):
+        """Coroutine version of Car.swing_turn()."""
+        speed = self.car.speed if speed is None else speed
+        speeds = [vertical_direction * speed, 0][::horizontal_direction]
+        await self.timed(*speeds, turn_time, num_turns, wait_interval)
+
+    async def point_turn(self, horizontal_direction, turn_time=-1,
+                         num_turns=1, wait_interval=.25, speed=None):
+        """Coroutine version of Car.point_turn()."""
+        speed = self.car.speed if speed is None else speed
+        speeds = [speed, -speed][::horizontal_direction]
+        await self.timed(*speeds, turn_time, num_turns, wait_interval)
+
+    async def brake(self):
+        self.car.brake()
+
+    # Servos
+
+    async def move(self, servo, end_pl, duration=None, shape='trapezoid'):
+        """Coroutine version of ServoMotor.move()."""
+        await play({servo: servo.plan(end_pl, duration, shape=shape)})
+
+    async def sweep(self, servo, end_pl, pause_time=0.005):
+        """Coroutine version of ServoMotor.sweep()."""
+        await self.move(servo, end_pl,
+                        abs(end_pl - servo.current_pl) * pause_time)
+
+    async def nudge(self, servo, dist_pl):
+        """Sweeps servo by dist_pl if that stays within its min/max pulse
+        lengths, like Arm.extend() and Cam.tilt()."""
+        if (servo.config['min_pl'] <= servo.current_pl + dist_pl <=
+                servo.config['max_pl']):
+            await self.sweep(servo, servo.current_pl + dist_pl)
+
+    async def extend(self, dist_pl):
+        """Coroutine version of Arm.extend()."""
+        await self.nudge(self.arm.right, dist_pl)
+
+    async def tilt(self, dist_pl):
+        """Coroutine version of Cam.tilt()."""
+        await self.nudge(self.cam, dist_pl)
+
+    async def move_together(self, goals, shape='trapezoid'):
+        """Coroutine version of motion.move_together()."""
+        await play(motion.together(goals, shape))
+
+    async def grab(self, duration=0.25, settle_time=0.25):
+        """Coroutine version of Arm.grab()."""
+        for step in self.arm.grab_steps():
+            await self.move_together([(servo, end_pl, duration)
+                                      for servo, end_pl in step])
+            await asyncio.sleep(settle_time)
+
+    async def power_off(self):
+        """Coroutine version of Carm.power_off()."""
+        await self.stop()
+        await self.move_together(self.arm.power_off_goals() +
+                                 [(self.cam, self.cam.config['pow_pl'],
+                                   None)])
+
+    # Sensors
+
+    async def distance(self):
+        """Ultrasonic distance (cm, None on a miss), pinged in a thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.robot.uls.ping)
+
+    # Commands
+
+    def coroutine(self, cmd_str):
+        """Coroutine doing what robot.execute_single_cmd(cmd_str) does.
+        Car motions, servo sweeps and the arm's and camera's moves have
+        coroutine versions; anything else (sensor readings, settings,
+        commands registered by plugins) runs in a thread. A command run in
+        a thread can't be cancelled: cancelling its task only stops
+        waiting for it, the thread carries on until the command returns,
+        and start() holds back the subsystem's next action until then.
+
+        Returns:
+        tuple: (subsystem, coroutine). The subsystem is None for
+        commands that aren't motions and have no coroutine version, so
+        they don't pre-empt what runs on their subsystem.
+
+        """
+        cmd = self.robot.commands[cmd_str]
+        func, args, subsystem = cmd.func, cmd.args, cmd.subsystem
+        owner = getattr(func, '__self__', None)
+        name = getattr(func, '__name__', '')
+        if owner is self.car and hasattr(self, name):
+            return subsystem, getattr(self, name)(*args)
+        if owner is self.cam and name == 'tilt':
+            return subsystem, self.tilt(*args)
+        if isinstance(owner, servos.ServoMotor):
+            goal = {'sweep': args[0] if args else None,
+                    'lookup': owner.config['min_pl'],
+                    'lookdown': owner.config['max_pl'],
+                    'power_off': owner.config['pow_pl']}.get(name)
+            if goal is not None:
+                return subsystem, self.sweep(owner, goal)
+        if owner is self.arm:
+            gripper = self.arm.gripper
+            if name == 'open_gripper':
+                return subsystem, self.sweep(gripper,
+                                             gripper.config['max_pl'])
+            if name == 'close_gripper':
+                return subsystem, self.sweep(gripper,
+                                             gripper.config['min_pl'])
+            if name == 'grab':
+                return subsystem, self.grab()
+            if name == 'extend':
+                return subsystem, self.extend(*args)
+        if cmd.category != 'motion':
+            subsystem = None  # e.g. change_speed must not stop a drive
+        return subsystem, self.in_thread(subsystem, cmd)
+
+    def execute(self, cmd_str):
+        """Starts the command bound to cmd_str in robot.commands on its
+        subsystem, pre-empting what runs there. Commands coroutine() gives
+        no subsystem run alongside every task instead.
+
+        Returns:
+        asyncio.Task: Await it to wait for the command to finish.
+
+        """
+        subsystem, coro = self.coroutine(cmd_str)
+        if subsystem is None:
+            return asyncio.ensure_future(coro)
+        return self.start(subsystem, coro)
+
+
+async def demo(robot):
+    """Drives, grabs and looks around at the same time while printing
+    distances."""
+    robot.start('car', robot.drive(1, 2, speed=0.5))
+    robot.start('arm', robot.grab())
+    robot.start('cam', robot.sweep(robot.cam, robot.cam.config['min_pl']))
+    for i in range(10):
+        print('Distance: {} cm'.format(await robot.distance()))
+        await asyncio.sleep(0.2)
+    robot.start('car', robot.point_turn(1, 0.5))  # pre-empts the drive
+    await asyncio.gather(*robot.tasks.values())
+    await robot.power_off()
+
+
+if __name__ == "__main__":
+    import carm
+    import config
+    asyncio.run(demo(AsyncCarm(carm.Carm(config.config_carm))))
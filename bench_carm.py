@@ -0,0 +1,192 @@
+"""Benchmarks for the whole robot on the simulated backend (hal 'sim'), so
+they run on an ordinary Linux box:
+
+    python bench_carm.py
+
+"""
+import os
+os.environ.setdefault('CARM_BACKEND', 'sim')
+
+import copy
+import logging
+import time
+import carm
+import clocks
+import config
+import hal
+import main
+import pca9685
+
+
+def timed(func, repeat=1):
+    """Mean seconds per call of func over repeat calls."""
+    t0 = time.perf_counter()
+    for i in range(repeat):
+        func()
+    return (time.perf_counter() - t0) / repeat
+
+
+def without_pwm(config_carm):
+    """Copy of config_carm with the motors switched on and off only."""
+    config_carm = copy.deepcopy(config_carm)
+    for motor in ('left_motor', 'right_motor'):
+        config_carm['car'][motor].pop('pwm_freq', None)
+    return config_carm
+
+
+def bench_pins(config_carm, repeat=1000):
+    """Counts the GPIO calls of driving. The car runs on a VirtualClock so
+    speed ramps take no wall time.
+
+    Returns:
+    dict: Calls per ramped drive + brake (all, batched GPIO.output() and
+    PWM ChangeDutyCycle()), and calls for repeat more drive(1) calls
+    while already driving.
+
+    """
+    pca9685.reset_buses()
+    hal.GPIO.cleanup()
+    robot = carm.Carm(config_carm, clocks.VirtualClock())
+    driver = robot.car.driver
+    counts = (driver.writes, driver.outputs, driver.duty_changes)
+    robot.car.drive(1)
+    robot.car.brake()
+    writes, outputs, duty_changes = (new - old for new, old in zip(
+        (driver.writes, driver.outputs, driver.duty_changes), counts))
+    robot.car.drive(1)
+    repeated = driver.writes
+    for i in range(repeat):
+        robot.car.drive(1)
+    repeated = driver.writes - repeated
+    robot.car.brake()
+    pca9685.reset_buses()
+    hal.GPIO.cleanup()
+    return {'writes per drive + brake': writes,
+            'GPIO.output calls': outputs,
+            'ChangeDutyCycle calls': duty_changes,
+            'writes per {} repeated drives'.format(repeat): repeated}
+
+
+def bench_carm(repeat=1000):
+    """Times startup, the GPIO path of driving and the ultrasonic sensor.
+    The car runs on a VirtualClock so speed ramps take no wall time.
+
+    Returns:
+    dict: Seconds for each operation.
+
+    """
+    results = dict()
+    pca9685.reset_buses()
+    hal.GPIO.cleanup()
+    t0 = time.perf_counter()
+    robot = carm.Carm(config.config_carm, clocks.VirtualClock())
+    results['startup'] = time.perf_counter() - t0
+
+    results['drive + brake'] = timed(lambda: (robot.car.drive(1),
+                                              robot.car.brake()), repeat)
+    robot.uls.clock = clocks.get_clock()  # the sim echoes in real time
+    results['ping (100 cm)'] = timed(robot.uls.ping, 20)
+    results['execute_single_cmd'] = timed(
+        lambda: robot.execute_single_cmd(' '), repeat)
+    pca9685.reset_buses()
+    hal.GPIO.cleanup()
+    return results
+
+
+def bench_replay(scripts=None):
+    """Replays command scripts on a VirtualClock.
+
+    Args:
+    scripts (dict): name --> command list for Carm.execute_cmds. Defaults
+    to the examples in main.py.
+
+    Returns:
+    dict: name --> (seconds of robot time, seconds of wall time).
+
+    """
+    if scripts is None:
+        scripts = {'cmds': main.cmds, 'right_90': main.right_90,
+                   'left_90': main.left_90}
+    results = dict()
+    for name, cmds in scripts.items():
+        pca9685.reset_buses()
+        hal.GPIO.cleanup()
+        clock = clocks.VirtualClock()
+        robot = carm.Carm(config.config_carm, clock)
+        for motor in robot.car.motor_lst:
+            motor.logger.setLevel(logging.INFO)
+        t0 = time.perf_counter()
+        robot.execute_cmds(cmds)
+        results[name] = (clock.now(), time.perf_counter() - t0)
+    pca9685.reset_buses()
+    hal.GPIO.cleanup()
+    return results
+
+
+def bench_schedule(scale=0.2):
+    """Runs main.cmds (servo moves) with times scaled by scale on the real
+    clock, with the old sleep after every command vs. CmdScheduler.
+
+    Returns:
+    dict: name --> seconds the run ended late by, plus the largest
+    lateness of a step as it actually started and the number of steps
+    that queued behind a busy subsystem under CmdScheduler.
+
+    """
+    cmds = [{'str': cmd['str'], 'time': cmd['time'] * scale}
+            for cmd in main.cmds]
+    planned = sum(cmd['time'] for cmd in cmds)
+    results = dict()
+    pca9685.reset_buses()
+    hal.GPIO.cleanup()
+    robot = carm.Carm(config.config_carm, clocks.RealClock())
+
+    t0 = robot.clock.now()
+    for cmd in cmds:
+        robot.execute_single_cmd(cmd['str'])
+        robot.clock.sleep(cmd['time'])
+    robot.execute_single_cmd(' ')
+    results['sleep after command'] = robot.clock.now() - t0 - planned
+
+    robot.execute_single_cmd('2')
+    summary = robot.execute_cmds(cmds)['summary']
+    results['CmdScheduler'] = summary['end']
+    results['CmdScheduler max step'] = summary['max']
+    results['CmdScheduler queued steps'] = summary['queued']
+    pca9685.reset_buses()
+    hal.GPIO.cleanup()
+    return results
+
+
+def bench_real_clock(seconds=0.001, repeat=200):
+    """Measures how much longer RealClock sleeps take than asked for.
+
+    Returns:
+    dict: RealClock.stats() after repeat sleeps of the given length.
+
+    """
+    clock = clocks.RealClock()
+    for i in range(repeat):
+        clock.sleep(seconds)
+    return clock.stats()
+
+
+if __name__ == "__main__":
+    print('Carm on the {} backend'.format(hal.name))
+    for name, value in bench_carm().items():
+        print('  {:>30}: {:.4g}'.format(name, value))
+    for name, config_carm in (('PWM', config.config_carm),
+                              ('on/off', without_pwm(config.config_carm))):
+        print('GPIO calls, motors {}'.format(name))
+        for key, value in bench_pins(config_carm).items():
+            print('  {:>30}: {}'.format(key, value))
+    print('Replay on a virtual clock (robot time, wall time)')
+    for name, (robot_time, wall_time) in bench_replay().items():
+        print('  {:>30}: {:.3f} s, {:.3f} s'.format(name, robot_time,
+                                                    wall_time))
+    print('Lateness of main.cmds (times x 0.2)')
+    for name, value in bench_schedule().items():
+        print('  {:>30}: {:.3f}'.format(name, value))
+    print('Real clock 1 ms sleeps')
+    for name, value in bench_real_clock().items():
+        print('  {:>30}: {:.4g}'.format(name, value))
@@ -0,0 +1,193 @@
+"""Benchmarks for the servo layer. Runs against the simulated I2C bus in
+sim.py so it can be run off the Pi:
+
+    python bench_servos.py
+
+"""
+import os
+os.environ.setdefault('CARM_BACKEND', 'sim')
+
+import time
+import Adafruit_PCA9685
+import arm
+import config
+import motion
+import pca9685
+import servos
+import sim
+import vision
+
+SERVO_CONFIGS = (config.config_gripper_servo,
+                 config.config_right_servo,
+                 config.config_camera_servo)
+
+
+def startup_per_servo_chip(i2c):
+    """Old startup: every servo resets the chip and sets the frequency."""
+    for servo_config in SERVO_CONFIGS:
+        pwm = Adafruit_PCA9685.PCA9685(i2c=i2c)
+        pwm.set_pwm_freq(pca9685.PWM_FREQ)
+        pwm.set_pwm(servo_config['channel'], 0, servo_config['pow_pl'])
+
+
+def startup_shared_bus(i2c):
+    """New startup: all servos share one PCA9685Bus."""
+    pca9685.reset_buses()
+    pca9685.get_bus(i2c=i2c)
+    for servo_config in SERVO_CONFIGS:
+        servos.ServoMotor(servo_config)
+
+
+def bench_startup(latency=0.0002, repeat=5):
+    """Times Carm style startup (gripper, right arm and camera servos).
+
+    Args:
+    latency (float): Simulated seconds per I2C transaction.
+    repeat (int): Number of startups to average over.
+
+    Returns:
+    dict: Mean seconds and I2C transactions per startup for each method.
+
+    """
+    results = dict()
+    for name, startup in (('per servo chip', startup_per_servo_chip),
+                          ('shared bus', startup_shared_bus)):
+        elapsed = 0
+        transactions = 0
+        for i in range(repeat):
+            i2c = sim.SimI2C(latency)
+            t0 = time.perf_counter()
+            startup(i2c)
+            elapsed += time.perf_counter() - t0
+            transactions += i2c.transactions()
+        results[name] = {'seconds': elapsed / repeat,
+                         'transactions': transactions / repeat}
+    pca9685.reset_buses()
+    return results
+
+
+def unit_step_sweep(servo, end_pl, pause_time):
+    """Old ServoMotor.sweep: one set_pwm (four single byte I2C writes)
+    and one sleep per unit.
+
+    """
+    step = -1 if (end_pl - servo.current_pl) < 0 else 1
+    while servo.current_pl != end_pl:
+        servo.current_pl += step
+        servo.pwm.chip.set_pwm(servo.channel, 0, servo.current_pl)
+        time.sleep(pause_time)
+
+
+def bench_move(distance=250, duration=1.0, latency=0.0002):
+    """Times a single servo move of distance pulse lengths that should take
+    duration seconds, unit stepping vs. trajectory.
+
+    Returns:
+    dict: Seconds taken and I2C transactions for each method.
+
+    """
+    results = dict()
+    for name in ('unit step', 'trapezoid', 's_curve'):
+        i2c = sim.SimI2C(latency)
+        pca9685.reset_buses()
+        pca9685.get_bus(i2c=i2c)
+        servo = servos.ServoMotor(config.config_right_servo)
+        end_pl = servo.current_pl + distance
+        transactions = i2c.transactions()
+        t0 = time.perf_counter()
+        if name == 'unit step':
+            unit_step_sweep(servo, end_pl, duration / distance)
+        else:
+            servo.move(end_pl, duration, shape=name)
+        results[name] = {'seconds': time.perf_counter() - t0,
+                         'transactions': i2c.transactions() - transactions}
+    pca9685.reset_buses()
+    return results
+
+
+def serial_grab(robot_arm, duration):
+    """Old Arm.grab: every joint moves on its own, one after another."""
+    dropoff = robot_arm.right.config['min_pl']
+    pickup = robot_arm.right.config['max_pl']
+    for servo, end_pl in ((robot_arm.gripper, 300), (robot_arm.right, dropoff),
+                          (robot_arm.gripper, 300), (robot_arm.right, pickup),
+                          (robot_arm.gripper, 135), (robot_arm.right, dropoff),
+                          (robot_arm.gripper, 300)):
+        servo.move(end_pl, duration)
+
+
+def bench_grab(duration=0.25, latency=0.0002):
+    """Times a grab cycle (settling pauses left out) starting with the arm
+    extended and the gripper closed, moving joints serially vs. with
+    motion.move_together().
+
+    Returns:
+    dict: Seconds taken and I2C transactions for each method.
+
+    """
+    results = dict()
+    for name in ('serial', 'coordinated'):
+        i2c = sim.SimI2C(latency)
+        pca9685.reset_buses()
+        pca9685.get_bus(i2c=i2c)
+        robot_arm = arm.Arm(config.config_arm)
+        robot_arm.gripper.move(robot_arm.gripper.config['min_pl'], 0)
+        robot_arm.right.move(robot_arm.right.config['max_pl'], 0)
+        transactions = i2c.transactions()
+        t0 = time.perf_counter()
+        if name == 'serial':
+            serial_grab(robot_arm, duration)
+        else:
+            robot_arm.grab(duration, settle_time=0)
+        results[name] = {'seconds': time.perf_counter() - t0,
+                         'transactions': i2c.transactions() - transactions}
+    pca9685.reset_buses()
+    return results
+
+
+def bench_power_off(latency=0.0002):
+    """Times Carm style power off with the gripper open, the arm extended
+    and the camera looking up, one servo after another vs. with
+    motion.move_together().
+
+    Returns:
+    dict: Seconds taken and I2C transactions for each method.
+
+    """
+    results = dict()
+    for name in ('serial', 'coordinated'):
+        i2c = sim.SimI2C(latency)
+        pca9685.reset_buses()
+        pca9685.get_bus(i2c=i2c)
+        robot_arm = arm.Arm(config.config_arm)
+        cam = vision.Cam(config.config_camera_servo)
+        robot_arm.gripper.move(robot_arm.gripper.config['max_pl'], 0)
+        robot_arm.right.move(robot_arm.right.config['max_pl'], 0)
+        cam.move(cam.config['min_pl'], 0)
+        transactions = i2c.transactions()
+        t0 = time.perf_counter()
+        if name == 'serial':
+            for servo in robot_arm.servo_list + (cam,):
+                servo.power_off()
+        else:
+            motion.move_together(robot_arm.power_off_goals() +
+                                 [(cam, cam.config['pow_pl'], None)])
+        results[name] = {'seconds': time.perf_counter() - t0,
+                         'transactions': i2c.transactions() - transactions}
+    pca9685.reset_buses()
+    return results
+
+
+def print_results(title, results):
+    print(title)
+    for name, result in results.items():
+        print('  {:>16}: {}'.format(
+            name, ', '.join('{} {:.4g}'.format(key, value)
+                            for key, value in result.items())))
+
+
+if __name__ == "__main__":
+    print_results('Servo startup', bench_startup())
+    print_results('250 pulse length move in 1 s', bench_move())
+    print_results('Grab cycle', bench_grab())
+    print_results('Power off', bench_power_off())
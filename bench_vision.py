@@ -0,0 +1,286 @@
+"""Benchmarks for the vision code that run off the Pi on recorded video,
+directories of images or generated frames:
+
+    python bench_vision.py [--truth boxes.json] [--face face.png]
+                           [--count N] [path ...]
+
+Each path is a video file or a directory of images. Every detector
+configuration in CONFIGS is run over every source and fps, per frame
+latency percentiles and, where ground truth is known, hit rate are
+printed, so regressions show up before deploying.
+
+Ground truth is a JSON file mapping frame numbers (counting from 0) or
+image file names to lists of [x, y, w, h] face boxes. Frames missing from
+it are not scored. Synthetic frames bring their own ground truth if they
+move a face image given with --face; the default bright square isn't a
+face, so they aren't scored then and hit % shows '-'.
+
+"""
+import argparse
+import json
+import os
+import time
+import cv2
+import numpy as np
+import adaptive
+import detectors
+import frame_sources
+import gate
+import tracking
+
+# Detector configurations compared by bench_detection. Keys:
+#   scale: Resize frames by this before detecting (resolution).
+#   backend: Detector backend in detectors.py, 'haar' by default.
+#   scale_factor, min_neighbors: Passed to the backend.
+#   roi: Search around the tracked face (tracking.RoiDetector).
+#   adaptive: Use adaptive.AdaptiveDetector (ignores scale/scale_factor).
+#   skip: Detect on every skip-th frame only, reusing the last boxes.
+#   gate: Detect only when the scene changed (gate.MotionGate).
+CONFIGS = (('baseline', {}),
+           ('scaleFactor 1.1', {'scale_factor': 1.1}),
+           ('scaleFactor 1.5', {'scale_factor': 1.5}),
+           ('half resolution', {'scale': 0.5}),
+           ('roi tracking', {'roi': True}),
+           ('skip 1 in 2', {'skip': 2}),
+           ('roi + skip 1 in 2', {'roi': True, 'skip': 2}),
+           ('motion gate', {'gate': True}),
+           ('motion gate + roi', {'gate': True, 'roi': True}),
+           ('adaptive + roi', {'adaptive': True, 'roi': True}),
+           ('lbp', {'backend': 'lbp'}),
+           ('dnn', {'backend': 'dnn'}))
+
+
+def bgr_frames(source):
+    """Old capture path: a new BGR array for every frame (as PiRGBArray
+    does), converted to gray with cvtColor.
+
+    """
+    for frame in source:
+        bgr = np.array(source.color(frame))
+        yield cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+
+
+def bench_capture(source, count=300):
+    """Times getting count gray frames from source, straight from its
+    preallocated buffers vs. through a BGR copy and cvtColor.
+
+    Returns:
+    dict: Milliseconds per frame for each path.
+
+    """
+    results = dict()
+    for name, frames in (('gray ring buffer', lambda: iter(source)),
+                         ('bgr + cvtColor', lambda: bgr_frames(source))):
+        t0 = time.perf_counter()
+        n = 0
+        for frame in frames():
+            n += 1
+            if n >= count:
+                break
+        results[name] = (time.perf_counter() - t0) / max(n, 1) * 1000
+    return results
+
+
+def make_detector(config):
+    """Detector for one of CONFIGS, called as detector(frame, t)."""
+    scale = config.get('scale', 1.0)
+    backend = detectors.get_detector(config.get('backend', 'haar'))
+    if config.get('adaptive'):
+        detect = adaptive.AdaptiveDetector(
+            min_neighbors=config.get('min_neighbors', 5), detector=backend)
+    else:
+        def detect(image, min_size=None, max_size=None):
+            return backend(image, config.get('scale_factor'),
+                           config.get('min_neighbors'), min_size, max_size)
+    if config.get('roi'):
+        roi = tracking.RoiDetector(detect)
+        detect = roi
+
+    def detector(frame, t):
+        if scale != 1.0:
+            frame = cv2.resize(frame, None, fx=scale, fy=scale,
+                               interpolation=cv2.INTER_AREA)
+        faces = (detect(frame, t) if config.get('roi') else detect(frame))
+        return [tuple(int(value / scale) for value in dims)
+                for dims in faces]
+    if config.get('gate'):
+        return gate.MotionGate(detector)
+    return detector
+
+
+def overlap(a, b):
+    """Intersection over union of two (x, y, w, h) boxes."""
+    w = min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0])
+    h = min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1])
+    if w <= 0 or h <= 0:
+        return 0.0
+    return w * h / (a[2] * a[3] + b[2] * b[3] - w * h)
+
+
+def score(faces, truth, min_overlap=0.5):
+    """Matches detected faces to true boxes.
+
+    Returns:
+    tuple: (hits, false positives), hits being true boxes found.
+
+    """
+    unmatched = list(faces)
+    hits = 0
+    for box in truth:
+        best = max(unmatched, key=lambda dims: overlap(dims, box),
+                   default=None)
+        if best is not None and overlap(best, box) >= min_overlap:
+            unmatched.remove(best)
+            hits += 1
+    return hits, len(unmatched)
+
+
+def truth_for(source, truth):
+    """Function of the frame number giving its true boxes or None."""
+    if hasattr(source, 'boxes'):
+        return source.boxes
+    if truth is None:
+        return lambda i: None
+    names = getattr(source, 'names', None)
+
+    def lookup(i):
+        if names is not None and names[i % len(names)] in truth:
+            return truth[names[i % len(names)]]
+        return truth.get(str(i))
+    return lookup
+
+
+def bench_detection(source, config, truth=None, count=None):
+    """Runs a detector configuration over the frames of source.
+
+    Args:
+    source (iterable): Gray frames, e.g. from frame_sources.py.
+    config (dict): Detector configuration, see CONFIGS.
+    truth (dict): Ground truth as loaded from the --truth file.
+    count (int): Stop after this many frames, None for all.
+
+    Returns:
+    dict: 'frames', 'fps', latency percentiles 'p50', 'p90', 'p99' and
+    'max' (ms, all frames including skipped ones), 'detected' (frames
+    the detector ran on), and 'hit_rate' and 'false_positives' when
+    ground truth was available (None otherwise).
+
+    """
+    detector = make_detector(config)
+    skip = config.get('skip', 1)
+    truth = truth_for(source, truth)
+    framerate = getattr(source, 'framerate', None) or 30
+    latencies = list()
+    hits = false_positives = true_faces = 0
+    faces = ()
+    t0 = time.perf_counter()
+    for i, frame in enumerate(source):
+        if count is not None and i >= count:
+            break
+        t_frame = time.perf_counter()
+        if i % skip == 0:
+            # Video time, so the tracker sees the motion the camera would
+            faces = detector(frame, i / framerate)
+        latencies.append(time.perf_counter() - t_frame)
+        boxes = truth(i)
+        if boxes is not None:
+            frame_hits, frame_false = score(faces, boxes)
+            hits += frame_hits
+            false_positives += frame_false
+            true_faces += len(boxes)
+    elapsed = time.perf_counter() - t0
+    if not latencies:
+        raise ValueError('No frames in source')
+    p50, p90, p99 = np.percentile(latencies, (50, 90, 99)) * 1000
+    scored = true_faces > 0
+    return {'frames': len(latencies),
+            'fps': len(latencies) / elapsed,
+            'p50': p50, 'p90': p90, 'p99': p99,
+            'max': max(latencies) * 1000,
+            'detected': (len(latencies) + skip - 1) // skip,
+            'skip_ratio': (detector.skip_ratio()
+                           if hasattr(detector, 'skip_ratio') else None),
+            'hit_rate': hits / true_faces if scored else None,
+            'false_positives': false_positives if scored else None}
+
+
+def compare(source, configs=CONFIGS, truth=None, count=None):
+    """bench_detection for each of configs, as {name: results}.
+    Configurations whose backend can't be loaded are left out.
+
+    """
+    results = dict()
+    for name, config in configs:
+        try:
+            results[name] = bench_detection(source, config, truth, count)
+        except IOError as e:
+            print('Skipping {}: {}'.format(name, e))
+    return results
+
+
+def print_comparison(title, results):
+    print(title)
+    print('  {:>20} {:>7} {:>7} {:>7} {:>7} {:>7} {:>6} {:>6} {:>6}'.format(
+        'config', 'fps', 'p50 ms', 'p90 ms', 'p99 ms', 'max ms', 'hit %',
+        'false', 'gated'))
+    for name, r in results.items():
+        hit_rate = ('-' if r['hit_rate'] is None else
+                    '{:.0%}'.format(r['hit_rate']))
+        false = '-' if r['false_positives'] is None else r['false_positives']
+        gated = ('-' if r['skip_ratio'] is None else
+                 '{:.0%}'.format(r['skip_ratio']))
+        print('  {:>20} {:7.1f} {:7.2f} {:7.2f} {:7.2f} {:7.2f} {:>6} '
+              '{:>6} {:>6}'.format(name, r['fps'], r['p50'], r['p90'],
+                                   r['p99'], r['max'], hit_rate, false,
+                                   gated))
+
+
+def load_face(path, height):
+    """Gray face image from path, resized to a third of height."""
+    image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise IOError('Could not read {}'.format(path))
+    size = height // 3
+    return cv2.resize(image, (size * image.shape[1] // image.shape[0], size))
+
+
+def open_source(path):
+    if os.path.isdir(path):
+        return frame_sources.ImageDirectorySource(path)
+    return frame_sources.VideoFileSource(path)
+
+
+def print_results(title, results, unit=''):
+    print(title)
+    for name, value in results.items():
+        print('  {:>20}: {:.4g}{}'.format(name, value, unit))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Vision benchmarks')
+    parser.add_argument('paths', nargs='*',
+                        help='video files or directories of images')
+    parser.add_argument('--truth', help='JSON file of ground truth boxes')
+    parser.add_argument('--face', help='tightly cropped face image moved '
+                        'across the synthetic frames, so they can be scored')
+    parser.add_argument('--count', type=int,
+                        help='frames per source and configuration')
+    args = parser.parse_args()
+    truth = None
+    if args.truth:
+        with open(args.truth) as f:
+            truth = json.load(f)
+    face = None
+    if args.face:
+        face = load_face(args.face,
+                         frame_sources.config_pi_camera['y_res'])
+    sources = {'synthetic': frame_sources.SyntheticSource(patch=face),
+               'synthetic, still': frame_sources.SyntheticSource(
+                   patch=face, speed=0)}
+    for path in args.paths:
+        sources[path] = open_source(path)
+    for name, source in sources.items():
+        print_results('Capture path, {}'.format(name),
+                      bench_capture(source), ' ms/frame')
+        print_comparison('Detection, {}'.format(name),
+                         compare(source, truth=truth, count=args.count))
@@ -1,33 +1,53 @@
 import config_log
 import logging
+import threading
 import dc_motors as dcm
 from dc_motors import GPIO
-from time import sleep
+import clocks
+import trajectory
 
 
 class Car():
     """Class for car base of CARM."""
 
 #    def __init__(self, left_motor, right_motor):
-    def __init__(self, config):
+    def __init__(self, config, clock=None):
         """
         Args:
         config (dict): Configuration dictionary containing string keys
         for the following values:
             'left_motor' (dict): Configuration dict for left DCMotor object.
             'right_motor' (dict): Configuration dict for right DCMotor object.
+            'max_accel' (float): Optional. Largest change of motor speed
+            per second (1 being full speed), None for no ramps.
+            'ramp_rate' (float): Optional. Updates per second during a
+            ramp, 50 by default.
+            'speed' (float): Optional. Speed (0 to 1) of drives and turns
+            that aren't given one, 1 by default.
+        clock (RealClock or VirtualClock): Clock to sleep on. Defaults to
+        clocks.get_clock().
 
         """
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.DEBUG)
-        self.lm = dcm.DCMotor(config['left_motor'])
-        self.logger.debug('left_motor:\n{}'.format(self.lm.__str__()))
-        self.rm = dcm.DCMotor(config['right_motor'])
+        self.clock = clock or clocks.get_clock()
+        self.lm = dcm.DCMotor(config['left_motor'], self.clock)
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug('left_motor:\n{}'.format(self.lm))
+        self.rm = dcm.DCMotor(config['right_motor'], self.clock)
         self.motor_lst = [self.lm, self.rm]  # for looping over motors
-        self.logger.debug('right_motor:\n{}'.format(self.rm.__str__()))
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug('right_motor:\n{}'.format(self.rm))
+        self.max_accel = config.get('max_accel')
+        self.ramp_rate = config.get('ramp_rate', 50)
+        self.speed = config.get('speed', 1.0)
+        self.lock = threading.Lock()
+        self.brakes = 0  # number of brake() calls, to cut ramps short
+        self.driver = dcm.get_driver()  # writes both motors' pins at once
 
     def brake(self):
-        """Stops both left and right car motors.
+        """Stops both left and right car motors at once (no ramp), and
+        cuts short any ramp in progress.
 
         Args:
         None
@@ -35,10 +55,76 @@ class Car():
         Returns: None
 
         """
-        self.lm.stop()
-        self.rm.stop()
+        with self.lock:
+            self.brakes += 1
+            self.lm.stop(flush=False)
+            self.rm.stop(flush=False)
+            self.driver.flush()
 
-    def drive(self, direction, drive_time=-1):
+    def change_speed(self, step):
+        """Changes the speed of drives and turns that aren't given one.
+
+        Args:
+        step (float): Added to the speed, which stays within 0.1 to 1.
+
+        Returns:
+        float: New speed.
+
+        """
+        self.speed = round(max(0.1, min(1.0, self.speed + step)), 2)
+        self.logger.info('Car speed: {}'.format(self.speed))
+        return self.speed
+
+    def set_speeds(self, left, right):
+        """Ramps both motors to new speeds, keeping the change of speed per
+        second within max_accel. Both motors finish the ramp together.
+        Blocks until the ramp is done or brake() is called.
+
+        Args:
+        left (float): Speed of the left motor, -1 to 1.
+        right (float): Speed of the right motor, -1 to 1.
+
+        Returns:
+        None
+
+        """
+        with self.lock:
+            brakes = self.brakes
+        t0 = self.clock.now()
+        for t, left_speed, right_speed in self.speed_ramp(left, right):
+            self.clock.sleep_until(t0 + t)
+            with self.lock:  # so a brake() can't come in between
+                if self.brakes != brakes:
+                    self.logger.debug('Ramp cut short by brake()')
+                    return
+                self.apply_speeds(left_speed, right_speed)
+
+    def speed_ramp(self, left, right):
+        """Steps of the ramp set_speeds() makes, both motors finishing
+        together.
+
+        Returns:
+        list: (seconds from the start, left speed, right speed) tuples.
+
+        """
+        goals = ((self.lm, left), (self.rm, right))
+        change = max(abs(goal - motor.speed) for motor, goal in goals)
+        if not self.max_accel or change == 0:
+            return [(0.0, left, right)]
+        duration = change / self.max_accel
+        ramps = [trajectory.ramp(motor.speed, goal, rate=self.ramp_rate,
+                                 duration=duration)
+                 for motor, goal in goals]
+        return [((tick - 1) / self.ramp_rate, left_speed, right_speed)
+                for (tick, left_speed), (_, right_speed) in zip(*ramps)]
+
+    def apply_speeds(self, left, right):
+        """Sets both motors' speeds at once, without a ramp."""
+        self.lm.set_speed(left, flush=False)
+        self.rm.set_speed(right, flush=False)
+        self.driver.flush()
+
+    def drive(self, direction, drive_time=-1, speed=None):
         """Sets the car driving in a straight line indefinitely or for some
         specified time.
 
@@ -52,24 +138,26 @@ class Car():
           - values specify how long the car drives in seconds
           - negative values cause the car to drive indefinitely
 
+        speed (float): 0 to 1, defaults to self.speed.
+
         Returns:
         None
 
         """
+        speed = self.speed if speed is None else speed
         if drive_time >= 0:
-            self.lm.set_direction(direction)
-            self.rm.set_direction(direction)
-            sleep(drive_time)
+            self.set_speeds(direction * speed, direction * speed)
+            self.clock.sleep(drive_time)
+            self.set_speeds(0, 0)
             self.brake()
         elif drive_time < 0:
-            self.lm.set_direction(direction)
-            self.rm.set_direction(direction)
+            self.set_speeds(direction * speed, direction * speed)
         else:
             self.logger.error('Entered invalid value for drive_time')
             self.brake()
 
     def swing_turn(self, horizontal_direction, vertical_direction,
-                   turn_time=-1, num_turns=1, wait_interval=.25):
+                   turn_time=-1, num_turns=1, wait_interval=.25, speed=None):
         """Causes the car to perform a series of swing turns (operating only a
 single motor to turn the car) or do an indefinite swing turn.
 
@@ -86,25 +174,28 @@ single motor to turn the car) or do an indefinite swing turn.
           - negative values: Turn indefinitely.
         num_turns (int): Non negative int. Specifies how many turns to perform.
         wait_interval (float): Delay between each turn.
+        speed (float): 0 to 1, defaults to self.speed.
 
         Returns:
         None
 
         """
-        self.brake()  # make sure no unnecessary motors running
+        speed = self.speed if speed is None else speed
+        # run the left motor (motor_lst[0]) for turning right and
+        # the right motor (motor_list[1]) for turning left
+        speeds = [vertical_direction * speed, 0][::horizontal_direction]
         if turn_time < 0:  # indefinite turning
-            # run the left motor (motor_lst[0]) for turning right and
-            # the right motor (motor_list[1]) for turning left
-            self.motor_lst[::horizontal_direction][0].set_direction(
-                vertical_direction)
+            self.set_speeds(*speeds)
         else:  # turning for specific time
             for i in range(num_turns):
-                self.motor_lst[::horizontal_direction][0].set_time(
-                    vertical_direction, turn_time)
-                sleep(wait_interval)
+                self.set_speeds(*speeds)
+                self.clock.sleep(turn_time)
+                self.set_speeds(0, 0)
+                self.brake()
+                self.clock.sleep(wait_interval)
 
     def point_turn(self, horizontal_direction,
-                   turn_time=-1, num_turns=1, wait_interval=.25):
+                   turn_time=-1, num_turns=1, wait_interval=.25, speed=None):
         """Causes the car to perform a series of point turns (operating both
 motors in opposite directions) or do an indefinite point turn.
 
@@ -117,22 +208,23 @@ motors in opposite directions) or do an indefinite point turn.
           - negative values: Turn indefinitely.
         num_turns (int): Non negative int. Specifies how many turns to perform.
         wait_interval (float): Delay between each turn.
+        speed (float): 0 to 1, defaults to self.speed.
 
         Returns:
         None
 
         """
-        self.brake()  # make sure no unnecessary motors running
+        speed = self.speed if speed is None else speed
+        speeds = [speed, -speed][::horizontal_direction]
         if turn_time < 0:  # indefinite turning
-            self.motor_lst[::horizontal_direction][0].set_direction(1)
-            self.motor_lst[::horizontal_direction][1].set_direction(-1)
+            self.set_speeds(*speeds)
         else:  # specified turn time
             for i in range(num_turns):
-                self.motor_lst[::horizontal_direction][0].set_direction(1)
-                self.motor_lst[::horizontal_direction][1].set_direction(-1)
-                sleep(turn_time)
+                self.set_speeds(*speeds)
+                self.clock.sleep(turn_time)
+                self.set_speeds(0, 0)
                 self.brake()
-                sleep(wait_interval)
+                self.clock.sleep(wait_interval)
             self.brake()
 
 
@@ -1,96 +1,150 @@
 import config_log
 import logging
 import arm
+import servos
+import motion
 import car
 import vision
 import ir
 import ultrasonic
-import time
+import watchdog
+import clocks
+import scheduler
+import commands
 import datetime
 import os
-import RPi.GPIO as GPIO
+from hal import GPIO
 
 
 class Carm():
-    def __init__(self, config):
+    def __init__(self, config, clock=None):
         """
         Args:
         config (dict): configuration dictionary containing string keys
         for the following values:
             'car' (dict): configuration dict for Car object.
             'arm' (dict): configuration dict for Arm object.
+            'watchdog' (dict): Optional. configuration dict for Watchdog
+            object (see watchdog.Watchdog).
+        clock (RealClock or VirtualClock): Clock shared by the car, arm and
+        camera. Defaults to clocks.get_clock().
 
         """
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.DEBUG)
-        self.car = car.Car(config['car'])
-        self.arm = arm.Arm(config['arm'])
-        self.cam = vision.Cam(config['cam'])
+        self.clock = clock or clocks.get_clock()
+        self.car = car.Car(config['car'], self.clock)
+        self.arm = arm.Arm(config['arm'], self.clock)
+        self.cam = vision.Cam(config['cam'], self.clock)
         self.irl = ir.IRSensor(config['irl'])
         self.irr = ir.IRSensor(config['irr'])
-        self.uls = ultrasonic.UltrasonicSensor(config['uls'])
-        self.cmd_list = [
-            ('w', ('forwards', self.car.drive, 1)),
-            ('s', ('backwards', self.car.drive, -1)),
-            ('a', ('swing left FWD', self.car.swing_turn, -1, 1)),  # 2 args
-            ('d', ('swing right FWD', self.car.swing_turn, 1, 1)),  # 2 args
-            ('q', ('point left', self.car.point_turn, -1)),
-            ('e', ('point right', self.car.point_turn, 1)),
-            ('z', ('swing left BACK', self.car.swing_turn, -1, -1)),  # 2 args
-            ('c', ('swing right BACK', self.car.swing_turn, 1, -1)),  # 2 args
-            (' ', ('brake', self.car.brake)),  # 0 args
-            ('[', ('increment extend', self.arm.extend, -5)),
-            (']', ('increment retract', self.arm.extend, 5)),
-            ('g', ('grab', self.arm.close_gripper)),  # 0 args
-            ('o', ('opens', self.arm.open_gripper)),  # 0 args
-            ('n', ('full extend', self.arm.right.sweep, self.arm.right.config['max_pl'])),
-            ('p', ('full retract', self.arm.right.sweep, self.arm.right.config['min_pl'])),
-            ('1', ('look down', self.cam.lookdown)),  # 0 args
-            ('2', ('look straight', self.cam.power_off)),  # 0 args
-            ('3', ('look up', self.cam.lookup)),  # 0 args
-            ('u', ('check ultrasonic', self.uls.get_distance, 'uls', 'sensor')),
-            ('irl', ('check left IR', self.irl.check, 'irl', 'sensor')),
-            ('irr', ('check right IR', self.irr.check, 'irr', 'sensor')),
-            ('j', ('Stop recording',)),
-        ]
-        self.cmd_dct = self.update_cmd_dct()
+        self.uls = ultrasonic.UltrasonicSensor(config['uls'], self.clock)
+        self.watchdog = watchdog.Watchdog(self.car, (self.irl, self.irr),
+                                          self.uls, config.get('watchdog'))
+        self.commands = commands.CommandRegistry()
+        self.cmd_dct = self.commands  # old name
+        self.register_commands()
         self.history_list = list()
 
-
-
-    def update_cmd_dct(self):
-        return {cmd[0]: cmd[1] for cmd in self.cmd_list}
+    def register_commands(self):
+        car, arm, cam = self.car, self.arm, self.cam
+        register = self.commands.register
+        register('w', 'forwards', car.drive, 1, subsystem='car')
+        register('s', 'backwards', car.drive, -1, subsystem='car')
+        register('a', 'swing left FWD', car.swing_turn, -1, 1,
+                 subsystem='car')
+        register('d', 'swing right FWD', car.swing_turn, 1, 1,
+                 subsystem='car')
+        register('q', 'point left', car.point_turn, -1, subsystem='car')
+        register('e', 'point right', car.point_turn, 1, subsystem='car')
+        register('z', 'swing left BACK', car.swing_turn, -1, -1,
+                 subsystem='car')
+        register('c', 'swing right BACK', car.swing_turn, 1, -1,
+                 subsystem='car')
+        register(' ', 'brake', car.brake, category='stop', subsystem='car')
+        register('!', 'emergency stop', self.emergency_stop, category='stop')
+        register('-', 'slower', car.change_speed, -0.1, category='setting',
+                 subsystem='car')
+        register('=', 'faster', car.change_speed, 0.1, category='setting',
+                 subsystem='car')
+        register('[', 'increment extend', arm.extend, -5, subsystem='arm')
+        register(']', 'increment retract', arm.extend, 5, subsystem='arm')
+        register('g', 'grab', arm.close_gripper, subsystem='arm')
+        register('o', 'opens', arm.open_gripper, subsystem='arm')
+        register('n', 'full extend', arm.right.sweep,
+                 arm.right.config['max_pl'], subsystem='arm')
+        register('p', 'full retract', arm.right.sweep,
+                 arm.right.config['min_pl'], subsystem='arm')
+        register('1', 'look down', cam.lookdown, subsystem='cam')
+        register('2', 'look straight', cam.power_off, subsystem='cam')
+        register('3', 'look up', cam.lookup, subsystem='cam')
+        register('u', 'check ultrasonic', self.report(self.uls.get_distance),
+                 category='sensor', subsystem='sensors')
+        register('irl', 'check left IR', self.report(self.irl.check),
+                 category='sensor', subsystem='sensors')
+        register('irr', 'check right IR', self.report(self.irr.check),
+                 category='sensor', subsystem='sensors')
+        register('j', 'Stop recording', category='control')
+
+    def report(self, read):
+        """Sensor command: brakes, then prints what read() returns."""
+        def command():
+            self.car.brake()
+            value = read()
+            print(value)
+            return value
+        return command
+
+    def subsystem_of(self, func):
+        """Subsystem a bound method acts on."""
+        owner = getattr(func, '__self__', None)
+        if owner is self.car:
+            return 'car'
+        if owner is self.cam:
+            return 'cam'
+        if owner is self.arm or owner in self.arm.servo_list:
+            return 'arm'
+        return 'sensors'
 
     def add_more_cmds(self, cmds_to_add):
-        for cmd in cmds_to_add:
-            self.cmd_list.insert(-1, cmd)
-        self.update_cmd_dct()
+        """Registers commands given in the old (key, (name, func, *args))
+        form, with 'sensor' as the last element for sensor readings. New
+        code should call self.commands.register().
+
+        """
+        for key, tup in cmds_to_add:
+            name, func, args = tup[0], tup[1], tup[2:]
+            if args and args[-1] == 'sensor':
+                self.commands.register(key, name, self.report(func),
+                                       category='sensor',
+                                       subsystem='sensors', before='j')
+            else:
+                self.commands.register(key, name, func, *args,
+                                       subsystem=self.subsystem_of(func),
+                                       before='j')
 
     def power_off(self):
         """Brings the robot to a safe halt. Turns off DC motors and returns
         servo motors to starting positions to prevent violent startup. """
         self.car.brake()
-        self.arm.power_off()
-        self.cam.power_off()
+        motion.move_together(self.arm.power_off_goals() +
+                             [(self.cam, self.cam.config['pow_pl'], None)],
+                             clock=self.clock)
+
+    def emergency_stop(self):
+        """Brakes and stops the pulses to every servo at once. Unlike
+        power_off() nothing is moved: the servos go limp where they are.
+
+        """
+        self.car.brake()
+        servos.all_off(self.arm.right.pwm)
 
     def execute_single_cmd(self, user_cmd):
         """Executes a single command (user_cmd). Assumes user_cmd is
-        a key in robot.cmd_dct.
+        a key in robot.commands.
         """
-        # get information for the next command
         try:
-            tup = self.cmd_dct[user_cmd]
-
-            if tup[-1] == 'sensor':
-                self.car.brake()
-                print(tup[1]())
-                # sensor_readings['uls'].append()
-            elif len(tup) == 2:  # method has 0 arguments
-                tup[1]()
-            elif len(tup) == 3:  # method has 1 argument
-                tup[1](tup[2])
-            elif len(tup) == 4:  # method has 2 arguments
-                tup[1](tup[2], tup[3])
+            return self.commands[user_cmd]()
         except KeyboardInterrupt:
             self.car.brake()
 
@@ -110,7 +164,9 @@ class Carm():
         d 4
 
         The function ends the series of commands with a brake() to prevent
-        robot from rolling away.
+        robot from rolling away. Commands are started at absolute
+        deadlines by a scheduler.CmdScheduler, so time spent running a
+        command (e.g. a servo sweep) doesn't push back the ones after it.
 
         Args:
         robot (Carm): Carm instance
@@ -118,7 +174,8 @@ class Carm():
         containing command data
 
         Returns:
-        None
+        dict: Lateness of every step and a summary of the timing error (see
+        CmdScheduler.run()).
 
         """
         if type(cmds) == str:
@@ -127,10 +184,7 @@ class Carm():
             except FileNotFoundError:
                 print("File not found")
 
-        for cmd in cmds:
-            self.execute_single_cmd(cmd['str'])
-            time.sleep(cmd['time'])
-        self.execute_single_cmd(' ')
+        return scheduler.CmdScheduler(self).run(cmds)
 
     def read_cmds_from_txt(self, filename):
         """Takes in a text file and returns a command list for execution by a
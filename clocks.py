@@ -0,0 +1,132 @@
+"""Clocks used by the robot's classes for timing and sleeping. RealClock
+sleeps for real. VirtualClock is a discrete event clock whose sleeps
+return immediately after moving virtual time forward, so command scripts
+can be replayed (e.g. on the simulated hal backend) in milliseconds.
+
+Classes take a clock argument and fall back to get_clock().
+
+"""
+import heapq
+import itertools
+import threading
+import time
+
+
+class RealClock():
+    """Wall clock (monotonic). Keeps track of how much longer sleeps take
+    than asked for, i.e. the scheduling overhead of the OS.
+
+    """
+    def __init__(self):
+        self.sleeps = 0
+        self.requested = 0.0  # seconds of sleep asked for
+        self.oversleep = 0.0  # seconds slept beyond that
+        self.max_oversleep = 0.0
+
+    def now(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        if seconds <= 0:
+            return
+        t0 = time.monotonic()
+        time.sleep(seconds)
+        over = time.monotonic() - t0 - seconds
+        self.sleeps += 1
+        self.requested += seconds
+        self.oversleep += over
+        self.max_oversleep = max(self.max_oversleep, over)
+
+    def sleep_until(self, deadline):
+        self.sleep(deadline - self.now())
+
+    def call_at(self, when, callback):
+        """Runs callback() in a timer thread once the clock reaches when."""
+        threading.Timer(max(when - self.now(), 0), callback).start()
+
+    def call_later(self, delay, callback):
+        self.call_at(self.now() + delay, callback)
+
+    def wait(self, event, timeout):
+        """Same as event.wait(timeout)."""
+        return event.wait(timeout)
+
+    def stats(self):
+        """Sleep overhead so far.
+
+        Returns:
+        dict: 'sleeps', 'requested' (s), 'mean_oversleep' (s) and
+        'max_oversleep' (s).
+
+        """
+        return {'sleeps': self.sleeps,
+                'requested': self.requested,
+                'mean_oversleep': self.oversleep / max(self.sleeps, 1),
+                'max_oversleep': self.max_oversleep}
+
+
+class VirtualClock():
+    """Discrete event clock. Time only moves when someone sleeps; sleeping
+    runs any events scheduled up to the new time, in time order, and
+    returns at once.
+
+    """
+    def __init__(self, start=0.0):
+        self.time = start
+        self.events = list()  # heap of (time, sequence number, callback)
+        self.sequence = itertools.count()
+        self.lock = threading.RLock()
+        self.sleeps = 0
+
+    def now(self):
+        return self.time
+
+    def call_at(self, when, callback):
+        """Schedules callback() to run once virtual time reaches when."""
+        with self.lock:
+            heapq.heappush(self.events, (when, next(self.sequence), callback))
+
+    def call_later(self, delay, callback):
+        self.call_at(self.time + delay, callback)
+
+    def sleep_until(self, deadline):
+        with self.lock:
+            self.sleeps += 1
+            while self.events and self.events[0][0] <= deadline:
+                when, i, callback = heapq.heappop(self.events)
+                self.time = max(self.time, when)
+                callback()
+            self.time = max(self.time, deadline)
+
+    def sleep(self, seconds):
+        self.sleep_until(self.time + max(seconds, 0))
+
+    def wait(self, event, timeout):
+        """event.wait(timeout) in virtual time: runs the events due within
+        timeout until one of them sets event, and returns at that time.
+
+        """
+        with self.lock:
+            deadline = self.time + timeout
+            while (not event.is_set() and self.events and
+                   self.events[0][0] <= deadline):
+                when, i, callback = heapq.heappop(self.events)
+                self.time = max(self.time, when)
+                callback()
+            if not event.is_set():
+                self.time = max(self.time, deadline)
+            return event.is_set()
+
+
+_clock = RealClock()
+
+
+def get_clock():
+    """The clock used by classes that weren't given one."""
+    return _clock
+
+
+def set_clock(clock):
+    """Sets the clock used by classes that aren't given one."""
+    global _clock
+    _clock = clock
@@ -0,0 +1,155 @@
+"""Command registry of the Carm. Every key binding is compiled once into a
+Command holding a pre-bound callable, so dispatching a key is a single
+call with no looking at tuples or argument counts. Each Command keeps
+timing counters.
+
+Plugins register their own commands at runtime:
+
+    robot.commands.register('f', 'follow face', plugin.start,
+                            category='motion', subsystem='vision')
+
+"""
+import functools
+import threading
+import time
+
+CATEGORIES = ('motion', 'stop', 'setting', 'sensor', 'control')
+
+
+class Command():
+    """One key binding: what it is called, what it runs and how long that
+    took."""
+    __slots__ = ('key', 'name', 'func', 'args', 'category', 'subsystem',
+                 'call', 'count', 'total', 'max', 'last')
+
+    def __init__(self, key, name, func=None, args=(), category='motion',
+                 subsystem=None):
+        """
+        Args:
+        key (str): Key the command is bound to.
+        name (str): Description shown in menus.
+        func (callable): Function to run, None for commands that only
+        mean something to the caller (e.g. quitting a menu).
+        args (tuple): Arguments func is called with.
+        category (str): One of CATEGORIES.
+        subsystem (str): Part of the robot the command acts on ('car',
+        'arm', 'cam', 'sensors', ...), None for commands that act on
+        nothing. Commands of one subsystem can't run at the same time.
+
+        """
+        if category not in CATEGORIES:
+            raise ValueError('Unknown category {}, choose from {}'.format(
+                category, ', '.join(CATEGORIES)))
+        self.key = key
+        self.name = name
+        self.func = func
+        self.args = tuple(args)
+        self.category = category
+        self.subsystem = subsystem
+        if func is None:
+            self.call = lambda: None
+        elif self.args:
+            self.call = functools.partial(func, *self.args)
+        else:
+            self.call = func
+        self.count = 0
+        self.total = 0.0  # seconds spent running
+        self.max = 0.0
+        self.last = 0.0
+
+    def __call__(self):
+        t0 = time.perf_counter()
+        try:
+            return self.call()
+        finally:
+            elapsed = time.perf_counter() - t0
+            self.count += 1
+            self.total += elapsed
+            self.last = elapsed
+            if elapsed > self.max:
+                self.max = elapsed
+
+    def __repr__(self):
+        return 'Command({!r}, {!r})'.format(self.key, self.name)
+
+    def stats(self):
+        """Timing counters (seconds)."""
+        return {'count': self.count,
+                'mean': self.total / max(self.count, 1),
+                'max': self.max,
+                'last': self.last}
+
+
+class CommandRegistry():
+    """Key --> Command, in menu order. Registering replaces the mapping
+    with an updated copy, so commands can be added while others are being
+    dispatched from other threads.
+
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.commands = dict()
+
+    def register(self, key, name, func=None, *args, category='motion',
+                 subsystem=None, before=None, replace=False):
+        """Compiles and registers a command.
+
+        Args:
+        key, name, func, args, category, subsystem: See Command.
+        before (str): Key of the command to list it in front of, None to
+        add it at the end.
+        replace (bool): Allow replacing a command already bound to key.
+
+        Returns:
+        Command
+
+        Raises:
+        ValueError: if key is taken and replace is False.
+
+        """
+        command = Command(key, name, func, args, category, subsystem)
+        with self.lock:
+            if key in self.commands and not replace:
+                raise ValueError('Key {!r} is already bound to {}'.format(
+                    key, self.commands[key].name))
+            items = [(k, c) for k, c in self.commands.items() if k != key]
+            keys = [k for k, c in items]
+            index = keys.index(before) if before in keys else len(items)
+            items.insert(index, (key, command))
+            self.commands = dict(items)
+        return command
+
+    def unregister(self, key):
+        with self.lock:
+            commands = dict(self.commands)
+            commands.pop(key, None)
+            self.commands = commands
+
+    def __getitem__(self, key):
+        return self.commands[key]
+
+    def __contains__(self, key):
+        return key in self.commands
+
+    def __iter__(self):
+        return iter(self.commands)
+
+    def __len__(self):
+        return len(self.commands)
+
+    def get(self, key, default=None):
+        return self.commands.get(key, default)
+
+    def keys(self):
+        return self.commands.keys()
+
+    def values(self):
+        return self.commands.values()
+
+    def items(self):
+        return self.commands.items()
+
+    def stats(self):
+        """Timing counters of the commands that have run."""
+        return {key: command.stats() for key, command in self.items()
+                if command.count}
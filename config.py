@@ -1,18 +1,27 @@
 config_left_dc_motor = {
     'name': 'left',
     'pin_forward': 16,
-    'pin_backward': 12
+    'pin_backward': 12,
+    # Hz, software PWM on both pins. Every duty cycle change is a GPIO call
+    # of its own; without pwm_freq both motors switch in one GPIO.output()
+    'pwm_freq': 100,
+    'min_duty': 30  # %, the motor stalls below this
 }
 config_right_dc_motor = {
     'name': 'right',
     'pin_forward': 6,
-    'pin_backward': 5
+    'pin_backward': 5,
+    'pwm_freq': 100,
+    'min_duty': 30
 
 }
 
 config_car = {
     'left_motor': config_left_dc_motor,
-    'right_motor': config_right_dc_motor
+    'right_motor': config_right_dc_motor,
+    'max_accel': 5.0,  # full speed per second, so 0.2 s from rest to full
+    'ramp_rate': 50,  # Hz
+    'speed': 1.0  # default speed of drives and turns (0 to 1)
 }
 
 config_gripper_servo = {
@@ -64,16 +73,25 @@ config_camera_servo = {
 
 config_ir_left = {
     'name': 'left',
-    'pin': 14
+    'pin': 14,
+    'debounce': 0.005,  # seconds
+    'history': 64  # transitions kept
 }
 config_ir_right = {
     'name': 'right',
-    'pin': 15
+    'pin': 15,
+    'debounce': 0.005,
+    'history': 64
 }
 
 config_ultrasonic = {
     'trig': 23,
-    'echo': 24
+    'echo': 24,
+    'timeout': 0.03,  # seconds to wait for an echo (about 5 m)
+    'rate': 15,  # pings per second for the background sampler
+    'filter': {'size': 5,  # pings in the median window
+               'alpha': 0.4,  # moving average weight of newest median
+               'max_speed': 300}  # cm/s, faster changes are outliers
 }
 
 config_pi_camera = {
@@ -82,6 +100,59 @@ config_pi_camera = {
     'framerate': 32
 }
 
+config_detectors = {
+    'haar': {'path': 'haarcascade_frontalface_default.xml',
+             'scale_factor': 1.3, 'min_neighbors': 5},
+    'lbp': {'path': 'lbpcascade_frontalface.xml',
+            'scale_factor': 1.2, 'min_neighbors': 3},
+    'dnn': {'model': 'res10_300x300_ssd_iter_140000.caffemodel',
+            'config': 'deploy.prototxt', 'input_size': (300, 300),
+            'confidence': 0.5}
+}
+
+config_follow = {
+    # Camera tilt: pixels of vertical error --> pulse length step per frame
+    'tilt': {'kp': 0.08, 'ki': 0.02, 'kd': 0.002, 'limit': 6,
+             'rate_limit': 120},
+    # Car turns: horizontal error (-1 to 1) --> point turn speed as a
+    # fraction of turn_speed
+    'steer': {'kp': 0.9, 'ki': 0.2, 'kd': 0.02, 'limit': 1,
+              'rate_limit': 8},
+    'deadband': 0.15,  # steering outputs below this keep the car still
+    'lost_timeout': 1.0,  # seconds without a face before scanning
+    'scan_tilts': (415, 370, 460),  # camera pulse lengths to look at
+    'scan_turn': 1,  # point turn direction between sweeps
+    'turn_speed': 0.6,  # car speed (0 to 1) of the fastest turns
+    'scan_period': 0.4  # seconds per scan step
+}
+
+config_teleop = {
+    'release_timeout': 0.12,  # s without key repeats that counts as release
+    'deadman': 0.6,  # s a drive runs past a keypress that isn't repeated
+    'poll': 0.01  # s between checks for released keys
+}
+
+config_watchdog = {
+    'min_distance': 15,  # cm, brake when an obstacle is closer
+    # Brake when the control loop (menu or teleop) stops sending
+    # heartbeats for this many seconds while a motor runs. Longer than the
+    # slowest car ramp, which blocks the loop. The menu only beats when a
+    # command is typed, so its open ended drives stop this long after the
+    # last one. None disables the check.
+    'heartbeat_timeout': 0.5,
+    'period': 0.01,  # seconds between checks
+    'priority': 50  # SCHED_FIFO priority (needs root)
+}
+
+config_hal = {
+    'backend': 'pi',  # 'pi' or 'sim', overridden by $CARM_BACKEND
+    'sim': {
+        'i2c_latency': 0.0002,  # seconds per simulated I2C transaction
+        'inputs': {14: 1, 15: 1},  # IR sensors idle high (no obstruction)
+        'echoes': [{'trig': 23, 'echo': 24, 'distance': 100}]  # cm
+    }
+}
+
 config_carm = {
     'car': config_car,
     'arm': config_arm,
@@ -89,4 +160,5 @@ config_carm = {
     'irl': config_ir_left,
     'irr': config_ir_right,
     'uls': config_ultrasonic,
+    'watchdog': config_watchdog,
 }
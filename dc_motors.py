@@ -1,9 +1,99 @@
 import config_log
 import logging
-import RPi.GPIO as GPIO
-from time import sleep
+import threading
+import time
+from hal import GPIO
+import clocks
 
-GPIO.setmode(GPIO.BCM)
+
+class PinDriver():
+    """Drives the motor pins of all DCMotors. Keeps the last commanded
+    level (or PWM duty cycle) of every pin so that writes that wouldn't
+    change anything are skipped, and writes the level changes staged by
+    several motors in one GPIO.output(list, list) call so the wheels switch
+    together.
+
+    Only on/off pins are batched: RPi.GPIO's software PWM takes one
+    ChangeDutyCycle() call per pin, so with PWM every changed duty cycle
+    is a write of its own. The shipped config drives both motors with PWM
+    (config.config_left_dc_motor['pwm_freq']), so there the wheels never
+    switch in one GPIO.output(); their duty cycles are changed back to
+    back under the driver's lock instead. The L298N enable pins are
+    jumpered (connection.org), so direction can't be split off onto
+    batched pins either.
+
+    """
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.levels = dict()  # pin --> commanded level
+        self.pwms = dict()  # pin --> GPIO.PWM for pins driven by PWM
+        self.duties = dict()  # pin --> commanded duty cycle
+        self.staged = dict()  # pin --> level or duty cycle to write
+        self.writes = 0  # GPIO calls made
+        self.outputs = 0  # of which batched GPIO.output() calls
+        self.duty_changes = 0  # of which ChangeDutyCycle() calls
+        self.first_write = None  # perf_counter of the first write since mark()
+
+    def setup(self, pin, pwm_freq=None):
+        """Sets pin up as a low output, with PWM at pwm_freq if given."""
+        with self.lock:
+            GPIO.setup(pin, GPIO.OUT, initial=GPIO.LOW)
+            self.levels[pin] = GPIO.LOW
+            self.staged.pop(pin, None)
+            if pwm_freq:
+                self.pwms[pin] = GPIO.PWM(pin, pwm_freq)
+                self.pwms[pin].start(0)
+                self.duties[pin] = 0
+            else:
+                self.pwms.pop(pin, None)
+
+    def mark(self):
+        """Starts timing: first_write is set at the next actual write."""
+        with self.lock:
+            self.first_write = None
+
+    def stage(self, pin, value):
+        """Level (or duty cycle for PWM pins) pin gets at the next
+        flush()."""
+        with self.lock:
+            self.staged[pin] = value
+
+    def flush(self):
+        """Writes the staged values that differ from the commanded ones."""
+        with self.lock:
+            staged, self.staged = self.staged, dict()
+            pins, levels = list(), list()
+            for pin, value in staged.items():
+                if pin in self.pwms:
+                    if self.duties[pin] != value:
+                        self.pwms[pin].ChangeDutyCycle(value)
+                        self.duties[pin] = value
+                        self.writes += 1
+                        self.duty_changes += 1
+                        if self.first_write is None:
+                            self.first_write = time.perf_counter()
+                elif self.levels.get(pin) != value:
+                    pins.append(pin)
+                    levels.append(value)
+            if pins:
+                GPIO.output(pins, levels)
+                self.levels.update(zip(pins, levels))
+                self.writes += 1
+                self.outputs += 1
+                if self.first_write is None:
+                    self.first_write = time.perf_counter()
+
+    def state(self, pin):
+        """Commanded level, or duty cycle for PWM pins."""
+        return self.duties[pin] if pin in self.pwms else self.levels.get(pin)
+
+
+_driver = PinDriver()
+
+
+def get_driver():
+    """The PinDriver shared by all motors."""
+    return _driver
 
 
 class DCMotor():
@@ -12,7 +102,7 @@ class DCMotor():
     instances = list()
 
 #    def __init__(self, name, pin_forward, pin_backward):
-    def __init__(self, config):
+    def __init__(self, config, clock=None):
         """
         Args:
         config (dict): configuration dictionary containing string keys
@@ -20,15 +110,27 @@ class DCMotor():
             'name' (str): name of motor
             'pin_forward' (int): BCM number for forward GPIO pin
             'pin_backward' (int): BCM number for backward GPIO pin
+            'pwm_freq' (float): Optional. Frequency (Hz) of the PWM on
+            both pins for speed control. Without it the motor is only
+            switched fully on or off.
+            'min_duty' (float): Optional. Duty cycle (%) below which the
+            motor stalls; speeds above 0 are mapped onto min_duty to 100.
+        clock (RealClock or VirtualClock): Clock to sleep on. Defaults to
+        clocks.get_clock().
 
         """
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.DEBUG)
         self.state = 0  # 0 if motor off, 1 if motor on
         self.direction = 0  # (-1, 0, 1) = (backward, off, forward)
+        self.speed = 0.0  # -1 (full backward) to 1 (full forward)
         self.name = config['name']
+        self.clock = clock or clocks.get_clock()
         self.pins = {'forward': config['pin_forward'],
                      'backward': config['pin_backward']}
+        self.pwm_freq = config.get('pwm_freq')
+        self.min_duty = config.get('min_duty', 0)
+        self.driver = get_driver()
         self.num = DCMotor.number_of_motors
         DCMotor.number_of_motors += 1
         DCMotor.instances.append(self)
@@ -36,9 +138,50 @@ class DCMotor():
 
     def setup(self, pins):
         for pin in self.pins.values():
-            GPIO.setup(pin, GPIO.OUT, initial=GPIO.LOW)
+            self.driver.setup(pin, self.pwm_freq)
+
+    def duty(self, speed):
+        """Duty cycle (%) for the magnitude of speed."""
+        if speed == 0:
+            return 0
+        return self.min_duty + (100 - self.min_duty) * min(abs(speed), 1)
+
+    def set_speed(self, speed, flush=True):
+        """Runs the motor at a fraction of full speed. Without PWM
+        (no 'pwm_freq' in the config) any nonzero speed is full speed.
 
-    def set_direction(self, direction):
+        Args:
+            speed (float): -1 (full backward) to 1 (full forward), 0 off.
+            flush (bool): Write the pins now. Pass False to stage the
+            change and write it together with other motors' changes with
+            self.driver.flush().
+
+        Returns:
+            None
+
+        """
+        speed = max(-1.0, min(1.0, float(speed)))
+        direction = (speed > 0) - (speed < 0)
+        if self.pwm_freq:
+            forward = self.duty(max(speed, 0))
+            backward = self.duty(min(speed, 0))
+        else:
+            speed = float(direction)
+            forward = GPIO.HIGH if direction == 1 else GPIO.LOW
+            backward = GPIO.HIGH if direction == -1 else GPIO.LOW
+        self.driver.stage(self.pins['forward'], forward)
+        self.driver.stage(self.pins['backward'], backward)
+        if flush:
+            self.driver.flush()
+        self.speed = speed
+        self.direction = direction
+        self.state = int(direction != 0)
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug('{} (pin, output): ({}, {}), ({}, {})'.format(
+                self.name, self.pins['forward'], forward,
+                self.pins['backward'], backward))
+
+    def set_direction(self, direction, flush=True):
         """Sets the motor on or off and in the desired direction.
 
         Args:
@@ -46,33 +189,14 @@ class DCMotor():
             -1 sets the motor running backwards.
              1 sets the motor running forwards.
              0 turns the motor off.
+            flush (bool): See set_speed().
 
         Returns:
             None
 
         """
         if direction in (-1, 0, 1):
-            self.direction = direction
-            self.logger.debug('(pin, output): '
-                              '({}, {})'
-                              ', '
-                              '({}, {})'.format(
-                                  self.pins['forward'],
-                                  GPIO.input(self.pins['forward']),
-                                  self.pins['backward'],
-                                  GPIO.input(self.pins['backward'])))
-            if direction == -1:
-                self.state = 1
-                GPIO.output(self.pins['forward'], GPIO.LOW)
-                GPIO.output(self.pins['backward'], GPIO.HIGH)
-            elif direction == 0:
-                self.state = 0
-                GPIO.output(self.pins['forward'], GPIO.LOW)
-                GPIO.output(self.pins['backward'], GPIO.LOW)
-            else:
-                self.state = 1
-                GPIO.output(self.pins['forward'], GPIO.HIGH)
-                GPIO.output(self.pins['backward'], GPIO.LOW)
+            self.set_speed(direction, flush)
         else:
             self.logger.debug('Attempted to set direction to: {}'.format(
                 direction))
@@ -92,13 +216,13 @@ class DCMotor():
 
         """
         self.set_direction(direction)
-        sleep(time)
+        self.clock.sleep(time)
         self.stop()
 
-    def stop(self):
+    def stop(self, flush=True):
         """Turns the motor off.
         """
-        self.set_direction(0)
+        self.set_direction(0, flush)
 
     def __str__(self):
         motor_str = 'motor_num: {}'.format(self.num)
@@ -106,7 +230,7 @@ class DCMotor():
             motor_str += '\n{} pin: (pin number: {}, pin output: {})'.format(
                 direction,
                 self.pins[direction],
-                GPIO.input(self.pins[direction]))
+                self.driver.state(self.pins[direction]))
         return motor_str
 
 
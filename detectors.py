@@ -0,0 +1,234 @@
+"""Interchangeable face detector backends:
+
+    haar: OpenCV Haar cascade (haarcascade_frontalface_default.xml).
+    lbp: OpenCV LBP cascade, several times faster on the Pi and a little
+    less accurate (lbpcascade_frontalface.xml, shipped next to the Haar
+    cascade since pip's OpenCV only has the Haar ones).
+    dnn: OpenCV DNN face detector on the CPU, the res10 300x300 SSD
+    (deploy.prototxt and res10_300x300_ssd_iter_140000.caffemodel).
+
+Model paths are set in config_detectors. Files that aren't found there
+are looked for in OpenCV's data directories (find_model()), where the
+cascades of an OpenCV install live, e.g. /usr/share/opencv4/lbpcascades
+on Raspberry Pi OS. Every backend is called like face.detect() and returns
+(x, y, w, h) boxes. get_detector() loads each backend once per setting and
+hands out the cached instance after that, and choose() picks a backend by
+latency budget.
+
+"""
+import config_log
+import logging
+import os
+import time
+import cv2
+import numpy as np
+import face
+from config import config_detectors, config_pi_camera
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+class CascadeDetector():
+    """Haar or LBP cascade classifier."""
+    def __init__(self, path, scale_factor=1.3, min_neighbors=5):
+        """
+        Args:
+        path (str): Cascade XML file.
+        scale_factor (float): Default scaleFactor of detectMultiScale.
+        min_neighbors (int): Default minNeighbors of detectMultiScale.
+
+        """
+        self.cascade = face.load_cascade(path)
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.latency = None  # seconds per detection, set by warm_up
+
+    def __call__(self, image, scale_factor=None, min_neighbors=None,
+                 min_size=None, max_size=None):
+        gray = (cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3
+                else image)
+        return self.cascade.detectMultiScale(
+            gray, scale_factor or self.scale_factor,
+            min_neighbors or self.min_neighbors,
+            minSize=min_size or (0, 0), maxSize=max_size or (0, 0))
+
+
+class DnnDetector():
+    """OpenCV DNN single shot face detector. scale_factor and
+    min_neighbors are accepted for compatibility with face.detect() and
+    ignored.
+
+    """
+    def __init__(self, model, config, input_size=(300, 300),
+                 confidence=0.5, mean=(104.0, 177.0, 123.0)):
+        """
+        Args:
+        model (str): Weights file, e.g. the res10 caffemodel.
+        config (str): Network description, e.g. deploy.prototxt.
+        input_size (tuple): (w, h) the image is resized to.
+        confidence (float): Lowest score of a face.
+        mean (tuple): BGR mean subtracted from the input.
+
+        """
+        self.net = cv2.dnn.readNet(model, config)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.input_size = input_size
+        self.confidence = confidence
+        self.mean = mean
+        self.latency = None
+
+    def __call__(self, image, scale_factor=None, min_neighbors=None,
+                 min_size=None, max_size=None):
+        bgr = (cv2.cvtColor(image, cv2.COLOR_GRAY2BGR) if image.ndim == 2
+               else image)
+        height, width = bgr.shape[:2]
+        blob = cv2.dnn.blobFromImage(bgr, 1.0, self.input_size, self.mean)
+        self.net.setInput(blob)
+        detections = self.net.forward()[0, 0]  # rows of 7 values
+        faces = list()
+        for row in detections[detections[:, 2] >= self.confidence]:
+            x0, y0, x1, y1 = (row[3:7] * (width, height, width, height))
+            x0, y0 = max(int(x0), 0), max(int(y0), 0)
+            w, h = min(int(x1), width) - x0, min(int(y1), height) - y0
+            if w <= 0 or h <= 0:
+                continue
+            if min_size and (w < min_size[0] or h < min_size[1]):
+                continue
+            if max_size and (w > max_size[0] or h > max_size[1]):
+                continue
+            faces.append((x0, y0, w, h))
+        return faces
+
+
+BACKENDS = {'haar': CascadeDetector,
+            'lbp': CascadeDetector,
+            'dnn': DnnDetector}
+MODEL_KEYS = ('path', 'model', 'config')  # settings naming model files
+_detectors = dict()  # (name, settings) --> loaded detector
+
+
+def data_dirs():
+    """OpenCV's data directories, most specific first."""
+    dirs = list()
+    cv2_data = getattr(getattr(cv2, 'data', None), 'haarcascades', None)
+    if cv2_data:
+        dirs += [cv2_data, os.path.join(os.path.dirname(cv2_data.rstrip(
+            os.sep)), 'lbpcascades')]
+    for prefix in ('/usr/share', '/usr/local/share'):
+        for opencv in ('opencv4', 'opencv'):
+            dirs += [os.path.join(prefix, opencv, sub)
+                     for sub in ('lbpcascades', 'haarcascades')]
+    return dirs
+
+
+def find_model(path):
+    """path if it exists, else the first file of the same name next to
+    this module or in data_dirs(). Returns path unchanged if there's none
+    (loading it then fails with the original name in the error).
+
+    """
+    if os.path.exists(path):
+        return path
+    name = os.path.basename(path)
+    dirs = [os.path.dirname(os.path.abspath(__file__))] + data_dirs()
+    for directory in dirs:
+        candidate = os.path.join(directory, name)
+        if os.path.exists(candidate):
+            return candidate
+    return path
+
+
+def get_detector(name, config=config_detectors):
+    """Loads backend name (a key of BACKENDS) with its settings from config
+    once and returns the cached detector after that. Different settings
+    for the same backend get detectors of their own.
+
+    Raises:
+    IOError: if the model files can't be loaded.
+
+    """
+    settings = dict(config[name])
+    key = (name, tuple(sorted(settings.items())))
+    if key not in _detectors:
+        for setting in MODEL_KEYS:
+            if setting in settings:
+                settings[setting] = find_model(settings[setting])
+        try:
+            _detectors[key] = BACKENDS[name](**settings)
+        except cv2.error as e:
+            raise IOError('Could not load {} detector: {}'.format(name, e))
+        logger.info('Loaded {} detector'.format(name))
+    return _detectors[key]
+
+
+def warm_up(detector, frame=None, runs=3):
+    """Runs detector a few times so one-off setup (memory allocation,
+    network initialisation) is not counted against the first real frame.
+    Stores the time of the fastest run in detector.latency.
+
+    Args:
+    detector (callable): Detector to warm up.
+    frame (numpy array): Sample frame. Defaults to textured noise of the
+    camera's size, since detection time depends on image content.
+    runs (int): Number of detections.
+
+    Returns:
+    float: Seconds per detection.
+
+    """
+    if frame is None:
+        rng = np.random.default_rng(0)
+        frame = rng.integers(0, 256, (config_pi_camera['y_res'],
+                                      config_pi_camera['x_res']),
+                             dtype=np.uint8)
+    times = list()
+    for i in range(runs):
+        t0 = time.perf_counter()
+        detector(frame)
+        times.append(time.perf_counter() - t0)
+    detector.latency = min(times)
+    return detector.latency
+
+
+def choose(budget=None, preference=('lbp', 'haar', 'dnn'), frame=None,
+           config=config_detectors):
+    """Picks the first backend in preference that loads and whose warmed
+    up latency fits in budget. If none fits, the fastest one is returned.
+    The default prefers LBP, the fastest on the Pi, over the slightly more
+    accurate Haar and DNN detectors.
+
+    Args:
+    budget (float): Seconds per detection. Defaults to one frame at
+    config_pi_camera['framerate'].
+    preference (tuple): Backend names in order of preference.
+    frame (numpy array): Sample frame for warm_up.
+
+    Returns:
+    tuple: (name, detector)
+
+    Raises:
+    IOError: if no backend loads.
+
+    """
+    budget = budget or 1 / config_pi_camera['framerate']
+    loaded = list()
+    for name in preference:
+        try:
+            detector = get_detector(name, config)
+        except IOError as e:
+            logger.warning(e)
+            continue
+        if detector.latency is None:
+            warm_up(detector, frame)
+        logger.info('{} detector: {:.1f} ms (budget {:.1f} ms)'.format(
+            name, detector.latency * 1000, budget * 1000))
+        if detector.latency <= budget:
+            return name, detector
+        loaded.append((detector.latency, name, detector))
+    if not loaded:
+        raise IOError('No face detector could be loaded')
+    latency, name, detector = min(loaded, key=lambda item: item[0])
+    logger.warning('No detector within budget, using {}'.format(name))
+    return name, detector
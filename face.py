@@ -1,9 +1,10 @@
-from picamera.array import PiRGBArray
-from picamera import PiCamera
 import time
 import cv2
 from config import config_pi_camera
 
+CASCADE_PATH = 'haarcascade_frontalface_default.xml'
+_cascades = dict()  # path --> loaded CascadeClassifier
+
 
 def get_center(dims):
     """Computes the coordinates of the center corner of a
@@ -21,7 +22,60 @@ rectangle."""
     return dims[0] + dims[2], dims[1] + dims[3]
 
 
-def find_face():
+def load_cascade(path=CASCADE_PATH):
+    """Loads a cascade classifier once and returns the cached copy after
+    that."""
+    if path not in _cascades:
+        cascade = cv2.CascadeClassifier(path)
+        if cascade.empty():
+            raise IOError('Could not load cascade {}'.format(path))
+        _cascades[path] = cascade
+    return _cascades[path]
+
+
+def detect(image, scale_factor=1.3, min_neighbors=5, min_size=None,
+           max_size=None):
+    """Finds faces in a BGR or grayscale image with the Haar cascade.
+    min_size/max_size ((w, h) or None) limit the face sizes searched for.
+    Returns a sequence of (x, y, w, h)."""
+    gray = (cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3
+            else image)
+    return load_cascade().detectMultiScale(
+        gray, scale_factor, min_neighbors, minSize=min_size or (0, 0),
+        maxSize=max_size or (0, 0))
+
+
+def camera_frames():
+    """Yields BGR frames from the Pi camera as configured in
+    config_pi_camera."""
+    from picamera.array import PiRGBArray
+    from picamera import PiCamera
+    x_res = config_pi_camera['x_res']
+    y_res = config_pi_camera['y_res']
+    camera = PiCamera()
+    camera.resolution = (x_res, y_res)
+    camera.framerate = config_pi_camera['framerate']
+    raw_capture = PiRGBArray(camera, size=(x_res, y_res))
+    time.sleep(0.1)  # let camera warm up
+    try:
+        for frame in camera.capture_continuous(raw_capture, format='bgr',
+                                               use_video_port=True):
+            yield frame.array
+            raw_capture.truncate(0)
+    finally:
+        camera.close()
+
+
+def find_face(detector=detect):
+    """Prints where faces are in the Pi camera's frames.
+
+    Args:
+    detector (callable): Called like detect(), e.g. a backend from
+    detectors.py.
+
+    """
+    from picamera.array import PiRGBArray
+    from picamera import PiCamera
     count_up = 0
     timeout = 5  # allow 5 seconds of not finding faces before rescanning
     x_res = config_pi_camera['x_res']
@@ -30,20 +84,19 @@ def find_face():
     camera.resolution = (x_res, y_res)
     camera.framerate = config_pi_camera['framerate']
     raw_capture = PiRGBArray(camera, size=(x_res, y_res))
-    face_cascade = cv2.CascadeClassifier('haarcascade_frontalface_default.xml')
     time.sleep(0.1)  # let camera warm up
 
     bounds = {'x': {'lower': int(x_res * (2/5)),
                     'upper': int(x_res * (3/5))},
-              'y': {'lower': int(x_res * (2/5)),
-                    'upper': int(x_res * (3/5))}}
+              'y': {'lower': int(y_res * (2/5)),
+                    'upper': int(y_res * (3/5))}}
 
     for frame in camera.capture_continuous(raw_capture,
                                            format='bgr',
                                            use_video_port=True):
         image = frame.array
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        faces = face_cascade.detectMultiScale(gray, 1.3, 5)
+        faces = detector(gray)
 
         if len(faces) == 0 and count_up == 0:
             count_up = time.time()
@@ -91,7 +144,7 @@ def check_y(y, bound):
 def check_x(x, bound):
     if x < bound['lower']:
         # set car to drive left
-        print('x HIGH')
+        print('x LOW')
         pass
     elif x > bound['upper']:
         # set car to drive right
@@ -104,8 +157,11 @@ def check_x(x, bound):
 
 def scan():
     # do some turns and tilt the camera up and down to try to find a
-    # face to follow
+    # face to follow (follow.FaceFollower does this on the robot)
     pass
 
-    
-find_face()
+
+if __name__ == "__main__":
+    import detectors
+    import gate
+    find_face(gate.MotionGate(detectors.choose()[1]))
@@ -0,0 +1,288 @@
+import config_log
+import logging
+import collections
+import threading
+import time
+import cv2
+import face
+import frame_sources
+import tracking
+import adaptive
+import detectors
+import gate
+
+
+class StageStats():
+    """Frame rate and latency counters for one pipeline stage."""
+    def __init__(self, name, window=30):
+        """
+        Args:
+        name (str): Name of the stage.
+        window (int): Number of recent frames the fps is computed over.
+
+        """
+        self.name = name
+        self.times = collections.deque(maxlen=window)  # perf_counter
+        self.count = 0
+        self.dropped = 0  # frames this stage never got to see
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.latency_last = 0.0
+
+    def record(self, latency):
+        """Counts a frame that took latency seconds to get through."""
+        self.times.append(time.perf_counter())
+        self.count += 1
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+        self.latency_last = latency
+
+    def fps(self):
+        if len(self.times) < 2:
+            return 0.0
+        return (len(self.times) - 1) / (self.times[-1] - self.times[0])
+
+    def summary(self):
+        return {'frames': self.count,
+                'dropped': self.dropped,
+                'fps': self.fps(),
+                'latency_mean': self.latency_total / max(self.count, 1),
+                'latency_max': self.latency_max}
+
+
+def ignore(item):
+    pass
+
+
+class FrameSlot():
+    """Holds only the newest item put in it. A reader waiting for something
+    newer than what it last saw gets the latest item, and anything put in
+    between is dropped rather than queued.
+
+    hold(item) is called for the slot when an item is put in it and for
+    the reader when get() returns it; release(item) when the slot drops
+    it. Readers call release(item) themselves once they're done with it.
+
+    """
+    def __init__(self, hold=ignore, release=ignore):
+        self.condition = threading.Condition()
+        self.item = None
+        self.seq = 0  # sequence number of self.item
+        self.closed = False
+        self.hold = hold
+        self.release = release
+
+    def put(self, item):
+        with self.condition:
+            self.hold(item)
+            if self.item is not None:
+                self.release(self.item)
+            self.seq += 1
+            self.item = item
+            self.condition.notify_all()
+            return self.seq
+
+    def get(self, last_seq, timeout=None):
+        """Waits for an item newer than last_seq.
+
+        Returns:
+        tuple: (seq, item), or (last_seq, None) on timeout or once closed.
+
+        """
+        with self.condition:
+            self.condition.wait_for(
+                lambda: self.seq > last_seq or self.closed, timeout)
+            if self.seq > last_seq:
+                self.hold(self.item)
+                return self.seq, self.item
+            return last_seq, None
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class FacePipeline():
+    """Face detection split into stages running concurrently:
+
+      capture: a thread pulling frames from the camera into a FrameSlot,
+      so the newest frame is always ready.
+      detect: a thread running the detector on the newest frame; frames
+      captured while it was busy are dropped, not queued.
+      display: optional, draws the latest detection on the latest frame
+      and shows it (runs in the thread calling FacePipeline.run(), since
+      cv2.imshow wants the main thread).
+
+    Each stage keeps a StageStats. Detection latency is measured from
+    the time the frame was captured.
+
+    Frames are held (see frame_sources) from capture until the results
+    consumer is done with them, so a camera source can't write over a
+    frame that is still being detected or shown.
+
+    """
+    def __init__(self, frames, detector=face.detect, display=True):
+        """
+        Args:
+        frames (iterable): Frames (numpy arrays), e.g. a source from
+        frame_sources.py. If it has a color(frame) method, the display
+        stage uses it to get a BGR image to draw on.
+        detector (callable): Takes a frame and returns (x, y, w, h) boxes.
+        display (bool): Show annotated frames in a window.
+
+        """
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.DEBUG)
+        self.frames = frames
+        self.color = getattr(frames, 'color', frame_sources.to_bgr)
+        self.detector = detector
+        self.display = display
+        self.hold = getattr(frames, 'hold', ignore)
+        self.release = getattr(frames, 'release', ignore)
+        self.frame_slot = FrameSlot(  # (frame, t_capture)
+            lambda item: self.hold(item[0]),
+            lambda item: self.release(item[0]))
+        self.result_slot = FrameSlot(  # detection dicts
+            lambda result: self.hold(result['frame']),
+            lambda result: self.release(result['frame']))
+        self.stats = {name: StageStats(name)
+                      for name in ('capture', 'detect', 'display')}
+        self.running = threading.Event()
+        self.threads = list()
+
+    def capture(self):
+        stats = self.stats['capture']
+        t_last = time.perf_counter()
+        frames = iter(self.frames)
+        try:
+            for frame in frames:
+                if not self.running.is_set():
+                    break
+                t_capture = time.perf_counter()
+                self.frame_slot.put((frame, t_capture))
+                stats.record(t_capture - t_last)  # frame interval
+                t_last = t_capture
+        finally:
+            self.running.clear()
+            self.frame_slot.close()
+            if hasattr(frames, 'close'):  # generator
+                frames.close()
+
+    def detect(self):
+        stats = self.stats['detect']
+        seq = 0
+        while True:
+            new_seq, item = self.frame_slot.get(seq)
+            if item is None:
+                break
+            stats.dropped += new_seq - seq - 1
+            seq = new_seq
+            frame, t_capture = item
+            try:
+                faces = self.detector(frame)
+                t_detected = time.perf_counter()
+                stats.record(t_detected - t_capture)
+                self.result_slot.put({'seq': seq,
+                                      'frame': frame,
+                                      'faces': faces,
+                                      't_capture': t_capture,
+                                      't_detected': t_detected})
+            finally:
+                self.release(frame)
+        self.result_slot.close()
+
+    def show(self, result):
+        """Draws result on its frame and shows it. Returns False once the
+        user pressed q.
+
+        """
+        image = self.color(result['frame'])
+        for dims in result['faces']:
+            cv2.rectangle(image, (dims[0], dims[1]), face.get_opp(dims),
+                          (255, 0, 0), 2)
+        cv2.imshow('robot eye', image)
+        return cv2.waitKey(1) & 0xFF != ord('q')
+
+    def start(self):
+        self.running.set()
+        for target in (self.capture, self.detect):
+            thread = threading.Thread(target=target, daemon=True,
+                                      name=target.__name__)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        self.running.clear()
+        for thread in self.threads:
+            thread.join()
+        self.threads = list()
+        if self.display:
+            cv2.destroyAllWindows()
+
+    def results(self, timeout=1.0):
+        """Yields detection dicts as they come out of the detect stage,
+        skipping ones the caller was too slow to see. Also runs the
+        display stage. A result's frame is valid until the caller asks for
+        the next result.
+
+        """
+        stats = self.stats['display']
+        seq = 0
+        while True:
+            new_seq, result = self.result_slot.get(seq, timeout)
+            if result is None:
+                if self.result_slot.closed:
+                    break
+                continue
+            try:
+                stats.dropped += new_seq - seq - 1
+                seq = new_seq
+                if self.display and not self.show(result):
+                    break
+                stats.record(time.perf_counter() - result['t_capture'])
+                yield result
+            finally:
+                self.release(result['frame'])
+
+    def run(self, on_result=None):
+        """Starts the pipeline and runs it until the frames run out or q is
+        pressed in the display window.
+
+        Args:
+        on_result (callable): Called with every detection dict.
+
+        Returns:
+        dict: Stage name --> StageStats.summary().
+
+        """
+        self.start()
+        try:
+            for result in self.results():
+                if on_result is not None:
+                    on_result(result)
+        finally:
+            self.stop()
+        return self.summary()
+
+    def summary(self):
+        return {name: stats.summary() for name, stats in self.stats.items()}
+
+
+def print_result(result):
+    latency = result['t_detected'] - result['t_capture']
+    for dims in result['faces']:
+        center = face.get_center(dims)
+        print("Faces: {}, X: {}, Y: {}, latency: {:.1f} ms".format(
+            len(result['faces']), center[0], center[1], latency * 1000))
+
+
+if __name__ == "__main__":
+    name, backend = detectors.choose()
+    motion_gate = gate.MotionGate(tracking.RoiDetector(
+        adaptive.AdaptiveDetector(detector=backend)))
+    pipeline = FacePipeline(frame_sources.PiCameraSource(), motion_gate)
+    for name, summary in pipeline.run(print_result).items():
+        print(name, summary)
+    print('Detection skipped on {:.0%} of frames'.format(
+        motion_gate.skip_ratio()))
@@ -0,0 +1,264 @@
+import config_log
+import logging
+import threading
+import time
+from config import config_follow
+from face_pipeline import StageStats
+import face
+from vision_worker import VisionWorker
+
+
+class PID():
+    """PID controller with output limits, integral clamping (anti windup)
+    and a limit on how fast the output may change."""
+    def __init__(self, kp, ki=0.0, kd=0.0, limit=None, rate_limit=None):
+        """
+        Args:
+        kp, ki, kd (float): Gains.
+        limit (float): Output is clamped to [-limit, limit]. None for no
+        limit.
+        rate_limit (float): Largest change of output per second. None for
+        no limit.
+
+        """
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.limit = limit
+        self.rate_limit = rate_limit
+        self.reset()
+
+    def reset(self):
+        self.integral = 0.0
+        self.last_error = None
+        self.last_t = None
+        self.output = 0.0
+
+    def clamp(self, value, limit):
+        if limit is None:
+            return value
+        return max(-limit, min(limit, value))
+
+    def update(self, error, t):
+        """New output for error measured at time t (seconds)."""
+        dt = None if self.last_t is None else t - self.last_t
+        derivative = 0.0
+        if dt:
+            self.integral += error * dt
+            if self.ki:
+                # the integral term alone may not exceed the output limit
+                self.integral = self.clamp(
+                    self.integral, self.limit and self.limit / self.ki)
+            derivative = (error - self.last_error) / dt
+        output = self.clamp(self.kp * error + self.ki * self.integral +
+                            self.kd * derivative, self.limit)
+        if dt and self.rate_limit is not None:
+            output = self.output + self.clamp(output - self.output,
+                                              self.rate_limit * dt)
+        self.last_error = error
+        self.last_t = t
+        self.output = output
+        return output
+
+
+class FaceFollower():
+    """Visual servoing: keeps a face in the middle of the picture by tilting
+    the camera (vision.Cam) and turning the car.
+
+    The vertical error drives a PID whose output is the change of the
+    camera's pulse length for this frame. The horizontal error drives a
+    PID whose output (-1 to 1) sets the speed the car point turns towards
+    the face at, as a fraction of turn_speed. Speeds are set straight
+    away, without the car's acceleration ramp, so commanding them never
+    holds up the next frame.
+
+    When no face has been seen for lost_timeout seconds the follower scans:
+    every scan_period seconds it steps the camera to the next of
+    scan_tilts, and point turns for one period after each sweep.
+
+    Latency from frame capture to actuator command is kept in
+    self.latency.
+
+    """
+    def __init__(self, car, cam, config=config_follow):
+        """
+        Args:
+        car (Car): Car to turn.
+        cam (Cam): Camera tilt servo.
+        config (dict): see config.config_follow.
+
+        """
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.DEBUG)
+        self.car = car
+        self.cam = cam
+        self.config = config
+        self.tilt_pid = PID(**config['tilt'])
+        self.steer_pid = PID(**config['steer'])
+        self.deadband = config['deadband']
+        self.lost_timeout = config['lost_timeout']
+        self.scan_tilts = config['scan_tilts']
+        self.scan_turn = config['scan_turn']
+        self.scan_period = config['scan_period']
+        self.turn_speed = config.get('turn_speed', 1.0)
+        self.next_scan = 0.0
+        self.last_seen = time.perf_counter()
+        self.turning = 0.0  # current point turn speed (0: braked)
+        self.scan_step = 0
+        self.latency = StageStats('follow')
+
+    def turn(self, u):
+        """Point turns at u * turn_speed, u from -1 (left) to 1 (right),
+        braking for 0.
+
+        """
+        speed = round(max(-1.0, min(1.0, u)) * self.turn_speed, 2)
+        if speed == self.turning:
+            return
+        if speed == 0:
+            self.car.brake()
+        else:
+            with self.car.lock:
+                self.car.apply_speeds(speed, -speed)
+        self.turning = speed
+
+    def steer(self, u):
+        """Point turns at a speed proportional to u, outside the
+        deadband."""
+        self.turn(0 if abs(u) < self.deadband else u)
+
+    def track(self, dims, shape, t):
+        """Commands the actuators for a face at dims in a frame of shape."""
+        height, width = shape[:2]
+        x, y = face.get_center(dims)
+        error_x = (x - width / 2) / (width / 2)  # -1 (left) to 1 (right)
+        error_y = y - height / 2  # pixels, positive below centre
+        step = self.tilt_pid.update(error_y, t)
+        if abs(step) >= 1:
+            self.cam.set_pl(int(round(self.cam.current_pl + step)))
+        self.steer(self.steer_pid.update(error_x, t))
+
+    def scan(self, t):
+        """One step of the search for a lost face."""
+        if t < self.next_scan:
+            return
+        self.next_scan = t + self.scan_period
+        tilts = self.scan_tilts
+        index = self.scan_step % (len(tilts) + 1)
+        if index < len(tilts):
+            self.turn(0)
+            self.cam.set_pl(tilts[index])
+        else:
+            self.turn(self.scan_turn)
+        self.scan_step += 1
+
+    def update(self, result):
+        """Takes a detection dict from face_pipeline.FacePipeline and acts
+        on it. Returns the latency from capture to command in seconds.
+
+        """
+        t = result['t_capture']
+        faces = result['faces']
+        if len(faces):
+            largest = max(faces, key=lambda dims: dims[2] * dims[3])
+            if t - self.last_seen > self.lost_timeout:
+                self.logger.debug('Face found again')
+                self.tilt_pid.reset()
+                self.steer_pid.reset()
+                self.scan_step = 0
+            self.last_seen = t
+            self.track(largest, result['frame'].shape, t)
+        elif t - self.last_seen > self.lost_timeout:
+            self.scan(t)
+        else:
+            self.turn(0)  # hold still for a moment, it may come back
+        latency = time.perf_counter() - t
+        self.latency.record(latency)
+        return latency
+
+    def stop(self):
+        self.turn(0)
+        self.car.brake()
+
+
+class FollowCommands():
+    """Face following as Carm commands, registered at runtime:
+
+        FollowCommands(robot, source, (source.height, source.width)).register()
+
+    The start command follows faces in a background thread until its stop
+    command (or the end of the frames).
+
+    """
+    def __init__(self, robot, frames, shape, config=config_follow):
+        """
+        Args:
+        robot (Carm): Robot to follow with.
+        frames (iterable): Gray frames, see VisionWorker.
+        shape (tuple): (height, width) of the frames.
+        config (dict): see config.config_follow.
+
+        """
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.DEBUG)
+        self.robot = robot
+        self.frames = frames
+        self.shape = shape
+        self.config = config
+        self.follower = None
+        self.worker = None
+        self.thread = None
+
+    def register(self, start_key='f', stop_key='x'):
+        commands = self.robot.commands
+        commands.register(start_key, 'follow face', self.start,
+                          subsystem='vision', before='j')
+        commands.register(stop_key, 'stop following', self.stop,
+                          category='stop', subsystem='vision', before='j')
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.follower = FaceFollower(self.robot.car, self.robot.cam,
+                                     self.config)
+        self.worker = VisionWorker(self.frames, self.shape)
+        self.thread = threading.Thread(target=self.run, name='follow',
+                                       daemon=True)
+        self.thread.start()
+
+    def run(self):
+        try:
+            self.logger.info('Vision: {}'.format(
+                self.worker.run(self.follower.update)))
+        finally:
+            self.follower.stop()
+            self.logger.info('Capture to command latency: {}'.format(
+                self.follower.latency.summary()))
+
+    def stop(self):
+        if self.thread is None:
+            return
+        while self.thread.is_alive() and not self.worker.running.is_set():
+            time.sleep(0.01)  # still starting up
+        self.worker.running.clear()
+        self.thread.join()
+        self.thread = None
+
+
+if __name__ == "__main__":
+    import carm
+    import config
+    import frame_sources
+
+    robot = carm.Carm(config.config_carm)
+    follower = FaceFollower(robot.car, robot.cam)
+    # Detection runs in its own process so it can't hold up motor commands
+    source = frame_sources.PiCameraSource()
+    worker = VisionWorker(source, (source.height, source.width))
+    try:
+        print(worker.run(follower.update))
+    finally:
+        follower.stop()
+        robot.power_off()
+        print('Capture to command latency: {}'.format(
+            follower.latency.summary()))
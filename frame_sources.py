@@ -0,0 +1,324 @@
+"""Frame sources for the vision code. Every source is an iterable of
+grayscale frames (2D uint8 numpy arrays) written into a small set of
+preallocated buffers, so no memory is allocated per frame.
+
+The file and synthetic sources only make a frame when asked for the next
+one, and a frame stays valid until the source has produced len(buffers)
+more frames. The camera runs on its own, so PiCameraSource reference
+counts its buffers: a frame stays valid until the loop over the source
+asks for the next one, or for as long as someone holds it with
+source.hold(frame) (undone with source.release(frame)).
+
+Colour is only made when asked for, with source.color(frame).
+
+"""
+import os
+import threading
+import time
+import cv2
+import numpy as np
+from config import config_pi_camera
+
+
+def to_bgr(frame):
+    """BGR copy of a gray or BGR frame, for drawing on."""
+    if frame.ndim == 2:
+        return cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+    return frame.copy()
+
+
+class PiCameraSource():
+    """Pi camera capturing unencoded YUV420 from the video port. Only the Y
+    (luminance) plane is handed out, which is the grayscale image, so no
+    colour conversion is done per frame.
+
+    The camera only writes into buffers nobody holds. When there is none,
+    it drops the frame (counted in self.dropped) instead of overwriting
+    one that is still being looked at.
+
+    """
+    def __init__(self, config=config_pi_camera, buffers=6):
+        """
+        Args:
+        config (dict): 'x_res', 'y_res' and 'framerate' of the camera.
+        buffers (int): Number of frame buffers. FacePipeline holds up to
+        four frames at a time, the camera writes into one more and keeps
+        the newest.
+
+        """
+        self.width = config['x_res']
+        self.height = config['y_res']
+        self.framerate = config['framerate']
+        # the camera pads YUV rows to 32 and the height to 16 pixels
+        self.padded_width = (self.width + 31) // 32 * 32
+        self.padded_height = (self.height + 15) // 16 * 16
+        self.frame_size = self.padded_width * self.padded_height * 3 // 2
+        self.buffers = [np.empty(self.frame_size, dtype=np.uint8)
+                        for i in range(buffers)]
+        self.frames = [buf[:self.padded_width * self.padded_height].reshape(
+            self.padded_height, self.padded_width)[:self.height, :self.width]
+            for buf in self.buffers]
+        self.holds = [0] * buffers  # holders of each buffer
+        self.index = None  # buffer with the newest frame
+        self.seq = 0  # frames written so far
+        self.dropped = 0  # frames the camera had no free buffer for
+        self.condition = threading.Condition()
+
+    def buffer_of(self, frame):
+        for i, gray in enumerate(self.frames):
+            if gray is frame or np.shares_memory(gray, frame):
+                return i
+        raise ValueError('Frame is not from this source')
+
+    def hold(self, frame):
+        """Keeps the camera from writing over frame until release(frame)."""
+        with self.condition:
+            self.holds[self.buffer_of(frame)] += 1
+
+    def release(self, frame):
+        with self.condition:
+            self.holds[self.buffer_of(frame)] -= 1
+
+    def write(self, data):
+        """Called by picamera with one whole YUV frame."""
+        with self.condition:
+            free = [i for i, holds in enumerate(self.holds)
+                    if holds == 0 and i != self.index]
+            if not free:
+                self.dropped += 1
+                return
+            i = free[0]
+            self.holds[i] += 1  # while writing
+        self.buffers[i][:] = np.frombuffer(data, dtype=np.uint8,
+                                           count=self.frame_size)
+        with self.condition:
+            self.holds[i] -= 1
+            self.index = i
+            self.seq += 1
+            self.condition.notify_all()
+
+    def flush(self):
+        pass
+
+    def __iter__(self):
+        from picamera import PiCamera
+        camera = PiCamera(resolution=(self.width, self.height),
+                          framerate=self.framerate)
+        seq = 0
+        held = None  # buffer of the frame handed out last
+        try:
+            camera.start_recording(self, format='yuv')
+            while True:
+                with self.condition:
+                    self.condition.wait_for(lambda: self.seq > seq, 1.0)
+                    if self.seq == seq:
+                        raise IOError('Camera stopped sending frames')
+                    seq = self.seq
+                    if held is not None:
+                        self.holds[held] -= 1
+                    held = self.index
+                    self.holds[held] += 1
+                yield self.frames[held]
+        finally:
+            camera.stop_recording()
+            camera.close()
+            if held is not None:
+                with self.condition:
+                    self.holds[held] -= 1
+
+    def color(self, frame):
+        """BGR image of the frame (from its Y, U and V planes)."""
+        try:
+            buf = self.buffers[self.buffer_of(frame)]
+        except ValueError:
+            return to_bgr(frame)
+        yuv = buf.reshape(self.padded_height * 3 // 2, self.padded_width)
+        bgr = cv2.cvtColor(yuv, cv2.COLOR_YUV2BGR_I420)
+        return bgr[:self.height, :self.width]
+
+
+class VideoFileSource():
+    """Recorded video (anything cv2.VideoCapture opens) as gray frames."""
+    def __init__(self, path, buffers=3, realtime=False, loop=False):
+        """
+        Args:
+        path (str): Video file.
+        buffers (int): Number of frame buffers in the ring.
+        realtime (bool): Pace frames at the video's frame rate instead of
+        as fast as they can be decoded.
+        loop (bool): Start over at the end of the video.
+
+        """
+        self.path = path
+        self.realtime = realtime
+        self.loop = loop
+        capture = cv2.VideoCapture(path)
+        if not capture.isOpened():
+            raise IOError('Could not open {}'.format(path))
+        self.width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.framerate = capture.get(cv2.CAP_PROP_FPS) or 30
+        capture.release()
+        self.bgr = [np.empty((self.height, self.width, 3), dtype=np.uint8)
+                    for i in range(buffers)]
+        self.frames = [np.empty((self.height, self.width), dtype=np.uint8)
+                       for i in range(buffers)]
+
+    def __iter__(self):
+        capture = cv2.VideoCapture(self.path)
+        index = 0
+        t_next = time.perf_counter()
+        try:
+            while True:
+                ok, bgr = capture.read(self.bgr[index])
+                if not ok:
+                    if self.loop:
+                        capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                        continue
+                    return
+                if bgr is not self.bgr[index]:  # decoder made a new array
+                    self.bgr[index][:] = bgr
+                cv2.cvtColor(self.bgr[index], cv2.COLOR_BGR2GRAY,
+                             dst=self.frames[index])
+                if self.realtime:
+                    t_next += 1 / self.framerate
+                    time.sleep(max(t_next - time.perf_counter(), 0))
+                yield self.frames[index]
+                index = (index + 1) % len(self.frames)
+        finally:
+            capture.release()
+
+    def color(self, frame):
+        for bgr, gray in zip(self.bgr, self.frames):
+            if gray is frame:
+                return bgr.copy()
+        return to_bgr(frame)
+
+
+class ImageDirectorySource():
+    """Still images in a directory, in file name order, as gray frames.
+    Images of another size than the first are resized to it.
+
+    """
+    EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.pgm', '.ppm')
+
+    def __init__(self, path, buffers=3, framerate=None, loop=False):
+        """
+        Args:
+        path (str): Directory of images.
+        buffers (int): Number of frame buffers in the ring.
+        framerate (float): Frames per second to pace at, None for as fast
+        as they can be read.
+        loop (bool): Start over after the last image.
+
+        """
+        self.path = path
+        self.framerate = framerate
+        self.loop = loop
+        self.names = sorted(name for name in os.listdir(path)
+                            if name.lower().endswith(self.EXTENSIONS))
+        if not self.names:
+            raise IOError('No images in {}'.format(path))
+        first = self.read(self.names[0])
+        self.height, self.width = first.shape
+        self.frames = [np.empty((self.height, self.width), dtype=np.uint8)
+                       for i in range(buffers)]
+
+    def read(self, name):
+        image = cv2.imread(os.path.join(self.path, name),
+                           cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            raise IOError('Could not read {}'.format(name))
+        return image
+
+    def __iter__(self):
+        i = 0
+        t_next = time.perf_counter()
+        while i < len(self.names) or self.loop:
+            frame = self.frames[i % len(self.frames)]
+            image = self.read(self.names[i % len(self.names)])
+            if image.shape == frame.shape:
+                frame[:] = image
+            else:
+                cv2.resize(image, (self.width, self.height), dst=frame,
+                           interpolation=cv2.INTER_AREA)
+            if self.framerate:
+                t_next += 1 / self.framerate
+                time.sleep(max(t_next - time.perf_counter(), 0))
+            yield frame
+            i += 1
+
+    def color(self, frame):
+        return to_bgr(frame)
+
+
+class SyntheticSource():
+    """Generated gray frames for benchmarking without a camera: a textured
+    background with a patch (a face image if given) moving across it.
+
+    """
+    def __init__(self, width=config_pi_camera['x_res'],
+                 height=config_pi_camera['y_res'], count=300,
+                 framerate=None, patch=None, buffers=3, seed=0, speed=1.0):
+        """
+        Args:
+        width, height (int): Frame size.
+        count (int): Number of frames, None for endless.
+        framerate (float): Frames per second to pace at, None for as fast
+        as possible.
+        patch (numpy array): Gray image moved across the frame. Defaults
+        to a bright square. Only a given patch (a face image) counts as
+        ground truth, see boxes().
+        buffers (int): Number of frame buffers in the ring.
+        seed (int): Seed of the background noise.
+        speed (float): How fast the patch moves, 0 for a still scene.
+
+        """
+        self.width = width
+        self.height = height
+        self.count = count
+        self.framerate = framerate
+        self.speed = speed
+        rng = np.random.default_rng(seed)
+        self.background = rng.integers(60, 120, (height, width),
+                                       dtype=np.uint8)
+        self.face = patch is not None
+        if patch is None:
+            patch = np.full((height // 4, height // 4), 220, dtype=np.uint8)
+        self.patch = patch
+        self.frames = [np.empty((height, width), dtype=np.uint8)
+                       for i in range(buffers)]
+
+    def position(self, i):
+        """Top left corner of the patch in frame i."""
+        ph, pw = self.patch.shape[:2]
+        i *= self.speed
+        x = int((self.width - pw) * (0.5 + 0.5 * np.sin(i / 20)))
+        y = int((self.height - ph) * (0.5 + 0.3 * np.cos(i / 31)))
+        return x, y
+
+    def boxes(self, i):
+        """Ground truth of frame i: the patch as (x, y, w, h), None (not
+        scored) if the patch is the default square, which is no face."""
+        if not self.face:
+            return None
+        ph, pw = self.patch.shape[:2]
+        return [self.position(i) + (pw, ph)]
+
+    def __iter__(self):
+        i = 0
+        t_next = time.perf_counter()
+        while self.count is None or i < self.count:
+            frame = self.frames[i % len(self.frames)]
+            frame[:] = self.background
+            x, y = self.position(i)
+            ph, pw = self.patch.shape[:2]
+            frame[y:y + ph, x:x + pw] = self.patch
+            if self.framerate:
+                t_next += 1 / self.framerate
+                time.sleep(max(t_next - time.perf_counter(), 0))
+            yield frame
+            i += 1
+
+    def color(self, frame):
+        return to_bgr(frame)
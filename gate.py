@@ -0,0 +1,73 @@
+import time
+import cv2
+import numpy as np
+
+
+class MotionGate():
+    """Skips detection on frames where the scene hasn't changed. Each frame
+    is shrunk to a thumbnail and compared with the thumbnail of the last
+    frame the detector ran on; if too few pixels changed, the faces found
+    then are returned again. A fresh detection is forced once the last one
+    is max_age seconds old.
+
+    Call it like the detector it wraps.
+
+    """
+    def __init__(self, detector, size=(40, 30), pixel_threshold=12,
+                 min_changed=0.01, max_age=1.0):
+        """
+        Args:
+        detector (callable): Detector to gate, e.g. face.detect or a
+        tracking.RoiDetector.
+        size (tuple): (w, h) of the thumbnails compared.
+        pixel_threshold (int): Gray levels a thumbnail pixel has to change
+        by to count as changed.
+        min_changed (float): Fraction of changed pixels that makes the
+        detector run.
+        max_age (float): Seconds after which the detector runs anyway.
+
+        """
+        self.detector = detector
+        self.size = size
+        self.pixel_threshold = pixel_threshold
+        self.min_changed = min_changed
+        self.max_age = max_age
+        self.thumb = np.empty(size[::-1], dtype=np.uint8)
+        self.reference = np.empty(size[::-1], dtype=np.uint8)
+        self.diff = np.empty(size[::-1], dtype=np.uint8)
+        self.faces = None  # result of the last detection
+        self.t_detected = None
+        self.stats = {'frames': 0, 'skipped': 0}
+
+    def changed(self, frame):
+        """Fraction of thumbnail pixels changed since the last detection."""
+        gray = (cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3
+                else frame)
+        cv2.resize(gray, self.size, dst=self.thumb,
+                   interpolation=cv2.INTER_AREA)
+        if self.faces is None:
+            return 1.0
+        cv2.absdiff(self.thumb, self.reference, dst=self.diff)
+        return (np.count_nonzero(self.diff > self.pixel_threshold) /
+                self.diff.size)
+
+    def __call__(self, frame, t=None, **kwargs):
+        """Faces in frame. t (seconds) is passed on to the detector when
+        given, so the detector must take it (tracking.RoiDetector does).
+
+        """
+        now = time.perf_counter() if t is None else t
+        self.stats['frames'] += 1
+        if (self.changed(frame) < self.min_changed and
+                now - self.t_detected < self.max_age):
+            self.stats['skipped'] += 1
+            return self.faces
+        self.reference[:] = self.thumb
+        self.t_detected = now
+        self.faces = (self.detector(frame, **kwargs) if t is None else
+                      self.detector(frame, t, **kwargs))
+        return self.faces
+
+    def skip_ratio(self):
+        """Fraction of frames the detector didn't have to run on."""
+        return self.stats['skipped'] / max(self.stats['frames'], 1)
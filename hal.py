@@ -0,0 +1,45 @@
+"""Hardware abstraction layer. Picks the backend the robot's modules talk
+to: the real Raspberry Pi ('pi') or the in process simulation ('sim').
+The CARM_BACKEND environment variable overrides config_hal['backend'].
+
+Modules use hal.GPIO in place of RPi.GPIO and hal.i2c for the PCA9685
+(None meaning the real I2C bus).
+
+"""
+import config_log
+import logging
+import os
+from config import config_hal
+
+logger = logging.getLogger(__name__)
+
+
+def backend_name():
+    return os.environ.get('CARM_BACKEND', config_hal['backend'])
+
+
+def pi_backend(config):
+    import RPi.GPIO as GPIO
+    GPIO.setmode(GPIO.BCM)
+    return GPIO, None
+
+
+def sim_backend(config):
+    import sim
+    gpio = sim.SimGPIO()
+    gpio.setmode(gpio.BCM)
+    for pin, level in config.get('inputs', dict()).items():
+        gpio.set_input(pin, level)
+    for echo in config.get('echoes', list()):
+        gpio.add_echo(echo['trig'], echo['echo'], echo.get('distance'))
+    return gpio, sim.SimI2C(config.get('i2c_latency', 0.0002))
+
+
+BACKENDS = {'pi': pi_backend, 'sim': sim_backend}
+
+name = backend_name()
+if name not in BACKENDS:
+    raise ValueError('Unknown backend {}, choose from {}'.format(
+        name, ', '.join(BACKENDS)))
+GPIO, i2c = BACKENDS[name](config_hal.get(name, dict()))
+logger.debug('Using {} backend'.format(name))
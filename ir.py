@@ -1,13 +1,17 @@
 import config_log
 import logging
-import RPi.GPIO as GPIO
+from hal import GPIO
+import threading
 import time
 
-GPIO.setmode(GPIO.BCM)
-
 
 class IRSensor():
-    """Class for OSOYOO IR Infrared Obstacle Avoidance Sensor Module"""
+    """Class for OSOYOO IR Infrared Obstacle Avoidance Sensor Module. Changes
+    of the output are picked up with GPIO edge callbacks, debounced,
+    logged in a fixed size transition history and passed on to
+    subscribers.
+
+    """
     def __init__(self, config):
         """
         Args:
@@ -15,17 +19,33 @@ class IRSensor():
         for the following values:
             'name' (str): name of IR sensor
             'pin' (int): BCM number for input (sensor --> pi)  GPIO pin
+            'debounce' (float): Optional. Seconds the output must settle
+            for before another transition counts (default 0.005).
+            'history' (int): Optional. Number of transitions kept
+            (default 64).
 
         """
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.DEBUG)
         self.pin = config['pin']
         self.name = config['name']
-        self.setup(self.pin)  # 1: no interrupt, 0: interrupt
-        self.signal = self.check()
+        self.debounce_ns = int(config.get('debounce', 0.005) * 1e9)
+        self.history_size = config.get('history', 64)
+        # transition ring buffer: perf_counter_ns and new level
+        self.history_times = [0] * self.history_size
+        self.history_levels = [0] * self.history_size
+        self.history_index = 0  # next slot to write
+        self.transitions = 0  # total transitions seen
+        self.subscribers = list()
+        self.lock = threading.Lock()
+        self.recheck = None  # timer to read the pin after a bounce
+        self.last_ns = 0  # time of last accepted transition
+        self.setup(self.pin)
 
     def setup(self, pin):
         GPIO.setup(pin, GPIO.IN)
+        self.signal = self.check()  # 1: no interrupt, 0: interrupt
+        GPIO.add_event_detect(pin, GPIO.BOTH, callback=self.on_edge)
 
     def check(self):
         """Gives a value based on if there is an object blocking or reflecting
@@ -39,44 +59,106 @@ class IRSensor():
         int: Returns 1 if there is no obstruction, 0 if there is an
         obstruction.
         """
-        self.signal = GPIO.input(self.pin)
-        interrupt = str()
-        if self.signal == 0:
-            pass
-        elif self.signal == 1:
-            interrupt = "no "
-        else:
-            print("Check sensor")
-        return self.signal
-
-    def run_sensor(self, timeout=0, interval=1):
-        """Continuously checks if there is an obstruction blocking the sensor
-        for user specified time or indefinitely in user specified
-        intervals.
+        return GPIO.input(self.pin)
+
+    def on_edge(self, channel=None):
+        """GPIO callback for both edges. A new level is accepted right away
+        unless the last transition was less than the debounce time ago,
+        in which case the pin is read again once the output has settled.
+
+        """
+        now = time.perf_counter_ns()
+        level = GPIO.input(self.pin)
+        with self.lock:
+            if level == self.signal:
+                return
+            wait_ns = self.last_ns + self.debounce_ns - now
+            if wait_ns > 0:
+                if self.recheck is None:
+                    self.recheck = threading.Timer(wait_ns / 1e9,
+                                                   self.on_settled)
+                    self.recheck.daemon = True
+                    self.recheck.start()
+                return
+            self.record(level, now)
+        self.notify(level, now)
+
+    def on_settled(self):
+        with self.lock:
+            self.recheck = None
+        self.on_edge()
+
+    def record(self, level, t_ns):
+        """Stores a transition. Caller holds self.lock."""
+        self.signal = level
+        self.last_ns = t_ns
+        self.history_times[self.history_index] = t_ns
+        self.history_levels[self.history_index] = level
+        self.history_index = (self.history_index + 1) % self.history_size
+        self.transitions += 1
+
+    def notify(self, level, t_ns):
+        for callback in self.subscribers:
+            try:
+                callback(self, level, t_ns)
+            except Exception:
+                self.logger.exception('{} sensor subscriber failed'.format(
+                    self.name))
+
+    def subscribe(self, callback):
+        """Registers callback(sensor, level, t_ns) to be called from the GPIO
+        thread on every debounced transition. Keep callbacks short.
+
+        """
+        # copy on write so notify() can iterate without holding a lock
+        self.subscribers = self.subscribers + [callback]
+
+    def unsubscribe(self, callback):
+        self.subscribers = [sub for sub in self.subscribers
+                            if sub != callback]
+
+    def history(self):
+        """Transitions still in the ring buffer, oldest first.
+
+        Returns:
+        list: (perf_counter_ns, level) tuples.
+
+        """
+        with self.lock:
+            count = min(self.transitions, self.history_size)
+            start = (self.history_index - count) % self.history_size
+            return [(self.history_times[i % self.history_size],
+                     self.history_levels[i % self.history_size])
+                    for i in range(start, start + count)]
+
+    def run_sensor(self, timeout=0):
+        """Logs every obstruction change for user specified time or
+        indefinitely. Transitions come from edge callbacks so nothing is
+        polled.
 
         Args:
         timeout (float): Number of seconds to run the sensor. If set to 0,
         runs indefinitely.
-        interval (float): How often to check sensors (in seconds).
 
         Returns:
         None.
 
         """
-        if timeout > 0:
-            t0, t1 = time.time(), time.time()
-            while t1 - t0 < timeout:
-                self.check()
-                t1 = time.time()
-                time.sleep(interval)
-        else:  # check indefinitely
-            try:
-                while True:
-                    self.check()
-                    time.sleep(interval)
-            except KeyboardInterrupt:
-                self.logger.debug("{} sensor stopped by user".format(
-                    self.name))
+        def log_transition(sensor, level, t_ns):
+            self.logger.debug('{} sensor: {}obstruction'.format(
+                sensor.name, 'no ' if level else ''))
+
+        self.subscribe(log_transition)
+        try:
+            if timeout > 0:
+                time.sleep(timeout)
+            else:  # log indefinitely
+                threading.Event().wait()
+        except KeyboardInterrupt:
+            self.logger.debug("{} sensor stopped by user".format(
+                self.name))
+        finally:
+            self.unsubscribe(log_transition)
 
 
 if __name__ == "__main__":
@@ -88,5 +170,7 @@ if __name__ == "__main__":
 
     ir_left = IRSensor(config_ir_left)
     ir_right = IRSensor(config_ir_right)
+    ir_left.run_sensor(5)
+    print(ir_left.history())
 
-    GPIO.cleanup
+    GPIO.cleanup()
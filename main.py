@@ -1,9 +1,12 @@
 import logging
 import carm
 import config
-import RPi.GPIO as GPIO
+from hal import GPIO
+import sys
 import time
 import pprint
+import teleop
+import scheduler
 # from line_mode import line_following_mode
 # import face
 
@@ -32,6 +35,18 @@ def manual_mode(robot):
     enter_menu(robot)
 
 
+def read_cmd(robot, prompt='> '):
+    """Same as input(prompt). Only a line from the operator counts as the
+    watchdog's heartbeat, so an open ended drive ('w') is braked
+    heartbeat_timeout seconds after the last command if the operator or
+    the terminal stalls.
+
+    """
+    line = input(prompt)
+    robot.watchdog.heartbeat()
+    return line
+
+
 def enter_menu(robot):
 
     menu_str = generate_menu_str(robot)
@@ -47,13 +62,16 @@ def enter_menu(robot):
     user_cmd_count = int()
     start_time = time.time()
     end_time = float()
+    # arm and camera moves run on worker threads, so the menu takes the
+    # next command while they do
+    dispatcher = scheduler.CmdScheduler(robot)
 
     try:
         print(menu_str)
         while user_cmd != 'j':
-            user_cmd = input('> ')
+            user_cmd = read_cmd(robot)
 
-            if user_cmd in robot.cmd_dct.keys():
+            if user_cmd in robot.commands:
                 user_cmd_count += 1
 
                 # record end time of PREVIOUS command
@@ -73,14 +91,16 @@ def enter_menu(robot):
                 # record start time of CURRENT command
                 start_time = time.time()
 
-                robot.execute_single_cmd(user_cmd)
+                dispatcher.dispatch(user_cmd)
 
             else:
                 print('Please choose VALID a menu command\n')
-            if user_cmd not in ('u', 'irl', 'irr'):
+            cmd = robot.commands.get(user_cmd)
+            if cmd is None or cmd.category != 'sensor':
                 print(menu_str)
 
         # Shutdown
+        dispatcher.shutdown()
         cmd_history = cmd_history[1:]  # Omits the '' cmd
         print("\n\nYour commands this session were: ")
         robot.write_cmds_to_txt(cmd_history)
@@ -89,6 +109,7 @@ def enter_menu(robot):
         robot.power_off()
         print("Goodbye!")
     except:
+        dispatcher.shutdown()
         robot.power_off()
         time.sleep(10)
         cleanup()
@@ -96,79 +117,86 @@ def enter_menu(robot):
 
 def generate_menu_str(robot):
     # aligning all colons in the menu
-    width = max([len(key) for key in robot.cmd_dct.keys()])
-    menu_str = '\n'.join([ok.rjust(width) + ": " +
-                          robot.cmd_dct[ok][0] for ok in [cmd[0] for cmd in robot.cmd_list]])
+    width = max([len(key) for key in robot.commands.keys()])
+    menu_str = '\n'.join([cmd.key.rjust(width) + ": " + cmd.name
+                          for cmd in robot.commands.values()])
     return menu_str
 
 
+# Example Commands
+cmds = [
+    {'str': 'n', 'time': 2},
+    {'str': 'p', 'time': 2},
+    {'str': 'g', 'time': 1},
+    {'str': 'o', 'time': 1},
+    {'str': '3', 'time': 1},
+    {'str': '1', 'time': 1},
+    {'str': '2', 'time': 1},
+]
+
+right_90 = [{'str': 'd', 'time': 0.523},
+            {'str': 's', 'time': 0.641},
+            {'str': 'd', 'time': 0.912},
+            {'str': 's', 'time': 0.736},
+            {'str': 'd', 'time': 1.129},
+            {'str': 's', 'time': 0.734},
+            {'str': 'd', 'time': 1.288},
+            {'str': 'd', 'time': 0.444},
+            {'str': 's', 'time': 0.763},
+            {'str': 'd', 'time': 1.108},
+            {'str': 's', 'time': 0.664},
+            {'str': 'd', 'time': 1.076},
+            {'str': 's', 'time': 0.777},
+            {'str': 'd', 'time': 1.163},
+            {'str': 's', 'time': 0.758},
+            {'str': 'd', 'time': 1.107},
+            {'str': 's', 'time': 0.668},
+            {'str': 'd', 'time': 1.303},
+            {'str': 's', 'time': 0.648},
+            {'str': 'd', 'time': 1.46},
+            {'str': 's', 'time': 0.689},
+            {'str': 'd', 'time': 1.43},
+            {'str': 's', 'time': 0.805},
+            {'str': 'd', 'time': 2.049},
+            {'str': 's', 'time': 1.041},
+            {'str': ' ', 'time': 14.953}]
+
+left_90 = [{'str': 'a', 'time': 1.046},
+           {'str': 's', 'time': 0.896},
+           {'str': 'a', 'time': 1.022},
+           {'str': 'a', 'time': 0.853},
+           {'str': 's', 'time': 1.035},
+           {'str': 'a', 'time': 1.28},
+           {'str': 's', 'time': 1.088},
+           {'str': 'a', 'time': 1.367},
+           {'str': 's', 'time': 1.055},
+           {'str': 'a', 'time': 1.327},
+           {'str': 's', 'time': 0.918},
+           {'str': 'a', 'time': 1.152},
+           {'str': 's', 'time': 1.286},
+           {'str': 'a', 'time': 1.196},
+           {'str': 's', 'time': 1.067},
+           {'str': 'a', 'time': 1.185},
+           {'str': 's', 'time': 1.534},
+           {'str': 'a', 'time': 2.046},
+           {'str': 's', 'time': 0.773},
+           {'str': 'd', 'time': 0.515},
+           {'str': ' ', 'time': 9.85},
+           {'str': 'j', 'time': 0.0}]
+
+
 if __name__ == "__main__":
     robot = carm.Carm(config.config_carm)
 
     robot.car.rm.logger.setLevel(logging.INFO)
     robot.car.lm.logger.setLevel(logging.INFO)
 
-    manual_mode(robot)
+    robot.watchdog.start()
+    if sys.argv[1:] == ['teleop']:  # single keypress control
+        teleop.teleop_mode(robot)
+    else:
+        manual_mode(robot)
+    robot.watchdog.stop()
+    print('Watchdog: {}'.format(robot.watchdog.summary()))
+    print('Command timing (s): {}'.format(robot.commands.stats()))
     cleanup()
-
-    # Example Commands
-    cmds = [
-        {'str': 'n', 'time': 2},
-        {'str': 'p', 'time': 2},
-        {'str': 'g', 'time': 1},
-        {'str': 'o', 'time': 1},
-        {'str': '3', 'time': 1},
-        {'str': '1', 'time': 1},
-        {'str': '2', 'time': 1},
-    ]
-
-    right_90 = [{'str': 'd', 'time': 0.523},
-                {'str': 's', 'time': 0.641},
-                {'str': 'd', 'time': 0.912},
-                {'str': 's', 'time': 0.736},
-                {'str': 'd', 'time': 1.129},
-                {'str': 's', 'time': 0.734},
-                {'str': 'd', 'time': 1.288},
-                {'str': 'd', 'time': 0.444},
-                {'str': 's', 'time': 0.763},
-                {'str': 'd', 'time': 1.108},
-                {'str': 's', 'time': 0.664},
-                {'str': 'd', 'time': 1.076},
-                {'str': 's', 'time': 0.777},
-                {'str': 'd', 'time': 1.163},
-                {'str': 's', 'time': 0.758},
-                {'str': 'd', 'time': 1.107},
-                {'str': 's', 'time': 0.668},
-                {'str': 'd', 'time': 1.303},
-                {'str': 's', 'time': 0.648},
-                {'str': 'd', 'time': 1.46},
-                {'str': 's', 'time': 0.689},
-                {'str': 'd', 'time': 1.43},
-                {'str': 's', 'time': 0.805},
-                {'str': 'd', 'time': 2.049},
-                {'str': 's', 'time': 1.041},
-                {'str': ' ', 'time': 14.953}]
-
-    left_90 = [{'str': 'a', 'time': 1.046},
-               {'str': 's', 'time': 0.896},
-               {'str': 'a', 'time': 1.022},
-               {'str': 'a', 'time': 0.853},
-               {'str': 's', 'time': 1.035},
-               {'str': 'a', 'time': 1.28},
-               {'str': 's', 'time': 1.088},
-               {'str': 'a', 'time': 1.367},
-               {'str': 's', 'time': 1.055},
-               {'str': 'a', 'time': 1.327},
-               {'str': 's', 'time': 0.918},
-               {'str': 'a', 'time': 1.152},
-               {'str': 's', 'time': 1.286},
-               {'str': 'a', 'time': 1.196},
-               {'str': 's', 'time': 1.067},
-               {'str': 'a', 'time': 1.185},
-               {'str': 's', 'time': 1.534},
-               {'str': 'a', 'time': 2.046},
-               {'str': 's', 'time': 0.773},
-               {'str': 'd', 'time': 0.515},
-               {'str': ' ', 'time': 9.85},
-               {'str': 'j', 'time': 0.0}]
-
@@ -0,0 +1,98 @@
+import clocks
+import trajectory
+
+
+def schedule(moves):
+    """Groups sampled trajectories by control tick.
+
+    Args:
+    moves (dict): ServoMotor --> list of (tick, pulse length).
+
+    Returns:
+    list: (tick, [(servo, pulse length), ...]) in tick order.
+
+    """
+    ticks = dict()  # tick --> list of (servo, pulse length)
+    for servo, samples in moves.items():
+        for tick, pl in samples:
+            ticks.setdefault(tick, list()).append((servo, pl))
+    return sorted(ticks.items(), key=lambda item: item[0])
+
+
+def apply(updates):
+    """Stages one tick's (servo, pulse length) updates and flushes each
+    PCA9685 once."""
+    buses = set()
+    for servo, pl in updates:
+        servo.current_pl = pl
+        servo.powered = True
+        servo.pwm.stage(servo.channel, 0, pl)
+        buses.add(servo.pwm)
+    for bus in buses:
+        bus.flush()
+
+
+def play(moves, clock=None):
+    """Plays back sampled trajectories for several servos at once. Each
+    control tick stages one update per servo and then flushes each
+    PCA9685 once, so servos that move together share the same deadlines,
+    and servos on neighbouring channels share block writes.
+
+    Args:
+    moves (dict): ServoMotor --> list of (tick, pulse length) as returned
+    by trajectory.sample().
+    clock (RealClock or VirtualClock): Clock the ticks are scheduled on.
+    Defaults to clocks.get_clock().
+
+    Returns:
+    None
+
+    """
+    clock = clock or clocks.get_clock()
+    t0 = clock.now()
+    for tick, updates in schedule(moves):
+        clock.sleep_until(t0 + tick / trajectory.CONTROL_RATE)
+        apply(updates)
+
+
+def move_together(goals, shape='trapezoid', clock=None):
+    """Moves several servos at the same time so that they all start and
+    finish together. Every servo is stretched to the duration of the
+    slowest move. A stretched move changes its pulse length on more
+    control ticks, so it can take more I2C writes than the same move made
+    alone at full speed; the gain is in time, not bus traffic.
+
+    Args:
+    goals (iterable): (servo, end_pl, duration) tuples. A duration of None
+    uses the servo's max_vel and max_accel to work out how long its
+    move needs.
+    shape (str): 'trapezoid' or 's_curve'.
+    clock (RealClock or VirtualClock): See play().
+
+    Returns:
+    None
+
+    """
+    play(together(goals, shape), clock)
+
+
+def together(goals, shape='trapezoid'):
+    """Samples the moves of move_together() without playing them.
+
+    Returns:
+    dict: ServoMotor --> list of (tick, pulse length), for play().
+
+    """
+    goals = list(goals)  # iterated twice
+    durations = list()
+    for servo, end_pl, duration in goals:
+        if duration is None:
+            duration = trajectory.duration_of(
+                servo.current_pl, end_pl, None, servo.max_vel,
+                servo.max_accel, shape)
+        durations.append(duration)
+    duration = max(durations, default=0)
+
+    return {servo: trajectory.sample(servo.current_pl, end_pl, duration,
+                                     shape=shape)
+            for servo, end_pl, _ in goals}
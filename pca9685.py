@@ -0,0 +1,163 @@
+import config_log
+import logging
+import math
+import threading
+import Adafruit_PCA9685
+import hal
+
+PCA9685_ADDRESS = 0x40
+PWM_FREQ = 60  # servo period of 1/(60 s^-1)
+NUM_CHANNELS = 16
+
+# Registers
+MODE1 = 0x00
+LED0_ON_L = 0x06
+ALL_LED_OFF_H = 0xFD
+
+# Bits
+AI = 0x20  # MODE1 register auto increment
+FULL_OFF = 0x1000  # bit 4 of LEDn_OFF_H, output held low
+
+_buses = dict()  # address --> PCA9685Bus, one per chip for the process
+_buses_lock = threading.Lock()
+
+
+class PCA9685Bus():
+    """Driver for a single PCA9685 shared by every servo on the board. The
+    chip is reset once, the prescaler is cached so the frequency is only
+    reprogrammed when it actually changes, and all register access goes
+    through a lock so servos can be driven from several threads.
+
+    A shadow copy of the 16 channel registers is kept so that updates can
+    be staged (ServoMotor updates during a control tick) and flushed
+    together. Only channels that changed are written, and neighbouring
+    channels go out in one auto increment block write.
+
+    """
+    def __init__(self, address=PCA9685_ADDRESS, i2c=None, freq=PWM_FREQ):
+        """
+        Args:
+        address (int): I2C address of the PCA9685.
+        i2c (module): Module with a get_i2c_device function. None uses
+        Adafruit_GPIO.I2C (the real bus).
+        freq (int): PWM frequency in Hz.
+
+        """
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.DEBUG)
+        self.lock = threading.RLock()
+        self.address = address
+        self.prescale = None
+        self.freq = None
+        self.shadow = [(0, 0)] * NUM_CHANNELS  # (on, off) of every channel
+        self.dirty = set()  # channels staged but not yet written
+        with self.lock:
+            self.chip = Adafruit_PCA9685.PCA9685(address=address, i2c=i2c)
+            self.device = self.chip._device
+            self.device.write8(MODE1, self.device.readU8(MODE1) | AI)
+        self.set_pwm_freq(freq)
+
+    @staticmethod
+    def compute_prescale(freq):
+        """Prescale register value for freq (same rounding as Adafruit)."""
+        return int(math.floor(25000000.0 / 4096.0 / float(freq) - 1.0 + 0.5))
+
+    def set_pwm_freq(self, freq):
+        """Sets the PWM frequency, skipping the sleep/restart cycle on the
+        chip if the prescaler is already programmed for freq.
+
+        Args:
+        freq (int): PWM frequency in Hz.
+
+        Returns:
+        None
+
+        """
+        prescale = self.compute_prescale(freq)
+        with self.lock:
+            if prescale == self.prescale:
+                return
+            self.chip.set_pwm_freq(freq)
+            self.prescale = prescale
+            self.freq = freq
+        self.logger.debug('0x{:02x} prescale set to {} ({} Hz)'.format(
+            self.address, prescale, freq))
+
+    def stage(self, channel, on, off):
+        """Updates the shadow registers of channel without touching the
+        chip. Call flush() to write the staged channels.
+
+        """
+        with self.lock:
+            if self.shadow[channel] != (on, off):
+                self.shadow[channel] = (on, off)
+                self.dirty.add(channel)
+
+    def flush(self):
+        """Writes every staged channel that changed. Runs of consecutive
+        channels are written with a single block write.
+
+        Returns:
+        int: Number of I2C block writes made.
+
+        """
+        with self.lock:
+            if not self.dirty:
+                return 0
+            channels = sorted(self.dirty)
+            self.dirty.clear()
+            runs = [[channels[0]]]
+            for channel in channels[1:]:
+                if channel == runs[-1][-1] + 1:
+                    runs[-1].append(channel)
+                else:
+                    runs.append([channel])
+            for run in runs:
+                data = list()
+                for channel in run:
+                    on, off = self.shadow[channel]
+                    data += [on & 0xFF, on >> 8, off & 0xFF, off >> 8]
+                self.device.writeList(LED0_ON_L + 4 * run[0], data)
+            return len(runs)
+
+    def set_pwm(self, channel, on, off):
+        """Sets a single channel right away (and any other staged channels
+        along with it).
+
+        """
+        with self.lock:
+            self.stage(channel, on, off)
+            self.flush()
+
+    def all_off(self):
+        """Stops the pulses to every servo with a single register write. The
+        servos go limp where they are. See servos.all_off(), which also
+        keeps the ServoMotor objects in step.
+
+        """
+        with self.lock:
+            self.device.write8(ALL_LED_OFF_H, FULL_OFF >> 8)
+            self.shadow = [(0, FULL_OFF)] * NUM_CHANNELS
+            self.dirty.clear()
+
+
+def get_bus(address=PCA9685_ADDRESS, i2c=None, freq=PWM_FREQ):
+    """Returns the process wide PCA9685Bus for address, creating it on the
+    first call. Later calls reuse the same chip handle (i2c is only used
+    on creation, defaulting to the bus of the hal backend) and only touch
+    the chip if freq differs.
+
+    """
+    with _buses_lock:
+        bus = _buses.get(address)
+        if bus is None:
+            bus = PCA9685Bus(address, i2c or hal.i2c, freq)
+            _buses[address] = bus
+    bus.set_pwm_freq(freq)
+    return bus
+
+
+def reset_buses():
+    """Forgets all the cached buses (the next get_bus recreates them)."""
+    with _buses_lock:
+        _buses.clear()
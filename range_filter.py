@@ -0,0 +1,109 @@
+import time
+import numpy as np
+
+
+class RangeFilter():
+    """Streaming filter for noisy range readings (e.g. the HC-SR04). Pings
+    are kept in a fixed size ring buffer. Each accepted ping updates a
+    median of the last N pings, an exponential moving average of that
+    median, and the closing speed, so that reading them costs O(1).
+
+    Pings implying a speed above max_speed are rejected as outliers,
+    unless max_rejects of them come in a row, in which case the object
+    really did jump and the filter follows it.
+
+    """
+    def __init__(self, size=5, alpha=0.4, max_speed=300, max_rejects=3):
+        """
+        Args:
+        size (int): Number of pings in the median window.
+        alpha (float): Weight of the newest median in the moving average
+        (0 < alpha <= 1).
+        max_speed (float): Fastest believable change in distance (cm/s).
+        max_rejects (int): Rejections in a row before a jump is accepted.
+
+        """
+        self.size = size
+        self.alpha = alpha
+        self.max_speed = max_speed
+        self.max_rejects = max_rejects
+        self.distances = np.full(size, np.nan)  # ring buffer (cm)
+        self.times_ns = np.zeros(size, dtype=np.int64)  # perf_counter_ns
+        self.index = 0  # next slot to write
+        self.count = 0  # number of accepted pings (saturates at size)
+        self.rejects = 0  # consecutive outliers
+        self.misses = 0  # pings with no echo
+        self.median = None
+        self.smoothed = None
+        self.closing_speed = 0.0  # cm/s, positive when getting closer
+        self.last_ns = 0  # time of the last accepted ping
+
+    def push(self, distance, t_ns=None):
+        """Adds a ping to the filter.
+
+        Args:
+        distance (float): Distance in cm, None for a missed echo.
+        t_ns (int): time.perf_counter_ns() of the ping. Defaults to now.
+
+        Returns:
+        bool: True if the ping was accepted.
+
+        """
+        if t_ns is None:
+            t_ns = time.perf_counter_ns()
+        if distance is None:
+            self.misses += 1
+            return False
+
+        if self.smoothed is not None:
+            dt = (t_ns - self.last_ns) / 1e9
+            if (dt > 0 and abs(distance - self.smoothed) / dt > self.max_speed
+                    and self.rejects < self.max_rejects):
+                self.rejects += 1
+                return False
+            if self.rejects >= self.max_rejects:  # real jump, start over
+                self.reset()
+        self.rejects = 0
+
+        self.distances[self.index] = distance
+        self.times_ns[self.index] = t_ns
+        self.index = (self.index + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+        median = float(np.median(self.distances[:self.count]
+                                 if self.count < self.size else self.distances))
+        if self.smoothed is None:
+            smoothed = median
+        else:
+            smoothed = self.alpha * median + (1 - self.alpha) * self.smoothed
+            dt = (t_ns - self.last_ns) / 1e9
+            if dt > 0:
+                self.closing_speed = (self.smoothed - smoothed) / dt
+        self.median = median
+        self.smoothed = smoothed
+        self.last_ns = t_ns
+        return True
+
+    def reset(self):
+        """Forgets all pings (the counters of misses are kept)."""
+        self.distances.fill(np.nan)
+        self.index = 0
+        self.count = 0
+        self.rejects = 0
+        self.median = None
+        self.smoothed = None
+        self.closing_speed = 0.0
+
+    def distance(self):
+        """Filtered distance in cm, None before the first accepted ping."""
+        return self.smoothed
+
+    def speed(self):
+        """Closing speed in cm/s (positive when the object gets closer)."""
+        return self.closing_speed
+
+    def age(self):
+        """Seconds since the last accepted ping (inf if there wasn't one)."""
+        if self.smoothed is None:
+            return float('inf')
+        return (time.perf_counter_ns() - self.last_ns) / 1e9
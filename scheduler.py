@@ -0,0 +1,143 @@
+import config_log
+import logging
+import concurrent.futures
+import clocks
+
+
+class CmdScheduler():
+    """Runs Carm command lists against absolute deadlines. Command n starts
+    at the sum of the times of the commands before it, no matter how long
+    the earlier commands took to run, so recorded paths don't drift.
+
+    Car commands return straight away and run in the scheduler's thread.
+    Commands of other subsystems (servo sweeps, sensor pings) can take a
+    while, so they run in a worker thread per subsystem and the next
+    deadline is still met. A command whose subsystem is still busy with an
+    earlier one queues behind it; its lateness is measured when it
+    actually starts, and the step is marked as queued.
+
+    With a clocks.VirtualClock every command runs in the scheduler's
+    thread instead: virtual time is shared, so a worker sleeping on it
+    would move it under the scheduler's feet. A long command then makes
+    the ones after it late, and the replay is deterministic.
+
+    """
+    def __init__(self, robot, clock=None):
+        """
+        Args:
+        robot (Carm): Robot to run the commands on.
+        clock (RealClock or VirtualClock): Defaults to robot.clock.
+
+        """
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.DEBUG)
+        self.robot = robot
+        self.clock = clock or robot.clock
+        self.workers = dict()  # subsystem --> single thread executor
+        self.pending = dict()  # subsystem --> Future of its last command
+
+    def subsystem(self, cmd_str):
+        """Subsystem the command acts on, None for commands that must run in
+        the scheduler's thread.
+
+        """
+        cmd = self.robot.commands.get(cmd_str)
+        if cmd is None or cmd.subsystem == 'car':
+            return None
+        return cmd.subsystem
+
+    def dispatch(self, cmd_str, deadline=None, step=None):
+        """Runs the command bound to cmd_str, in this thread or on its
+        subsystem's worker.
+
+        Args:
+        cmd_str (str): Key of the command.
+        deadline (float): Clock time the command is due at. Defaults to
+        now.
+        step (dict): Gets 'lateness', seconds past deadline the command
+        started at (set once it starts), and 'queued', True if it had to
+        wait for an earlier command of its subsystem.
+
+        Returns:
+        None
+
+        """
+        step = dict() if step is None else step
+        deadline = self.clock.now() if deadline is None else deadline
+
+        def start():
+            step['lateness'] = self.clock.now() - deadline
+            self.robot.execute_single_cmd(cmd_str)
+
+        step['queued'] = False
+        subsystem = self.subsystem(cmd_str)
+        if subsystem is None or isinstance(self.clock, clocks.VirtualClock):
+            start()
+            return
+        if subsystem not in self.workers:
+            self.workers[subsystem] = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix=subsystem)
+        previous = self.pending.get(subsystem)
+        if previous is not None and not previous.done():
+            step['queued'] = True
+            self.logger.warning('{!r} queued behind a busy {}'.format(
+                cmd_str, subsystem))
+        self.pending[subsystem] = self.workers[subsystem].submit(start)
+
+    def run(self, cmds):
+        """Executes cmds (list of {'str': ..., 'time': ...} dicts) and brakes
+        at the end.
+
+        Args:
+        cmds (list): Commands as for Carm.execute_cmds.
+
+        Returns:
+        dict: 'steps' is a list of {'str', 'deadline', 'lateness',
+        'queued'} dicts (seconds from the start of the run, see dispatch())
+        and 'summary' is the dict returned by CmdScheduler.summarize().
+
+        """
+        steps = list()
+        t0 = self.clock.now()
+        deadline = t0
+        try:
+            for cmd in cmds:
+                self.clock.sleep_until(deadline)
+                step = {'str': cmd['str'], 'deadline': deadline - t0}
+                steps.append(step)
+                self.dispatch(cmd['str'], deadline, step)
+                deadline += cmd['time']
+            self.clock.sleep_until(deadline)
+            end_error = self.clock.now() - deadline
+            self.robot.execute_single_cmd(' ')
+        finally:
+            self.shutdown()
+        summary = self.summarize(steps, end_error)
+        self.logger.info('{steps} steps, mean lateness {mean:.4f} s, max '
+                         'lateness {max:.4f} s, {queued} queued, end error '
+                         '{end:.4f} s'.format(**summary))
+        return {'steps': steps, 'summary': summary}
+
+    def shutdown(self):
+        """Waits for the commands running on worker threads to finish."""
+        for worker in self.workers.values():
+            worker.shutdown(wait=True)
+        self.workers.clear()
+        self.pending.clear()
+
+    @staticmethod
+    def summarize(steps, end_error):
+        """Timing error of a run.
+
+        Returns:
+        dict: 'steps', 'mean' and 'max' lateness of the steps, 'queued',
+        the number of steps that waited for a busy subsystem, and 'end',
+        the lateness of the final brake (all in seconds).
+
+        """
+        latenesses = [step['lateness'] for step in steps] or [0.0]
+        return {'steps': len(steps),
+                'mean': sum(latenesses) / len(latenesses),
+                'max': max(latenesses),
+                'queued': sum(step['queued'] for step in steps),
+                'end': end_error}
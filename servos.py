@@ -1,5 +1,8 @@
 import time
-import Adafruit_PCA9685
+import clocks
+import motion
+import pca9685
+import trajectory
 import config_log
 import logging
 
@@ -8,8 +11,10 @@ class ServoMotor():
     """Class for Servo Motors driven by PCA9685"""
     number_of_motors = 0  # motors created in session (including destroyed)
     instances = list()  # list of all the ServoMotor objects created
+    max_vel = 200  # default speed for ServoMotor.move (pulse lengths / s)
+    max_accel = 2000  # default acceleration (pulse lengths / s^2)
 
-    def __init__(self, config):
+    def __init__(self, config, clock=None):
         """
         Args:
         config (dict): configuration dictionary containing string keys
@@ -19,12 +24,14 @@ class ServoMotor():
             'pow_pl' (int): Pulse level to set at power on.
             'min_pl' (int): minimum safe pulse level (determine in calibration)
             'max_pl' (int): minimum safe pulse level (determine in calibration)
+        clock (RealClock or VirtualClock): Clock to sleep on. Defaults to
+        clocks.get_clock().
 
         """
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.DEBUG)
-        self.pwm = Adafruit_PCA9685.PCA9685()  # Pwm module for PCA9685
-        self.pwm.set_pwm_freq(60)  # Set servo period to 1/(60 s^-1)
+        self.clock = clock or clocks.get_clock()
+        self.pwm = pca9685.get_bus()  # PCA9685 shared by all servos
         self.num = ServoMotor.number_of_motors  # Identifier for servo
         ServoMotor.number_of_motors += 1
         ServoMotor.instances.append(self)
@@ -33,27 +40,81 @@ class ServoMotor():
         self.name = config['name']
         self.channel = self.config['channel']
         self.current_pl = self.config['pow_pl']
+        self.powered = False  # getting pulses from the PCA9685
         self.power_on()
 
     def sweep(self, end_pl, pause_time=0.005):
         """Sweeps servo motor from the current position (with respect to pulse
-        length) to specified pulse length in unit
-        increments. Specified pauses are made between each increment.
+        length) to specified pulse length, taking pause_time seconds per
+        unit of pulse length. Kept for existing callers, the move itself is
+        done by ServoMotor.move().
 
         Args:
         end_pl (int): Pulse length to end at (between self.config['min_pl']
         and self.config['max_pl'])
-        pause_time (float): Time in seconds to wait between each jump.
+        pause_time (float): Time in seconds per unit of pulse length.
 
         Returns:
         None
 
         """
-        step = -1 if (end_pl - self.current_pl) < 0 else 1
-        while self.current_pl != end_pl:
-            self.current_pl += step
-            self.pwm.set_pwm(self.channel, 0, self.current_pl)
-            time.sleep(pause_time)
+        self.move(end_pl, duration=abs(end_pl - self.current_pl) * pause_time)
+
+    def move(self, end_pl, duration=None, max_vel=None, max_accel=None,
+             shape='trapezoid'):
+        """Moves the servo to end_pl along a trapezoidal or S-curve profile
+        sampled once per PWM frame. Ticks are scheduled against absolute
+        deadlines so the move takes a predictable time, and ticks where the
+        pulse length doesn't change are not written to the PCA9685.
+
+        Args:
+        end_pl (int): Pulse length to end at.
+        duration (float): Time in seconds for the whole move. If None the
+        move is as fast as max_vel and max_accel allow.
+        max_vel (float): Pulse lengths per second. Defaults to
+        self.max_vel when no duration is given.
+        max_accel (float): Pulse lengths per second^2. Defaults to
+        self.max_accel when no duration is given.
+        shape (str): 'trapezoid' or 's_curve'.
+
+        Returns:
+        None
+
+        """
+        motion.play({self: self.plan(end_pl, duration, max_vel, max_accel,
+                                     shape)}, self.clock)
+
+    def plan(self, end_pl, duration=None, max_vel=None, max_accel=None,
+             shape='trapezoid'):
+        """Samples the move of ServoMotor.move() without playing it.
+
+        Returns:
+        list: (tick, pulse length) tuples, see trajectory.sample().
+
+        """
+        if duration is None:
+            max_vel = max_vel or self.max_vel
+            max_accel = max_accel or self.max_accel
+        return trajectory.sample(self.current_pl, end_pl, duration, max_vel,
+                                 max_accel, shape)
+
+    def set_pl(self, pl):
+        """Jumps straight to pulse length pl (clamped to min_pl/max_pl)
+        without a trajectory or any waiting. For closed loop control where
+        the loop itself limits how fast the servo is moved.
+
+        Returns:
+        int: Pulse length set.
+
+        """
+        if self.config['min_pl'] is not None:
+            pl = max(pl, self.config['min_pl'])
+        if self.config['max_pl'] is not None:
+            pl = min(pl, self.config['max_pl'])
+        self.current_pl = pl
+        self.powered = True
+        self.pwm.set_pwm(self.channel, 0, pl)
+        return pl
 
     def power_on(self):
         """Moves servo to the power on position. Make sure to always run
@@ -61,12 +122,31 @@ class ServoMotor():
 
         """
         self.pwm.set_pwm(self.channel, 0, self.config['pow_pl'])
+        self.current_pl = self.config['pow_pl']
+        self.powered = True
 
     def power_off(self):
         """Sweeps servo to power on position to avoid violent startup."""
         self.sweep(self.config['pow_pl'])
 
 
+def all_off(bus=None):
+    """Stops the pulses to every servo on bus (the shared PCA9685 by
+    default) with one write to the ALL_LED registers, e.g. for an emergency
+    stop. The servos go limp where they are, so their current_pl is kept
+    and powered is cleared until they are driven again.
+
+    Returns:
+    None
+
+    """
+    bus = bus or pca9685.get_bus()
+    bus.all_off()
+    for servo in ServoMotor.instances:
+        if servo.pwm is bus:
+            servo.powered = False
+
+
 if __name__ == "__main__":
     print()
     # Example configuration for ServoMotor Object
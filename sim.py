@@ -0,0 +1,288 @@
+import time
+import threading
+import clocks
+
+
+class SimI2CDevice():
+    """Simulated I2C device. Stores registers in memory and charges a fixed
+    latency per bus transaction so that code using it can be timed off the
+    Pi.
+
+    """
+    def __init__(self, address, latency=0.0002):
+        """
+        Args:
+        address (int): I2C address of the device.
+        latency (float): Seconds charged for every bus transaction.
+
+        """
+        self.address = address
+        self.latency = latency
+        self.registers = bytearray(256)
+        self.transactions = 0
+        self.lock = threading.Lock()
+
+    def _transact(self):
+        self.transactions += 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def write8(self, register, value):
+        with self.lock:
+            self._transact()
+            self.registers[register] = value & 0xFF
+
+    def readU8(self, register):
+        with self.lock:
+            self._transact()
+            return self.registers[register]
+
+    def writeList(self, register, data):
+        """Block write. Registers are auto incremented starting from
+        register, all in one transaction.
+
+        """
+        with self.lock:
+            self._transact()
+            for i, value in enumerate(data):
+                self.registers[register + i] = value & 0xFF
+
+    def readList(self, register, length):
+        with self.lock:
+            self._transact()
+            return bytearray(self.registers[register:register + length])
+
+
+class SimI2C():
+    """Stand in for the Adafruit_GPIO.I2C module. Pass an instance as the
+    i2c argument of Adafruit_PCA9685.PCA9685.
+
+    """
+    def __init__(self, latency=0.0002):
+        """
+        Args:
+        latency (float): Seconds charged for every bus transaction.
+
+        """
+        self.latency = latency
+        self.devices = dict()
+
+    def get_i2c_device(self, address, **kwargs):
+        if address not in self.devices:
+            self.devices[address] = SimI2CDevice(address, self.latency)
+        return self.devices[address]
+
+    def transactions(self):
+        """Total number of transactions over all devices on the bus."""
+        return sum(dev.transactions for dev in self.devices.values())
+
+
+class SimGPIO():
+    """In process stand in for the RPi.GPIO module. Keeps the level of every
+    pin, runs edge detection callbacks, and can model an HC-SR04 echo so
+    that the robot's classes run off the Pi.
+
+    Inputs are driven from outside with set_input(). Callbacks run in the
+    thread that changed the pin (RPi.GPIO uses its own thread).
+
+    """
+    BCM = 11
+    BOARD = 10
+    OUT = 0
+    IN = 1
+    LOW = 0
+    HIGH = 1
+    PUD_OFF = 20
+    PUD_DOWN = 21
+    PUD_UP = 22
+    RISING = 31
+    FALLING = 32
+    BOTH = 33
+
+    def __init__(self):
+        self.mode = None
+        self.levels = dict()  # pin --> level
+        self.directions = dict()  # pin --> IN or OUT
+        self.callbacks = dict()  # pin --> (edge, [callbacks])
+        self.echoes = dict()  # trig pin --> SimEcho
+        self.writes = 0  # output() calls
+        self.duty = dict()  # pin --> duty cycle of a running SimPWM
+        self.lock = threading.RLock()
+
+    def setmode(self, mode):
+        self.mode = mode
+
+    def getmode(self):
+        return self.mode
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, channel, direction, pull_up_down=PUD_OFF, initial=None):
+        channels = channel if isinstance(channel, (list, tuple)) else [channel]
+        with self.lock:
+            for pin in channels:
+                self.directions[pin] = direction
+                if direction == self.OUT:
+                    self.levels[pin] = initial or self.LOW
+                else:
+                    self.levels.setdefault(
+                        pin, self.HIGH if pull_up_down == self.PUD_UP
+                        else self.LOW)
+
+    def output(self, channel, value):
+        """Same as RPi.GPIO.output, including lists of channels and
+        values.
+
+        """
+        if isinstance(channel, (list, tuple)):
+            values = (value if isinstance(value, (list, tuple))
+                      else [value] * len(channel))
+        else:
+            channel, values = [channel], [value]
+        with self.lock:
+            self.writes += 1
+            for pin, level in zip(channel, values):
+                if self.directions.get(pin) != self.OUT:
+                    raise RuntimeError(
+                        'The GPIO channel has not been set up as an OUTPUT')
+                old = self.levels[pin]
+                self.levels[pin] = 1 if level else 0
+                if old and not level and pin in self.echoes:
+                    self.echoes[pin].trigger()
+
+    def PWM(self, channel, frequency):
+        """Same as RPi.GPIO.PWM (software PWM on an output pin)."""
+        if self.directions.get(channel) != self.OUT:
+            raise RuntimeError(
+                'The GPIO channel has not been set up as an OUTPUT')
+        return SimPWM(self, channel, frequency)
+
+    def input(self, channel):
+        if channel not in self.directions:
+            raise RuntimeError('You must setup() the GPIO channel first')
+        return self.levels[channel]
+
+    def set_input(self, channel, level):
+        """Drives an input pin from outside (the simulated sensor) and runs
+        any edge detection callbacks.
+
+        """
+        level = 1 if level else 0
+        with self.lock:
+            old = self.levels.get(channel, self.LOW)
+            self.levels[channel] = level
+            edge, callbacks = self.callbacks.get(channel, (None, ()))
+            callbacks = list(callbacks)
+        if old == level or edge is None:
+            return
+        if (edge == self.BOTH or (edge == self.RISING and level) or
+                (edge == self.FALLING and not level)):
+            for callback in callbacks:
+                callback(channel)
+
+    def add_event_detect(self, channel, edge, callback=None, bouncetime=None):
+        with self.lock:
+            if channel in self.callbacks:
+                raise RuntimeError('Conflicting edge detection already '
+                                   'enabled for this GPIO channel')
+            self.callbacks[channel] = (edge, [callback] if callback else [])
+
+    def add_event_callback(self, channel, callback):
+        with self.lock:
+            self.callbacks[channel][1].append(callback)
+
+    def remove_event_detect(self, channel):
+        with self.lock:
+            self.callbacks.pop(channel, None)
+
+    def add_echo(self, trig, echo, distance=100):
+        """Models an HC-SR04 on trig/echo. See SimEcho."""
+        self.echoes[trig] = SimEcho(self, echo, distance)
+        return self.echoes[trig]
+
+    def cleanup(self, channel=None):
+        """Releases channels (all of them by default). Levels driven from
+        outside with set_input() are kept, like the real world would.
+
+        """
+        with self.lock:
+            if channel is None:
+                channels = list(self.directions)
+            elif isinstance(channel, (list, tuple)):
+                channels = channel
+            else:
+                channels = [channel]
+            for pin in channels:
+                if self.directions.pop(pin, None) == self.OUT:
+                    self.levels.pop(pin, None)
+                    self.duty.pop(pin, None)
+                self.callbacks.pop(pin, None)
+
+
+class SimPWM():
+    """Stand in for an RPi.GPIO.PWM object. The duty cycle of a running PWM
+    is kept in gpio.duty[pin]; duty cycle changes count as writes.
+
+    """
+    def __init__(self, gpio, channel, frequency):
+        self.gpio = gpio
+        self.channel = channel
+        self.frequency = frequency
+        self.running = False
+
+    def start(self, duty_cycle):
+        self.running = True
+        self.ChangeDutyCycle(duty_cycle)
+
+    def ChangeDutyCycle(self, duty_cycle):
+        if not 0 <= duty_cycle <= 100:
+            raise ValueError('dutycycle must have a value from 0.0 to 100.0')
+        with self.gpio.lock:
+            self.gpio.writes += 1
+            if self.running:
+                self.gpio.duty[self.channel] = duty_cycle
+
+    def ChangeFrequency(self, frequency):
+        self.frequency = frequency
+
+    def stop(self):
+        self.running = False
+        with self.gpio.lock:
+            self.gpio.duty.pop(self.channel, None)
+
+
+class SimEcho():
+    """Simulated HC-SR04 echo. On the falling edge of the trigger pulse the
+    echo pin goes high after a short delay and stays high for the round
+    trip time of sound over distance. The edges are scheduled on the clock
+    (clocks.get_clock() unless one is given), so set a VirtualClock to ping
+    in virtual time.
+
+    """
+    speed_of_sound = 34300  # cm/s
+    delay = 0.0002  # seconds from trigger to start of echo
+
+    def __init__(self, gpio, echo, distance=100, clock=None):
+        """
+        Args:
+        gpio (SimGPIO): Simulated GPIO the sensor is wired to.
+        echo (int): Echo pin.
+        distance (float): Distance to the obstacle in cm, None for no echo.
+        clock (RealClock or VirtualClock): Clock the echo is scheduled on.
+        Defaults to clocks.get_clock() at the time of the trigger.
+
+        """
+        self.gpio = gpio
+        self.echo = echo
+        self.distance = distance
+        self.clock = clock
+
+    def trigger(self):
+        if self.distance is None:
+            return
+        clock = self.clock or clocks.get_clock()
+        width = 2 * self.distance / self.speed_of_sound
+        clock.call_later(self.delay, lambda: self.gpio.set_input(self.echo, 1))
+        clock.call_later(self.delay + width,
+                         lambda: self.gpio.set_input(self.echo, 0))
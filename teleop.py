@@ -0,0 +1,266 @@
+"""Single keypress teleoperation of a Carm in a raw mode terminal.
+
+Keys are the single character bindings of Carm.commands. Car motions are
+hold-to-drive: the car moves while the key is held down (the terminal's
+key repeat keeps coming) and brakes when it is let go. Terminals don't
+report key releases, so a key counts as released once its repeats stop
+for release_timeout seconds, and a drive never runs longer than deadman
+seconds past the last keypress, which covers the delay before the first
+repeat and lost input. Other commands run once per keypress.
+
+    python teleop.py
+
+"""
+import config_log
+import logging
+import collections
+import os
+import select
+import sys
+import termios
+import time
+import tty
+import scheduler
+from config import config_teleop
+
+MENU_KEY = '?'
+QUIT_KEY = 'j'
+ESCAPE_TIMEOUT = 0.01  # s to wait for the rest of an escape sequence
+
+
+class RawTerminal():
+    """Context manager putting a terminal in cbreak mode (keys are read as
+    they are pressed, without echo) and restoring it on exit.
+
+    """
+    def __init__(self, stream=sys.stdin):
+        self.stream = stream
+        self.fd = stream.fileno()
+        self.attributes = None
+
+    def __enter__(self):
+        self.attributes = termios.tcgetattr(self.fd)
+        tty.setcbreak(self.fd)
+        return self
+
+    def __exit__(self, *exc_info):
+        termios.tcsetattr(self.fd, termios.TCSADRAIN, self.attributes)
+
+    def read_byte(self, timeout):
+        """Next byte within timeout seconds, None if there was none."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return None
+        return os.read(self.fd, 1)
+
+    def skip_escape(self):
+        """Discards the rest of an escape sequence (arrow and function
+        keys send ESC [ ... or ESC O x; Alt+key sends ESC x).
+
+        """
+        byte = self.read_byte(ESCAPE_TIMEOUT)
+        if byte == b'[':  # CSI: parameters up to a final byte @ to ~
+            while True:
+                byte = self.read_byte(ESCAPE_TIMEOUT)
+                if byte is None or 0x40 <= byte[0] <= 0x7e:
+                    break
+        elif byte == b'O':  # SS3: one more byte
+            self.read_byte(ESCAPE_TIMEOUT)
+
+    def read_key(self, timeout):
+        """Next key pressed within timeout seconds, None if there was none.
+        Escape sequences are read whole and ignored.
+
+        Returns:
+        tuple: (key, time.perf_counter() when it was read) or (None, None).
+
+        """
+        byte = self.read_byte(timeout)
+        if byte is None:
+            return None, None
+        t_key = time.perf_counter()
+        if byte == b'\x1b':
+            self.skip_escape()
+            return None, None
+        return byte.decode(errors='ignore'), t_key
+
+
+class Teleop():
+    """Dispatches single keypresses to a Carm, with hold-to-drive for car
+    commands. Non-car commands run on the subsystem worker threads of a
+    scheduler.CmdScheduler, so a servo sweep doesn't hold up the car.
+
+    Keypress to GPIO latency of car commands is kept in self.latencies
+    (seconds from reading the key to the first write of the motor pins;
+    keys that change nothing aren't counted). Holds, releases and the
+    command history are timed on robot.clock.
+
+    """
+    def __init__(self, robot, config=config_teleop, terminal=None):
+        """
+        Args:
+        robot (Carm): Robot to drive.
+        config (dict): see config.config_teleop.
+        terminal (RawTerminal): Key source, defaults to stdin.
+
+        """
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.DEBUG)
+        self.robot = robot
+        self.clock = robot.clock
+        self.terminal = terminal or RawTerminal()
+        self.release_timeout = config['release_timeout']
+        self.deadman = config['deadman']
+        self.poll = config['poll']
+        self.dispatcher = scheduler.CmdScheduler(robot)
+        self.driver = robot.car.driver
+        self.holding = None  # car command key being held
+        self.t_last = None  # latest keypress of the held key
+        self.repeats = 0
+        self.latencies = collections.deque(maxlen=1000)
+        self.history = list()  # {'str', 'time'} as for Carm.execute_cmds
+        self.t_cmd = None
+
+    @property
+    def keys(self):
+        """Single character bindings, including those registered since
+        teleop started."""
+        return {key: cmd for key, cmd in self.robot.commands.items()
+                if len(key) == 1}
+
+    def is_hold(self, key):
+        cmd = self.robot.commands[key]
+        return cmd.subsystem == 'car' and cmd.category == 'motion'
+
+    def menu(self):
+        width = max(len(key) for key in self.keys)
+        lines = ['{}: {}'.format(repr(key).rjust(width + 2), cmd.name)
+                 for key, cmd in self.keys.items()]
+        lines.append('{}: {}'.format(repr(MENU_KEY).rjust(width + 2),
+                                     'show this menu'))
+        return '\n'.join(lines)
+
+    def record(self, key):
+        """Adds key to the command history, timing the previous command."""
+        now = self.clock.now()
+        if self.history:
+            self.history[-1]['time'] = round(now - self.t_cmd, 3)
+        self.history.append({'str': key, 'time': 0.0})
+        self.t_cmd = now
+
+    def run_cmd(self, key, t_key):
+        self.record(key)
+        if self.dispatcher.subsystem(key) is None:  # car: runs inline
+            self.driver.mark()
+            self.robot.execute_single_cmd(key)
+            if self.driver.first_write is not None:
+                self.latencies.append(self.driver.first_write - t_key)
+        else:
+            self.dispatcher.dispatch(key)
+
+    def release(self, t_key=None):
+        """Brakes after a held car command."""
+        self.logger.debug('Released {!r} after {} repeats'.format(
+            self.holding, self.repeats))
+        self.holding = None
+        self.run_cmd(' ', t_key or time.perf_counter())
+
+    def on_key(self, key, t_key):
+        """Handles one key read from the terminal.
+
+        Returns:
+        bool: False once the quit key was pressed.
+
+        """
+        if key == QUIT_KEY:
+            return False
+        if key == MENU_KEY:
+            print(self.menu())
+            return True
+        if len(key) != 1 or key not in self.robot.commands:
+            return True
+        if key == self.holding:  # key repeat
+            self.t_last = self.clock.now()
+            self.repeats += 1
+            return True
+        if self.is_hold(key):
+            self.holding = key
+            self.t_last = self.clock.now()
+            self.repeats = 0
+        elif self.holding is not None and key != ' ':
+            pass  # keep driving while e.g. the camera moves
+        else:
+            self.holding = None
+        self.run_cmd(key, t_key)
+        return True
+
+    def check_release(self):
+        """Brakes once the held key's repeats have stopped."""
+        if self.holding is None:
+            return
+        now = self.clock.now()
+        timeout = self.release_timeout if self.repeats else self.deadman
+        if now - self.t_last > timeout:
+            self.release()
+
+    def run(self):
+        """Reads keys until the quit key. The car is braked on the way out.
+
+        Returns:
+        list: The command history, as for Carm.execute_cmds().
+
+        """
+        print(self.menu())
+        try:
+            with self.terminal:
+                while True:
+                    key, t_key = self.terminal.read_key(self.poll)
+                    if key is not None and not self.on_key(key, t_key):
+                        break
+                    self.check_release()
+                    self.robot.watchdog.heartbeat()
+        finally:
+            self.robot.car.brake()
+            self.dispatcher.shutdown()
+        if self.history:
+            self.history[-1]['time'] = round(
+                self.clock.now() - self.t_cmd, 3)
+        return self.history
+
+    def summary(self):
+        """Keypress to GPIO latency of car commands (ms)."""
+        latencies = sorted(self.latencies)
+        if not latencies:
+            return {'count': 0}
+        return {'count': len(latencies),
+                'mean': sum(latencies) / len(latencies) * 1000,
+                'p99': latencies[int(len(latencies) * 0.99)] * 1000,
+                'max': latencies[-1] * 1000}
+
+
+def teleop_mode(robot):
+    """Drives robot from the keyboard, then saves the session's commands
+    (see Carm.write_cmds_to_txt) and powers off.
+
+    """
+    teleop = Teleop(robot)
+    try:
+        history = teleop.run()
+        robot.write_cmds_to_txt(history)
+    finally:
+        robot.power_off()
+    print('Keypress to GPIO latency: {}'.format(teleop.summary()))
+
+
+if __name__ == "__main__":
+    import carm
+    import config
+    robot = carm.Carm(config.config_carm)
+    robot.car.rm.logger.setLevel(logging.INFO)
+    robot.car.lm.logger.setLevel(logging.INFO)
+    robot.watchdog.start()
+    try:
+        teleop_mode(robot)
+    finally:
+        robot.watchdog.stop()
+        print('Watchdog: {}'.format(robot.watchdog.summary()))
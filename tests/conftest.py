@@ -0,0 +1,31 @@
+import os
+import sys
+
+os.environ['CARM_BACKEND'] = 'sim'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import clocks
+from hal import GPIO
+
+
+@pytest.fixture
+def clock():
+    """VirtualClock, also set as the default clock (the simulated echo of
+    the ultrasonic sensor runs on it)."""
+    clock = clocks.VirtualClock()
+    default = clocks.get_clock()
+    clocks.set_clock(clock)
+    yield clock
+    clocks.set_clock(default)
+
+
+@pytest.fixture
+def robot(clock):
+    """Carm on the simulated backend, running on a VirtualClock."""
+    import carm
+    import config
+    robot = carm.Carm(config.config_carm, clock)
+    yield robot
+    robot.car.brake()
+    GPIO.cleanup()
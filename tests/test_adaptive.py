@@ -0,0 +1,43 @@
+import adaptive
+
+BUDGET = 0.01
+
+
+def detector(**kwargs):
+    return adaptive.AdaptiveDetector(budget=BUDGET, level=1, cooldown=5,
+                                     **kwargs)
+
+
+def run(adaptive_detector, elapsed, frames):
+    levels = list()
+    for i in range(frames):
+        adaptive_detector.adapt(elapsed)
+        levels.append(adaptive_detector.level)
+    return levels
+
+
+def test_steps_coarser_over_budget_once_per_cooldown():
+    adaptive_detector = detector()
+    levels = run(adaptive_detector, 2 * BUDGET, 15)
+    assert levels == [1] * 4 + [2] * 5 + [3] * 5 + [4]
+    assert run(adaptive_detector, 2 * BUDGET, 10)[-1] == 4  # coarsest
+
+
+def test_steps_back_while_the_finer_level_fitted():
+    adaptive_detector = detector()
+    run(adaptive_detector, 2 * BUDGET, 5)  # level 1 too slow
+    assert adaptive_detector.level == 2
+    levels = run(adaptive_detector, BUDGET / 2, 20)
+    assert levels[-1] == 2  # level 1 is known to be over budget
+    adaptive_detector.averages[1] = BUDGET / 2  # e.g. after a probe
+    assert run(adaptive_detector, BUDGET / 2, 5 + 5)[-1] == 0
+
+
+def test_skips_levels_that_shrink_the_face_too_much():
+    adaptive_detector = detector(min_face=40)
+    adaptive_detector.last_size = 60  # 30 px at half scale
+    levels = run(adaptive_detector, 2 * BUDGET, 15)
+    assert max(levels) == 2  # 0.75 scale, 45 px
+    adaptive_detector.level = 4
+    adaptive_detector.adapt(BUDGET / 2)
+    assert adaptive_detector.level == 2  # straight away, face too small
@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import async_carm
+
+
+def test_setting_does_not_preempt_a_drive(robot):
+    async def main():
+        async_robot = async_carm.AsyncCarm(robot)
+        drive = async_robot.start('car', async_robot.drive(1, 0.2))
+        speed = robot.car.speed
+        await async_robot.execute('-')
+        assert robot.car.speed == round(speed - 0.1, 2)
+        assert async_robot.tasks['car'] is drive
+        assert not drive.done()
+        await drive
+        assert not drive.cancelled()
+
+    asyncio.run(main())
+
+
+def test_motion_preempts_a_drive(robot):
+    async def main():
+        async_robot = async_carm.AsyncCarm(robot)
+        drive = async_robot.start('car', async_robot.drive(1, 0.2))
+        await asyncio.sleep(0)
+        turn = async_robot.execute('e')
+        await asyncio.sleep(0)
+        assert drive.cancelled()
+        assert async_robot.tasks['car'] is turn
+        await async_robot.stop()
+
+    asyncio.run(main())
+
+
+def test_arm_and_camera_nudges_are_coroutines(robot):
+    async def main():
+        async_robot = async_carm.AsyncCarm(robot)
+        subsystem, coro = async_robot.coroutine(']')
+        assert subsystem == 'arm'
+        assert coro.__qualname__ == 'AsyncCarm.extend'
+        right = robot.arm.right
+        start = right.current_pl
+        await coro
+        assert right.current_pl == start + 5
+        robot.commands.register('t', 'tilt', robot.cam.tilt, -5,
+                                subsystem='cam')
+        await async_robot.execute('t')
+        assert robot.cam.current_pl == robot.cam.config['pow_pl'] - 5
+
+    asyncio.run(main())
+
+
+def test_motion_in_a_thread_is_not_preempted(robot):
+    release = threading.Event()
+    robot.commands.register('x', 'plugin arm move', release.wait, 5,
+                            subsystem='arm')
+
+    async def main():
+        async_robot = async_carm.AsyncCarm(robot)
+        blocked = async_robot.execute('x')
+        await asyncio.sleep(0.05)
+        right = robot.arm.right
+        start = right.current_pl
+        nudge = async_robot.execute(']')
+        await asyncio.sleep(0.05)
+        assert blocked.cancelled()
+        assert right.current_pl == start  # waits for the thread
+        release.set()
+        await nudge
+        assert right.current_pl == start + 5
+
+    asyncio.run(main())
+
+
+def test_cancelled_car_task_brakes_unless_preempted(robot, monkeypatch):
+    brakes = list()
+    brake = robot.car.brake
+    monkeypatch.setattr(robot.car, 'brake', lambda: brakes.append(1) or brake())
+
+    async def main():
+        async_robot = async_carm.AsyncCarm(robot)
+        drive = async_robot.start('car', async_robot.drive(1, 5))
+        await asyncio.sleep(0.05)
+        turn = async_robot.start('car', async_robot.point_turn(1, 5))
+        await asyncio.sleep(0.05)
+        assert drive.cancelled() and not brakes  # pre-empted
+        assert robot.car.lm.state
+        turn.cancel()
+        await asyncio.sleep(0)
+        assert turn.cancelled() and brakes
+        assert not robot.car.lm.state
+
+    asyncio.run(main())
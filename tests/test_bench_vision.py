@@ -0,0 +1,18 @@
+import numpy as np
+import bench_vision
+import frame_sources
+
+
+def test_synthetic_square_is_not_scored():
+    source = frame_sources.SyntheticSource(160, 120, count=3)
+    result = bench_vision.bench_detection(source, {})
+    assert result['hit_rate'] is None
+    assert result['false_positives'] is None
+
+
+def test_synthetic_face_is_scored():
+    patch = np.full((40, 40), 200, dtype=np.uint8)
+    source = frame_sources.SyntheticSource(160, 120, count=3, patch=patch)
+    assert source.boxes(0) == [source.position(0) + (40, 40)]
+    result = bench_vision.bench_detection(source, {})
+    assert result['hit_rate'] is not None
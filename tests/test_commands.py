@@ -0,0 +1,54 @@
+import pytest
+from commands import Command, CommandRegistry
+
+
+def make_registry():
+    registry = CommandRegistry()
+    calls = list()
+    registry.register('w', 'forwards', calls.append, 1, subsystem='car')
+    registry.register('s', 'backwards', calls.append, -1, subsystem='car')
+    registry.register('u', 'check', calls.append, 'u', category='sensor')
+    return registry, calls
+
+
+def test_commands_keep_registration_order():
+    registry, calls = make_registry()
+    assert list(registry) == ['w', 's', 'u']
+    registry.register('x', 'first', before='w')
+    registry.register('y', 'last', before='missing')
+    assert list(registry) == ['x', 'w', 's', 'u', 'y']
+
+
+def test_lookup_and_dispatch():
+    registry, calls = make_registry()
+    assert 's' in registry and 'q' not in registry
+    assert registry.get('q') is None
+    registry['s']()
+    registry['u']()
+    assert calls == [-1, 'u']
+    assert registry['s'].subsystem == 'car'
+    assert registry['u'].category == 'sensor'
+    assert set(registry.stats()) == {'s', 'u'}
+    assert registry.stats()['s']['count'] == 1
+
+
+def test_taken_keys_need_replace():
+    registry, calls = make_registry()
+    with pytest.raises(ValueError):
+        registry.register('w', 'again', calls.append, 2)
+    registry.register('w', 'again', calls.append, 2, replace=True)
+    assert list(registry) == ['s', 'u', 'w']  # listed again at the end
+    registry['w']()
+    assert calls == [2]
+
+
+def test_unregister():
+    registry, calls = make_registry()
+    registry.unregister('s')
+    registry.unregister('missing')
+    assert list(registry) == ['w', 'u']
+
+
+def test_unknown_category():
+    with pytest.raises(ValueError):
+        Command('k', 'name', category='dance')
@@ -0,0 +1,50 @@
+import dc_motors
+from hal import GPIO
+
+
+def motors(pwm_freq=None):
+    configs = [{'name': 'left', 'pin_forward': 16, 'pin_backward': 12},
+               {'name': 'right', 'pin_forward': 6, 'pin_backward': 5}]
+    for config in configs:
+        config['pwm_freq'] = pwm_freq
+    return [dc_motors.DCMotor(config) for config in configs]
+
+
+def test_on_off_pins_switch_in_one_write():
+    left, right = motors()
+    driver = left.driver
+    outputs = driver.outputs
+    left.set_speed(1, flush=False)
+    right.set_speed(-1, flush=False)
+    driver.flush()
+    assert driver.outputs == outputs + 1
+    assert [GPIO.input(pin) for pin in (16, 12, 6, 5)] == [1, 0, 0, 1]
+    GPIO.cleanup()
+
+
+def test_unchanged_pins_are_not_written():
+    left, right = motors(pwm_freq=100)
+    driver = left.driver
+    left.set_speed(0.5)
+    writes = driver.writes
+    for i in range(10):
+        left.set_speed(0.5)
+    assert driver.writes == writes
+    left.set_speed(0.6)  # one duty cycle changes
+    assert driver.writes == writes + 1
+    assert driver.duty_changes >= 1 and GPIO.duty[16] == left.duty(0.6)
+    GPIO.cleanup()
+
+
+def test_default_config_writes_duty_cycles_one_by_one(robot):
+    car = robot.car
+    assert car.lm.pwm_freq and car.rm.pwm_freq  # as shipped
+    driver = car.driver
+    writes, outputs, duty_changes = (driver.writes, driver.outputs,
+                                     driver.duty_changes)
+    car.apply_speeds(1, -1)
+    car.brake()
+    assert driver.outputs == outputs  # nothing batched
+    # one pin per motor changes when starting, and again when braking
+    assert driver.duty_changes - duty_changes == 4
+    assert driver.writes - writes == driver.duty_changes - duty_changes
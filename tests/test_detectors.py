@@ -0,0 +1,33 @@
+import os
+import numpy as np
+import detectors
+from config import config_detectors
+
+
+def test_cache_is_keyed_on_settings():
+    haar = detectors.get_detector('haar')
+    assert detectors.get_detector('haar') is haar
+    config = dict(config_detectors)
+    config['haar'] = dict(config['haar'], scale_factor=1.1)
+    other = detectors.get_detector('haar', config)
+    assert other is not haar and other.scale_factor == 1.1
+
+
+def test_find_model_looks_in_opencv_data_dirs(tmp_path):
+    assert detectors.find_model(__file__) == __file__
+    # a cascade that ships with cv2 but isn't next to detectors.py
+    found = detectors.find_model('haarcascade_frontalface_alt.xml')
+    assert os.path.isfile(found)
+    missing = str(tmp_path / 'missing.xml')
+    assert detectors.find_model(missing) == missing
+
+
+def test_lbp_cascade_ships_and_is_preferred():
+    path = detectors.find_model(config_detectors['lbp']['path'])
+    assert os.path.samefile(path, os.path.join(
+        os.path.dirname(os.path.abspath(detectors.__file__)),
+        'lbpcascade_frontalface.xml'))
+    lbp = detectors.get_detector('lbp')
+    assert lbp(np.zeros((120, 160), dtype=np.uint8)) is not None
+    name, backend = detectors.choose(budget=1.0)
+    assert name == 'lbp'
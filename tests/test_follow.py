@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+import follow
+
+
+def result(t, x=None, shape=(240, 320)):
+    """Detection dict with a 40x40 face centred at column x."""
+    faces = [] if x is None else [(x - 20, 100, 40, 40)]
+    return {'t_capture': t, 'faces': faces,
+            'frame': np.zeros(shape, dtype=np.uint8)}
+
+
+def test_steering_is_proportional_and_does_not_block(robot):
+    t0 = robot.clock.now()
+    speeds = list()
+    for i, x in enumerate((260, 300)):  # face right of centre
+        follower = follow.FaceFollower(robot.car, robot.cam)
+        follower.update(result(i * 0.03, x))
+        speeds.append(robot.car.lm.speed)
+        assert robot.car.rm.speed == -robot.car.lm.speed
+    assert robot.clock.now() == t0  # no ramp slept on the clock
+    assert 0 < speeds[0] < speeds[1] <= follower.turn_speed
+
+
+def test_centred_face_brakes(robot):
+    follower = follow.FaceFollower(robot.car, robot.cam)
+    follower.update(result(0.0, 310))
+    assert robot.car.lm.speed > 0
+    for i in range(1, 20):  # output is rate limited
+        follower.update(result(i * 0.03, 160))
+    assert robot.car.lm.speed == 0 and robot.car.rm.speed == 0
+
+
+def test_pid_output_is_clamped_without_windup():
+    pid = follow.PID(1.0, ki=1.0, limit=0.5)
+    for t in range(10):
+        output = pid.update(2.0, t)
+        assert abs(output) <= 0.5
+    assert pid.integral == 0.5  # no more than the limit alone needs
+    assert pid.update(-1.0, 10) == -0.5  # turns around at once
+
+
+def test_pid_rate_limit():
+    pid = follow.PID(1.0, rate_limit=2.0)
+    assert pid.update(0.0, 0.0) == 0.0
+    assert pid.update(1.0, 0.1) == pytest.approx(0.2)
+    assert pid.update(1.0, 0.2) == pytest.approx(0.4)
+    assert pid.update(0.3, 1.0) == pytest.approx(0.3)
@@ -0,0 +1,76 @@
+import sys
+import threading
+import time
+import types
+import numpy as np
+import pytest
+import face_pipeline
+import frame_sources
+
+CONFIG = {'x_res': 64, 'y_res': 48, 'framerate': 200}
+
+
+class FakeCamera():
+    """Writes frames filled with their sequence number (mod 256) into
+    the output, as fast as it can, like picamera's start_recording."""
+    def __init__(self, resolution, framerate):
+        self.running = threading.Event()
+
+    def start_recording(self, output, format):
+        self.running.set()
+        threading.Thread(target=self.run, args=(output,), daemon=True).start()
+
+    def run(self, output):
+        i = 0
+        while self.running.is_set():
+            i += 1
+            output.write(bytes([i % 256]) * output.frame_size)
+            time.sleep(0.001)
+
+    def stop_recording(self):
+        self.running.clear()
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def camera(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'picamera',
+                        types.SimpleNamespace(PiCamera=FakeCamera))
+    return frame_sources.PiCameraSource(CONFIG)
+
+
+def test_held_frames_are_not_written_over(camera):
+    frames = iter(camera)
+    frame = next(frames)
+    camera.hold(frame)
+    value = frame[0, 0]
+    for i in range(50):
+        next(frames)
+    assert np.all(frame == value)
+    camera.release(frame)
+    frames.close()
+    assert camera.holds == [0] * len(camera.holds)
+
+
+def test_pipeline_frames_stay_whole(camera):
+    torn = list()
+
+    def detector(frame):
+        before = frame.copy()
+        time.sleep(0.02)  # much slower than the camera
+        if not np.array_equal(frame, before) or np.ptp(frame):
+            torn.append(True)
+        return []
+
+    pipeline = face_pipeline.FacePipeline(camera, detector, display=False)
+    results = list()
+
+    def on_result(result):
+        results.append(result['frame'][0, 0])
+        if len(results) == 20:
+            pipeline.running.clear()
+
+    pipeline.run(on_result)
+    assert len(results) >= 20 and not torn
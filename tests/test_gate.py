@@ -0,0 +1,43 @@
+import numpy as np
+import gate
+
+SHAPE = (120, 160)
+
+
+class CountingDetector():
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, frame, t=None):
+        self.calls += 1
+        return [(self.calls, 0, 10, 10)]
+
+
+def test_skips_still_frames_and_runs_on_motion():
+    detector = CountingDetector()
+    motion_gate = gate.MotionGate(detector, max_age=1.0)
+    still = np.full(SHAPE, 100, dtype=np.uint8)
+    assert motion_gate(still, t=0.0) == [(1, 0, 10, 10)]
+    for i in range(1, 5):
+        noisy = still + np.uint8(i)  # below pixel_threshold
+        assert motion_gate(noisy, t=i * 0.1) == [(1, 0, 10, 10)]
+    assert detector.calls == 1
+    moved = still.copy()
+    moved[40:80, 60:100] = 200
+    assert motion_gate(moved, t=0.5) == [(2, 0, 10, 10)]
+    assert motion_gate(moved, t=0.6) == [(2, 0, 10, 10)]
+    assert detector.calls == 2
+    assert motion_gate.skip_ratio() == 5 / 7
+
+
+def test_runs_again_once_the_detection_is_max_age_old():
+    detector = CountingDetector()
+    motion_gate = gate.MotionGate(detector, max_age=1.0)
+    still = np.full(SHAPE, 100, dtype=np.uint8)
+    motion_gate(still, t=0.0)
+    motion_gate(still, t=0.9)
+    assert detector.calls == 1
+    motion_gate(still, t=1.0)
+    assert detector.calls == 2
+    motion_gate(still, t=1.5)
+    assert detector.calls == 2  # age counts from the last detection
@@ -0,0 +1,41 @@
+import time
+import ir
+from hal import GPIO
+
+PIN = 27  # not used by the robot
+
+
+def sensor(debounce=0.05):
+    GPIO.set_input(PIN, 1)  # nothing in front
+    return ir.IRSensor({'name': 'test', 'pin': PIN, 'debounce': debounce})
+
+
+def test_debounce_rejects_a_glitch():
+    ir_sensor = sensor()
+    levels = list()
+    ir_sensor.subscribe(lambda sensor, level, t_ns: levels.append(level))
+    try:
+        GPIO.set_input(PIN, 0)  # obstruction, accepted at once
+        GPIO.set_input(PIN, 1)  # glitch within the debounce time...
+        GPIO.set_input(PIN, 0)  # ...gone again
+        time.sleep(0.1)  # the settled pin is read again
+        assert levels == [0]
+        assert ir_sensor.signal == 0
+        assert [level for t_ns, level in ir_sensor.history()] == [0]
+    finally:
+        GPIO.cleanup(PIN)
+
+
+def test_bounce_settling_on_a_new_level_is_picked_up():
+    ir_sensor = sensor()
+    try:
+        GPIO.set_input(PIN, 0)
+        GPIO.set_input(PIN, 1)  # bounces, then stays clear
+        assert ir_sensor.signal == 0
+        time.sleep(0.1)
+        assert ir_sensor.signal == 1
+        times, levels = zip(*ir_sensor.history())
+        assert levels == (0, 1)
+        assert times[1] - times[0] >= 0.05e9  # not before the debounce time
+    finally:
+        GPIO.cleanup(PIN)
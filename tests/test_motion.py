@@ -0,0 +1,21 @@
+import motion
+
+
+def test_together_takes_a_generator(robot):
+    arm = robot.arm
+    goals = ((servo, servo.config['max_pl'], 0.5)
+             for servo in (arm.gripper, arm.right))
+    moves = motion.together(goals)
+    assert set(moves) == {arm.gripper, arm.right}
+    motion.play(moves, robot.clock)
+    assert arm.gripper.current_pl == arm.gripper.config['max_pl']
+    assert arm.right.current_pl == arm.right.config['max_pl']
+
+
+def test_together_finishes_together(robot):
+    arm = robot.arm
+    goals = [(servo, servo.config['max_pl'], None)
+             for servo in (arm.gripper, arm.right)]
+    assert all(servo.current_pl != end_pl for servo, end_pl, _ in goals)
+    moves = motion.together(goals)
+    assert len({samples[-1][0] for samples in moves.values()}) == 1
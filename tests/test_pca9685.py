@@ -0,0 +1,55 @@
+import pca9685
+import sim
+
+
+def make_bus():
+    i2c = sim.SimI2C(latency=0)
+    bus = pca9685.PCA9685Bus(i2c=i2c)
+    return bus, bus.device
+
+
+def registers(device, channel):
+    base = pca9685.LED0_ON_L + 4 * channel
+    on_l, on_h, off_l, off_h = device.registers[base:base + 4]
+    return on_l | on_h << 8, off_l | off_h << 8
+
+
+def test_flush_writes_runs_of_dirty_channels_in_blocks():
+    bus, device = make_bus()
+    for channel in (0, 1, 2, 5, 7, 8):
+        bus.stage(channel, 0, 300 + channel)
+    transactions = device.transactions
+    assert bus.flush() == 3  # 0-2, 5 and 7-8
+    assert device.transactions - transactions == 3
+    for channel in (0, 1, 2, 5, 7, 8):
+        assert registers(device, channel) == (0, 300 + channel)
+    assert registers(device, 3) == (0, 0)
+
+
+def test_flush_skips_unchanged_channels():
+    bus, device = make_bus()
+    bus.stage(4, 0, 350)
+    assert bus.flush() == 1
+    bus.stage(4, 0, 350)  # same as the shadow copy
+    transactions = device.transactions
+    assert bus.flush() == 0
+    assert device.transactions == transactions
+
+
+def test_emergency_stop_cuts_every_servo_in_one_write(robot):
+    bus = robot.arm.right.pwm
+    servo_list = robot.arm.servo_list + (robot.cam,)
+    positions = [servo.current_pl for servo in servo_list]
+    transactions = bus.device.transactions
+    robot.execute_single_cmd('!')
+    assert bus.device.transactions - transactions == 1
+    assert bus.device.registers[pca9685.ALL_LED_OFF_H] == \
+        pca9685.FULL_OFF >> 8
+    assert all(bus.shadow[servo.channel] == (0, pca9685.FULL_OFF)
+               for servo in servo_list)
+    assert [servo.current_pl for servo in servo_list] == positions
+    assert not any(servo.powered for servo in servo_list)
+    robot.cam.sweep(robot.cam.config['min_pl'])  # driven again
+    assert robot.cam.powered
+    assert registers(bus.device, robot.cam.channel) == \
+        (0, robot.cam.config['min_pl'])
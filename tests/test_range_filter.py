@@ -0,0 +1,41 @@
+import pytest
+from range_filter import RangeFilter
+
+MS = 1000000  # ns
+
+
+def test_median_rejects_a_spike():
+    filt = RangeFilter(size=5, alpha=1.0, max_speed=1e9)
+    for i, distance in enumerate((50, 51, 300, 50, 52)):
+        filt.push(distance, i * 60 * MS)
+    assert filt.median == 51
+    assert filt.distance() == 51
+
+
+def test_too_fast_pings_are_rejected_until_the_jump_is_real():
+    filt = RangeFilter(max_speed=300, max_rejects=3)
+    assert filt.push(100, 0)
+    for i in range(1, 4):  # 90 cm in 180 ms is 500 cm/s
+        assert not filt.push(10, i * 60 * MS)
+    assert filt.distance() == 100
+    assert filt.push(10, 4 * 60 * MS)  # fourth in a row: start over
+    assert filt.distance() == 10
+    assert filt.count == 1
+
+
+def test_closing_speed_and_misses():
+    filt = RangeFilter(size=1, alpha=1.0)
+    filt.push(100, 0)
+    filt.push(94, 100 * MS)
+    assert filt.speed() == pytest.approx(60)  # getting closer
+    assert not filt.push(None, 200 * MS)
+    assert filt.misses == 1
+    assert filt.distance() == 94
+
+
+def test_reset_forgets_pings():
+    filt = RangeFilter()
+    filt.push(100, 0)
+    filt.reset()
+    assert filt.distance() is None
+    assert filt.age() == float('inf')
@@ -0,0 +1,57 @@
+import main
+
+
+def run(robot, cmds):
+    t0 = robot.clock.now()
+    result = robot.execute_cmds(cmds)
+    return robot.clock.now() - t0, result
+
+
+def test_replay_ends_on_time(robot):
+    elapsed, result = run(robot, main.cmds)
+    assert elapsed == sum(cmd['time'] for cmd in main.cmds)
+    assert [step['lateness'] for step in result['steps']] == \
+        [0.0] * len(main.cmds)
+    assert result['summary']['end'] == 0.0
+
+
+def test_deadlines_are_absolute(robot):
+    cmds = [{'str': 'w', 'time': 0.5}, {'str': 'd', 'time': 0.25},
+            {'str': ' ', 'time': 1.0}]
+    elapsed, result = run(robot, cmds)
+    assert elapsed == 1.75
+    assert [step['deadline'] for step in result['steps']] == [0, 0.5, 0.75]
+
+
+def test_overrunning_command_makes_the_next_late(robot):
+    # fully extending the arm takes longer than 0.1 s
+    cmds = [{'str': 'p', 'time': 5}, {'str': 'n', 'time': 0.1},
+            {'str': 'w', 'time': 0.5}]
+    first = run(robot, cmds)
+    late = first[1]['steps'][2]['lateness']
+    assert late > 0
+    assert first[1]['summary']['max'] == late
+    assert run(robot, cmds) == first  # replays are deterministic
+
+
+def test_lateness_is_measured_when_a_queued_command_starts():
+    import carm
+    import clocks
+    import config
+    import scheduler
+    from hal import GPIO
+    robot = carm.Carm(config.config_carm, clocks.RealClock())
+    # 'n' sweeps the arm for much longer than 0.1 s, so 'p' queues behind it
+    cmds = [{'str': 'p', 'time': 0}, {'str': 'n', 'time': 0.1},
+            {'str': 'p', 'time': 0.1}]
+    try:
+        robot.execute_single_cmd('p')
+        result = scheduler.CmdScheduler(robot).run(cmds)
+    finally:
+        robot.car.brake()
+        GPIO.cleanup()
+    steps = result['steps']
+    assert [step['queued'] for step in steps] == [False, False, True]
+    assert steps[2]['lateness'] > 0.2
+    assert result['summary']['queued'] == 1
+    assert result['summary']['max'] == steps[2]['lateness']
@@ -0,0 +1,76 @@
+import os
+import teleop
+
+
+class PipeTerminal(teleop.RawTerminal):
+    """RawTerminal reading from a pipe instead of a tty."""
+    def __init__(self):
+        self.fd, self.write_fd = os.pipe()
+
+    def keys(self, data):
+        os.write(self.write_fd, data)
+        keys = list()
+        while True:
+            key, t_key = self.read_key(0.02)
+            if key is None and t_key is None and not self.pending():
+                return keys
+            if key is not None:
+                keys.append(key)
+
+    def pending(self):
+        return bool(teleop.select.select([self.fd], [], [], 0)[0])
+
+
+def test_escape_sequences_are_ignored():
+    terminal = PipeTerminal()
+    # up arrow, F5, SS3 F1, Alt+w, then a plain w
+    assert terminal.keys(b'\x1b[A\x1b[15~\x1bOP\x1bww') == ['w']
+
+
+def test_plain_keys():
+    terminal = PipeTerminal()
+    assert terminal.keys(b'w[ ') == ['w', '[', ' ']
+
+
+def hold_w(robot, teleop_, repeats, interval=0.03):
+    """Presses w, then repeats it every interval like a held key."""
+    teleop_.on_key('w', 0.0)
+    for i in range(repeats):
+        robot.clock.sleep(interval)
+        teleop_.on_key('w', 0.0)
+        teleop_.check_release()
+
+
+def test_key_repeat_keeps_driving_without_restarting_the_ramp(robot):
+    teleop_ = teleop.Teleop(robot, terminal=PipeTerminal())
+    hold_w(robot, teleop_, 20)
+    assert robot.car.lm.state and robot.car.rm.state
+    assert robot.commands['w'].count == 1  # one ramp for the whole hold
+    assert teleop_.repeats == 20
+
+
+def test_release_brakes(robot):
+    config = teleop.config_teleop
+    teleop_ = teleop.Teleop(robot, terminal=PipeTerminal())
+    hold_w(robot, teleop_, 5)
+    robot.clock.sleep(config['release_timeout'] * 0.5)
+    teleop_.check_release()
+    assert robot.car.lm.state
+    robot.clock.sleep(config['release_timeout'])
+    teleop_.check_release()
+    assert not robot.car.lm.state and not robot.car.rm.state
+    assert teleop_.holding is None
+    assert [cmd['str'] for cmd in teleop_.history] == ['w', ' ']
+
+
+def test_deadman_brakes_a_press_that_is_never_repeated(robot):
+    config = teleop.config_teleop
+    teleop_ = teleop.Teleop(robot, terminal=PipeTerminal())
+    t_press = robot.clock.now()
+    teleop_.on_key('w', 0.0)  # the ramp blocks the loop on the clock too
+    robot.clock.sleep_until(t_press + config['deadman'] * 0.9)
+    teleop_.check_release()  # waiting for the first key repeat
+    assert robot.car.lm.state
+    robot.clock.sleep_until(t_press + config['deadman'] * 1.1)
+    teleop_.check_release()
+    assert not robot.car.lm.state and not robot.car.rm.state
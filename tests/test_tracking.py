@@ -0,0 +1,56 @@
+import numpy as np
+import tracking
+
+SHAPE = (120, 160)
+
+
+def blob_detector(image, min_size=None, max_size=None):
+    """Finds each bright square (a "face") in image."""
+    boxes = list()
+    for value in np.unique(image[image > 0]):
+        ys, xs = np.nonzero(image == value)
+        boxes.append((int(xs.min()), int(ys.min()),
+                      int(xs.max() - xs.min() + 1),
+                      int(ys.max() - ys.min() + 1)))
+    return boxes
+
+
+def frame(*faces):
+    """Frame with a bright square per (x, y, size) face."""
+    image = np.zeros(SHAPE, dtype=np.uint8)
+    for value, (x, y, size) in enumerate(faces, 1):
+        image[y:y + size, x:x + size] = value * 50
+    return image
+
+
+def test_tracks_the_largest_face_in_its_region():
+    detector = tracking.RoiDetector(blob_detector, full_every=100)
+    other = (130, 90, 16)  # small face far from the tracked one
+    faces = detector(frame((20, 20, 24), other), t=0.0)
+    assert len(faces) == 2
+    assert detector.tracker is not None
+    for i in range(1, 10):  # moving right at 40 px/s
+        x = 20 + 4 * i
+        faces = detector(frame((x, 20, 24), other), t=i * 0.1)
+        assert faces == [(x, 20, 24, 24)]  # frame coordinates, other unseen
+    assert detector.stats['full'] == 1
+    assert detector.stats['roi_hits'] == 9
+    assert abs(detector.tracker.vx - 40) < 10
+    assert detector.searched_fraction() < 0.5
+
+
+def test_lost_face_expires_after_max_misses():
+    detector = tracking.RoiDetector(blob_detector, max_misses=3,
+                                    full_every=100)
+    detector(frame((60, 40, 24)), t=0.0)
+    empty = frame()
+    for i in range(1, 3):
+        assert detector(empty, t=i * 0.1) == ()
+        assert detector.tracker is not None  # still predicted
+    assert detector.stats['full'] == 1
+    assert len(detector(empty, t=0.3)) == 0
+    assert detector.stats['full'] == 2  # third miss searched everywhere
+    assert detector.tracker is None
+    faces = detector(frame((10, 70, 24)), t=0.4)
+    assert faces == [(10, 70, 24, 24)]  # picked up again anywhere
+    assert detector.tracker is not None
@@ -0,0 +1,35 @@
+import pytest
+import trajectory
+
+RATE = trajectory.CONTROL_RATE
+
+
+@pytest.mark.parametrize('shape', sorted(trajectory.PROFILES))
+@pytest.mark.parametrize('start, end', [(150, 400), (400, 150)])
+def test_sample_ends_on_time_at_end(shape, start, end):
+    samples = trajectory.sample(start, end, 1.0, shape=shape)
+    ticks = [tick for tick, pl in samples]
+    pls = [pl for tick, pl in samples]
+    assert pls[-1] == end
+    # done within 1 s, the last ticks only round to end
+    assert 0.9 * RATE < ticks[-1] <= RATE
+    assert ticks == sorted(set(ticks))
+    assert pls == sorted(pls, reverse=end < start)  # monotonic
+    assert len(set(pls)) == len(pls)  # unchanged outputs skipped
+    assert len(samples) <= RATE
+
+
+def test_sample_duration_from_limits():
+    duration = trajectory.duration_of(150, 400, max_vel=500, max_accel=2000)
+    # accelerates for 0.25 s over 62.5, cruises 125 at 500 per s
+    assert duration == pytest.approx(0.75)
+    samples = trajectory.sample(150, 400, max_vel=500, max_accel=2000)
+    assert samples[-1][1] == 400
+    assert 0.7 * RATE < samples[-1][0] <= 0.75 * RATE
+
+
+@pytest.mark.parametrize('start, end, duration', [(300, 300, 1.0),
+                                                  (150, 400, 0)])
+def test_sample_degenerate_moves_jump(start, end, duration):
+    assert trajectory.sample(start, end, duration) == (
+        [] if start == end else [(1, end)])
@@ -0,0 +1,65 @@
+import pytest
+from hal import GPIO
+
+
+@pytest.fixture
+def uls(robot):
+    echo = GPIO.echoes[robot.uls.trig]
+    distance = echo.distance
+    yield robot.uls
+    echo.distance = distance
+
+
+def test_ping_in_virtual_time(uls, clock):
+    t0 = clock.now()
+    assert uls.ping() == pytest.approx(100)
+    assert clock.now() - t0 == pytest.approx(0.0002 + 200 / 34300, abs=2e-5)
+
+
+def test_missed_echo_times_out(uls, clock):
+    GPIO.echoes[uls.trig].distance = None
+    t0 = clock.now()
+    assert uls.ping() is None
+    assert clock.now() - t0 == pytest.approx(uls.timeout, abs=2e-5)
+
+
+def test_late_fall_is_not_taken_for_a_rise(uls, clock):
+    # the echo ends just after the ping timed out, as the next ping starts
+    GPIO.echoes[uls.trig].distance = 513
+    assert uls.ping() is None
+    GPIO.echoes[uls.trig].distance = 50
+    assert uls.ping() == pytest.approx(50)
+
+
+def sample(uls, clock, pings, rate):
+    """Runs the sampler until it has pinged pings times."""
+    times = list()
+    ping = uls.ping
+
+    def counted_ping():
+        times.append(clock.now())
+        if len(times) == pings:
+            uls.sampling.clear()
+        return ping()
+
+    uls.ping = counted_ping
+    uls.rate = rate
+    uls.sampling.set()
+    try:
+        uls.run_sampler()
+    finally:
+        del uls.ping
+    return [round(b - a, 6) for a, b in zip(times, times[1:])]
+
+
+def test_sampler_paces_pings_on_the_clock(uls, clock):
+    assert sample(uls, clock, 5, rate=10) == [0.1] * 4
+    assert uls.read() == pytest.approx(100)
+    assert uls.filter.distance() == pytest.approx(100)
+
+
+def test_sampler_that_falls_behind_does_not_catch_up(uls, clock):
+    GPIO.echoes[uls.trig].distance = None  # every ping times out
+    assert sample(uls, clock, 4, rate=50) == [
+        pytest.approx(uls.timeout + 0.00001, abs=1e-5)] * 3
+    assert uls.read() is None
@@ -0,0 +1,93 @@
+import os
+import threading
+import time
+import numpy as np
+import vision_worker
+
+SHAPE = (24, 32)
+
+
+def numbered_frames(count=200):
+    """Frames filled with their number (mod 256), one a millisecond."""
+    for i in range(count):
+        time.sleep(0.001)
+        yield np.full(SHAPE, i % 256, dtype=np.uint8)
+
+
+def slow_detector():
+    def detect(frame):
+        time.sleep(0.002)
+        return ()
+    return detect
+
+
+def dying_detector():
+    def detect(frame):
+        os._exit(1)
+    return detect
+
+
+def test_results_are_not_overwritten_while_held():
+    worker = vision_worker.VisionWorker(numbered_frames(), SHAPE,
+                                        make_detector=slow_detector, nice=0)
+    torn = list()
+
+    def on_result(result):
+        value = result['frame'][0, 0]
+        time.sleep(0.005)  # slower than capture and detection
+        if not (result['frame'] == value).all():
+            torn.append(result['seq'])
+
+    summary = worker.run(on_result)
+    assert summary['results']['frames'] > 0
+    assert torn == []
+
+
+def test_dead_worker_stops_cleanly(monkeypatch):
+    errors = list()
+    monkeypatch.setattr(threading, 'excepthook', errors.append)
+    worker = vision_worker.VisionWorker(numbered_frames(), SHAPE,
+                                        make_detector=dying_detector, nice=0)
+    summary = worker.run()
+    assert summary['results']['frames'] == 0
+    assert worker.process.exitcode == 1
+    assert errors == []
+
+
+class FakeConn():
+    """Pipe end that hands out messages, then reports the worker done."""
+    def __init__(self, messages):
+        self.messages = list(messages)
+        self.sent = list()
+
+    def recv(self):
+        if not self.messages:
+            raise EOFError
+        return self.messages.pop(0)
+
+    def send(self, msg):
+        self.sent.append(msg)
+
+
+def test_capture_does_not_write_over_a_pending_result():
+    worker = vision_worker.VisionWorker([np.full(SHAPE, 9, dtype=np.uint8)],
+                                        SHAPE, slots=3)
+    buf = bytearray(SHAPE[0] * SHAPE[1] * worker.slots)
+    worker.views = vision_worker.slot_views(buf, SHAPE, worker.slots)
+    worker.views[0][:] = 7
+    worker.in_flight = 0
+    worker.waiting = None
+    worker.sent_seq = 0
+    worker.conn = FakeConn([(1, 0.0, 0.0, ())])
+    worker.running.set()
+    put = worker.result_slot.put
+
+    def capture_then_put(result):  # a frame arrives before the put
+        worker.capture()
+        return put(result)
+
+    worker.result_slot.put = capture_then_put
+    worker.receive()
+    assert (worker.views[0] == 7).all()
+    assert worker.conn.sent[0][0] != 0  # the new frame went elsewhere
+    assert worker.holds == [1, 0, 0]  # only the result slot holds it
@@ -0,0 +1,52 @@
+import os
+import sys
+import time
+import config
+import watchdog
+
+
+def test_heartbeat_check_is_on_by_default():
+    assert config.config_watchdog['heartbeat_timeout'] is not None
+
+
+def test_missing_heartbeat_brakes(robot):
+    dog = watchdog.Watchdog(robot.car, config=config.config_watchdog)
+    robot.car.drive(1)
+    dog.heartbeat()
+    dog.check()
+    assert robot.car.lm.state and robot.car.rm.state
+    dog.last_heartbeat_ns -= int(dog.heartbeat_timeout * 1e9) + 1
+    dog.check()
+    assert not robot.car.lm.state and not robot.car.rm.state
+    assert dog.trips[-1][0] == 'heartbeat'
+
+
+def test_stopped_car_does_not_trip(robot):
+    dog = watchdog.Watchdog(robot.car, config=config.config_watchdog)
+    dog.last_heartbeat_ns = time.perf_counter_ns() - int(10e9)
+    dog.check()
+    assert not dog.trips
+
+
+def test_menu_beats_only_on_operator_input(robot, monkeypatch):
+    import io
+    import threading
+    import main
+    read, write = os.pipe()
+    monkeypatch.setattr(sys, 'stdin', io.TextIOWrapper(io.FileIO(read)))
+    dog = robot.watchdog
+    dog.last_heartbeat_ns = 0
+    lines = list()
+    reader = threading.Thread(target=lambda: lines.append(
+        main.read_cmd(robot, prompt='')))
+    reader.start()
+    time.sleep(0.1)  # a stalled operator
+    assert dog.last_heartbeat_ns == 0
+    robot.car.drive(1)
+    dog.check()  # the open ended drive is braked
+    assert dog.trips[-1][0] == 'heartbeat'
+    os.write(write, b'w\n')
+    reader.join()
+    os.close(write)
+    assert lines == ['w']
+    assert dog.last_heartbeat_ns > 0
@@ -0,0 +1,145 @@
+import config_log
+import logging
+import time
+import face
+
+
+class ConstantVelocityTracker():
+    """Alpha-beta filter (a steady state Kalman filter for a constant
+    velocity model) on the centre and size of a face box.
+
+    """
+    def __init__(self, box, t, alpha=0.6, beta=0.2):
+        """
+        Args:
+        box (tuple): First (x, y, w, h) seen.
+        t (float): Time of the frame box came from (seconds).
+        alpha (float): Weight of a measurement in the position estimate.
+        beta (float): Weight of a measurement in the velocity estimate.
+
+        """
+        self.alpha = alpha
+        self.beta = beta
+        self.x, self.y = face.get_center(box)
+        self.w, self.h = box[2], box[3]
+        self.vx, self.vy = 0.0, 0.0  # pixels per second
+        self.t = t
+
+    def predict(self, t):
+        """Box (x, y, w, h) the face is expected at at time t."""
+        dt = t - self.t
+        x = self.x + self.vx * dt
+        y = self.y + self.vy * dt
+        return (int(x - self.w / 2), int(y - self.h / 2),
+                int(self.w), int(self.h))
+
+    def update(self, box, t):
+        """Corrects the estimate with a box measured at time t."""
+        dt = t - self.t
+        px, py = self.x + self.vx * dt, self.y + self.vy * dt
+        mx, my = face.get_center(box)
+        rx, ry = mx - px, my - py  # residuals
+        self.x = px + self.alpha * rx
+        self.y = py + self.alpha * ry
+        if dt > 0:
+            self.vx += self.beta * rx / dt
+            self.vy += self.beta * ry / dt
+        self.w += self.alpha * (box[2] - self.w)
+        self.h += self.alpha * (box[3] - self.h)
+        self.t = t
+
+
+class RoiDetector():
+    """Face detector that, once it has found a face, only searches a padded
+    region around where a ConstantVelocityTracker predicts it, for face
+    sizes close to the last one. The whole frame is searched again after
+    max_misses frames in a row without a face in the region, and every
+    full_every frames to pick up other faces.
+
+    Call it like face.detect(); it returns boxes in frame coordinates.
+
+    """
+    def __init__(self, detector=face.detect, pad=0.6, size_range=(0.7, 1.4),
+                 max_misses=3, full_every=15):
+        """
+        Args:
+        detector (callable): detector(image, min_size=..., max_size=...)
+        returning (x, y, w, h) boxes, e.g. face.detect.
+        pad (float): Padding on each side of the predicted box, as a
+        fraction of its size.
+        size_range (tuple): Smallest and largest face searched for in the
+        region, as fractions of the predicted size.
+        max_misses (int): Misses in a row before going back to full frame.
+        full_every (int): Frames between forced full frame searches.
+
+        """
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.DEBUG)
+        self.detector = detector
+        self.pad = pad
+        self.size_range = size_range
+        self.max_misses = max_misses
+        self.full_every = full_every
+        self.tracker = None
+        self.misses = 0
+        self.since_full = 0
+        self.stats = {'full': 0, 'roi': 0, 'roi_hits': 0, 'pixels': 0,
+                      'frame_pixels': 0}
+
+    def roi(self, box, shape):
+        """Padded region (x0, y0, x1, y1) around box clipped to shape."""
+        x, y, w, h = box
+        pad_x, pad_y = int(w * self.pad), int(h * self.pad)
+        return (max(x - pad_x, 0), max(y - pad_y, 0),
+                min(x + w + pad_x, shape[1]), min(y + h + pad_y, shape[0]))
+
+    def full_search(self, frame, t):
+        self.stats['full'] += 1
+        self.stats['pixels'] += frame.shape[0] * frame.shape[1]
+        self.since_full = 0
+        faces = self.detector(frame)
+        if len(faces):
+            largest = max(faces, key=lambda dims: dims[2] * dims[3])
+            self.tracker = ConstantVelocityTracker(largest, t)
+            self.misses = 0
+        else:
+            self.tracker = None
+        return faces
+
+    def __call__(self, frame, t=None):
+        t = time.perf_counter() if t is None else t
+        self.stats['frame_pixels'] += frame.shape[0] * frame.shape[1]
+        self.since_full += 1
+        if self.tracker is None or self.since_full >= self.full_every:
+            return self.full_search(frame, t)
+
+        predicted = self.tracker.predict(t)
+        x0, y0, x1, y1 = self.roi(predicted, frame.shape)
+        if x1 - x0 < predicted[2] or y1 - y0 < predicted[3]:
+            return self.full_search(frame, t)  # predicted off the frame
+        size = max(predicted[2], predicted[3])
+        low, high = self.size_range
+        self.stats['roi'] += 1
+        self.stats['pixels'] += (x1 - x0) * (y1 - y0)
+        faces = self.detector(frame[y0:y1, x0:x1],
+                              min_size=(int(size * low),) * 2,
+                              max_size=(int(size * high),) * 2)
+        if len(faces) == 0:
+            self.misses += 1
+            if self.misses >= self.max_misses:
+                self.logger.debug('Lost track, searching whole frame')
+                return self.full_search(frame, t)
+            return ()
+
+        self.stats['roi_hits'] += 1
+        self.misses = 0
+        faces = [(fx + x0, fy + y0, fw, fh) for fx, fy, fw, fh in faces]
+        px, py = face.get_center(predicted)
+        nearest = min(faces, key=lambda dims: (face.get_center(dims)[0] - px)
+                      ** 2 + (face.get_center(dims)[1] - py) ** 2)
+        self.tracker.update(nearest, t)
+        return faces
+
+    def searched_fraction(self):
+        """Fraction of all frame pixels the cascade was run over."""
+        return self.stats['pixels'] / max(self.stats['frame_pixels'], 1)
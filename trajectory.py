@@ -0,0 +1,153 @@
+import math
+import pca9685
+
+CONTROL_RATE = pca9685.PWM_FREQ  # one sample per PWM frame (Hz)
+RAMP_FRACTION = 0.25  # fraction of a timed trapezoid spent accelerating
+
+
+def trapezoid(distance, duration=None, max_vel=None, max_accel=None):
+    """Builds a trapezoidal velocity profile covering distance.
+
+    Either give duration (accelerate for RAMP_FRACTION of it, cruise,
+    then decelerate) or max_vel and optionally max_accel (fastest move
+    within those limits, triangular if cruise speed is never reached).
+
+    Args:
+    distance (float): Nonnegative distance to cover (pulse levels).
+    duration (float): Total time of the move in seconds.
+    max_vel (float): Velocity limit in pulse levels per second.
+    max_accel (float): Acceleration limit in pulse levels per second^2.
+
+    Returns:
+    tuple: (duration, position) where position(t) gives the distance
+    covered at time t.
+
+    """
+    if distance == 0 or (duration is not None and duration <= 0):
+        return 0.0, lambda t: float(distance)
+    if duration is not None:
+        t_acc = duration * RAMP_FRACTION
+        vel = distance / (duration - t_acc)
+        accel = vel / t_acc
+    elif max_vel is not None:
+        vel = float(max_vel)
+        accel = float(max_accel) if max_accel else math.inf
+        t_acc = vel / accel
+        if distance < vel * t_acc:  # never reaches cruise: triangular
+            t_acc = math.sqrt(distance / accel)
+            vel = accel * t_acc
+        duration = distance / vel + t_acc
+    else:
+        raise ValueError('Need a duration or a max_vel')
+
+    t_dec = duration - t_acc
+
+    def position(t):
+        if t <= 0:
+            return 0.0
+        elif t < t_acc:
+            return 0.5 * accel * t * t
+        elif t < t_dec:
+            return vel * (t - t_acc / 2)
+        elif t < duration:
+            return distance - 0.5 * accel * (duration - t) ** 2
+        return float(distance)
+
+    return duration, position
+
+
+def s_curve(distance, duration=None, max_vel=None, max_accel=None):
+    """Builds a minimum jerk (quintic) profile covering distance. Same
+    arguments and return value as trapezoid(). Smoother than a trapezoid
+    since acceleration is continuous, at the cost of a higher peak
+    velocity for the same duration.
+
+    """
+    if distance == 0 or (duration is not None and duration <= 0):
+        return 0.0, lambda t: float(distance)
+    if duration is None:
+        if max_vel is None:
+            raise ValueError('Need a duration or a max_vel')
+        duration = 1.875 * distance / max_vel  # peak vel = 1.875 D / T
+        if max_accel:  # peak accel = 5.7735 D / T^2
+            duration = max(duration, math.sqrt(5.7735 * distance / max_accel))
+
+    def position(t):
+        if t <= 0:
+            return 0.0
+        elif t >= duration:
+            return float(distance)
+        u = t / duration
+        return distance * u ** 3 * (10 - 15 * u + 6 * u * u)
+
+    return duration, position
+
+
+PROFILES = {'trapezoid': trapezoid, 's_curve': s_curve}
+
+
+def duration_of(start, end, duration=None, max_vel=None, max_accel=None,
+                shape='trapezoid'):
+    """Time in seconds a move from start to end takes. Arguments as in
+    sample().
+
+    """
+    return PROFILES[shape](abs(end - start), duration, max_vel, max_accel)[0]
+
+
+def sample(start, end, duration=None, max_vel=None, max_accel=None,
+           shape='trapezoid', rate=CONTROL_RATE):
+    """Samples a move from start to end at a fixed control rate, keeping
+    only the ticks where the (integer) output changes.
+
+    Args:
+    start (int): Starting pulse level.
+    end (int): Ending pulse level.
+    duration, max_vel, max_accel: See trapezoid().
+    shape (str): Key of PROFILES ('trapezoid' or 's_curve').
+    rate (float): Control rate in Hz.
+
+    Returns:
+    list: (tick, pulse level) tuples in tick order. Tick i is due i/rate
+    seconds after the start of the move. The last pulse level is end.
+
+    """
+    distance = abs(end - start)
+    step = -1 if end < start else 1
+    duration, position = PROFILES[shape](distance, duration, max_vel,
+                                         max_accel)
+    ticks = max(1, int(math.ceil(duration * rate - 1e-9)))
+    samples = list()
+    last = start
+    for tick in range(1, ticks + 1):
+        pl = start + step * int(round(position(tick / rate)))
+        if tick == ticks:
+            pl = end
+        if pl != last:
+            samples.append((tick, pl))
+            last = pl
+    return samples
+
+
+def ramp(start, end, max_accel=None, rate=50, duration=None):
+    """Linear ramp of a speed from start to end that keeps the change per
+    second within max_accel (or takes duration seconds).
+
+    Args:
+    start (float): Starting speed.
+    end (float): Ending speed.
+    max_accel (float): Largest change of speed per second, None to jump
+    straight to end.
+    rate (float): Control rate in Hz.
+    duration (float): Length of the ramp in seconds, overrides max_accel.
+
+    Returns:
+    list: (tick, speed) tuples, tick i due i/rate seconds after the start.
+    The last speed is end.
+
+    """
+    if duration is None:
+        duration = abs(end - start) / max_accel if max_accel else 0.0
+    ticks = max(1, int(math.ceil(duration * rate - 1e-9)))
+    return [(tick, start + (end - start) * tick / ticks)
+            for tick in range(1, ticks + 1)]
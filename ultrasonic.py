@@ -1,36 +1,105 @@
 # Libraries
 import config_log
 import logging
-import RPi.GPIO as GPIO
+from hal import GPIO
+import range_filter
+import clocks
+import threading
 import time
 
-GPIO.setmode(GPIO.BCM)
-
 
 class UltrasonicSensor():
-    """Class for Elegoo HC-SR04 Ultrasonic Module Distance Sensor"""
+    """Class for Elegoo HC-SR04 Ultrasonic Module Distance Sensor. The echo
+    pulse is timed with GPIO edge callbacks instead of polling, and a
+    background sampler can keep the latest distance up to date for
+    callers that mustn't block.
+
+    """
 
     speed_of_sound = 34300  # cm/s
 
-    def __init__(self, config):
+    def __init__(self, config, clock=None):
         """
         Args:
         config (dict): configuration dictionary containing string keys
         for the following values:
             'trig' (int): BCM number for tigger (output pi --> sensor) GPIO pin
             'echo' (int): BCM number for echo (input sensor --> pi) GPIO pin
+            'timeout' (float): Optional. Seconds to wait for an echo before
+            counting the ping as missed (default 0.03, about 5 m).
+            'rate' (float): Optional. Pings per second made by the
+            background sampler (default 15).
+            'filter' (dict): Optional. Keyword arguments for the
+            range_filter.RangeFilter fed by the background sampler.
+        clock (RealClock or VirtualClock): Clock pings are timed and waited
+        on. Defaults to clocks.get_clock().
 
         """
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.DEBUG)
         self.config = config
+        self.clock = clock or clocks.get_clock()
         self.trig = self.config['trig']
         self.echo = self.config['echo']
+        self.timeout = self.config.get('timeout', 0.03)
+        self.rate = self.config.get('rate', 15)
+        self.ping_lock = threading.Lock()  # one ping in flight at a time
+        self.echo_done = threading.Event()
+        self.t_rise = None  # clock time of the echo's rising edge
+        self.t_fall = None  # clock time of the echo's falling edge
+        self.latest = (None, 0)  # (distance in cm, perf_counter_ns of ping)
+        self.filter = range_filter.RangeFilter(**self.config.get('filter',
+                                                                 dict()))
+        self.sampler = None
+        self.sampling = threading.Event()
         self.setup()
 
     def setup(self):
-        GPIO.setup(self.trig, GPIO.OUT)
+        GPIO.setup(self.trig, GPIO.OUT, initial=GPIO.LOW)
         GPIO.setup(self.echo, GPIO.IN)
+        GPIO.add_event_detect(self.echo, GPIO.BOTH, callback=self.on_echo)
+
+    def on_echo(self, channel):
+        """GPIO callback for both edges of the echo pulse. The pin level
+        tells the edges apart, so the tail of an echo that came back after
+        its ping timed out isn't taken for the start of the next one.
+
+        """
+        now = self.clock.now()
+        if GPIO.input(channel):
+            if self.t_fall is None:
+                self.t_rise = now
+        elif self.t_rise is not None and self.t_fall is None:
+            self.t_fall = now
+            self.echo_done.set()
+
+    def ping(self, timeout=None):
+        """Sends one ping and waits for its echo.
+
+        Args:
+        timeout (float): Seconds to wait for the echo. Defaults to
+        self.timeout.
+
+        Returns:
+        float: Distance from sensor in centimeters, or None if no echo came
+        back in time.
+
+        """
+        timeout = self.timeout if timeout is None else timeout
+        with self.ping_lock:
+            self.t_rise, self.t_fall = None, None
+            self.echo_done.clear()
+
+            # Send 0.01 ms pulse to Trigger
+            GPIO.output(self.trig, GPIO.HIGH)
+            self.clock.sleep(0.00001)
+            GPIO.output(self.trig, GPIO.LOW)
+
+            if not self.clock.wait(self.echo_done, timeout):
+                self.logger.debug('Missed echo')
+                return None
+            elapsed = self.t_fall - self.t_rise
+        return (elapsed * self.speed_of_sound) / 2  # in cm
 
     def get_distance(self):
         """Gets distance in straight line emanating from sensor by computing
@@ -41,24 +110,64 @@ class UltrasonicSensor():
         None
 
         Returns:
-        float: Distance from sensor in centimeters.
+        float: Distance from sensor in centimeters, None on a missed echo.
         """
-        t0, t1 = float(), float()
+        return self.ping()
+
+    def start(self, rate=None):
+        """Starts pinging in a background thread. Read the results with
+        UltrasonicSensor.read().
 
-        # Send 0.01 ms pulse to Trigger
-        GPIO.output(self.trig, GPIO.HIGH)
-        time.sleep(0.00001)
-        GPIO.output(self.trig, GPIO.LOW)
+        Args:
+        rate (float): Pings per second. Defaults to self.rate.
 
-        # set starting time before receiving signal
-        while GPIO.input(self.echo) == 0:
-            t0 = time.time()
+        Returns:
+        None
 
-        # set ending time once signal received
-        while GPIO.input(self.echo) == 1:
-            t1 = time.time()
+        """
+        if self.sampler is not None:
+            return
+        if rate is not None:
+            self.rate = rate
+        self.sampling.set()
+        self.sampler = threading.Thread(target=self.run_sampler,
+                                        name='ultrasonic', daemon=True)
+        self.sampler.start()
+
+    def stop(self):
+        """Stops the background sampler."""
+        self.sampling.clear()
+        if self.sampler is not None:
+            self.sampler.join()
+            self.sampler = None
+
+    def run_sampler(self):
+        """Pings self.rate times a second on self.clock until stopped. The
+        pings are stamped with perf_counter_ns, which the filter's age and
+        the watchdog's brake latency are measured against.
 
-        return ((t1 - t0) * self.speed_of_sound) / 2  # in cm
+        """
+        period = 1 / self.rate
+        deadline = self.clock.now()
+        while self.sampling.is_set():
+            self.latest = (self.ping(), time.perf_counter_ns())
+            self.filter.push(*self.latest)
+            deadline += period
+            if deadline > self.clock.now():
+                self.clock.sleep_until(deadline)
+            else:  # fell behind, don't try to catch up
+                deadline = self.clock.now()
+
+    def read(self):
+        """Latest raw distance from the background sampler without blocking.
+        self.filter gives the filtered distance, closing speed and age.
+
+        Returns:
+        float: Distance in centimeters, None if the last ping was missed or
+        the sampler hasn't pinged yet.
+
+        """
+        return self.latest[0]
 
 
 if __name__ == "__main__":
@@ -66,6 +175,12 @@ if __name__ == "__main__":
     config_ultrasonic = {'trig': 23,
                          'echo': 24}
     u_sensor = UltrasonicSensor(config_ultrasonic)
-    while True:
-        print(round(u_sensor.get_distance(), 1))
-        time.sleep(.25)
+    u_sensor.start(4)
+    try:
+        while True:
+            print(u_sensor.read(), u_sensor.filter.distance(),
+                  u_sensor.filter.speed())
+            time.sleep(.25)
+    except KeyboardInterrupt:
+        u_sensor.stop()
+        GPIO.cleanup()
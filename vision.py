@@ -3,8 +3,8 @@ from config import config_camera_servo
 
 
 class Cam(servos.ServoMotor):
-    def __init__(self, config):
-        servos.ServoMotor.__init__(self, config)
+    def __init__(self, config, clock=None):
+        servos.ServoMotor.__init__(self, config, clock)
         self.min = self.config['min_pl']
         self.max = self.config['max_pl']
         
@@ -0,0 +1,302 @@
+"""Face detection in a separate process, so a slow detection never holds
+the GIL while motor and sensor loops need it.
+
+Frames go to the worker through a ring of slots in shared memory
+(multiprocessing.shared_memory): the parent copies each frame into a free
+slot and only sends the slot number down a pipe, no frame is pickled.
+Results come back over a pipe as small tuples. One frame is in flight at a
+time; frames captured while the worker is busy overwrite each other and
+only the newest is sent next, as in face_pipeline.FacePipeline. A slot
+whose result is being handed out is held until the caller is done with
+it, so frames are never copied into a slot that is still being read.
+
+"""
+import config_log
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing import shared_memory
+import numpy as np
+from face_pipeline import FrameSlot, StageStats
+
+
+def default_detector():
+    """Detector the worker uses unless told otherwise. Runs in the worker
+    process, so backends are loaded and warmed up there.
+
+    """
+    import adaptive
+    import detectors
+    import gate
+    import tracking
+    name, backend = detectors.choose()
+    return gate.MotionGate(tracking.RoiDetector(
+        adaptive.AdaptiveDetector(detector=backend)))
+
+
+def slot_views(buf, shape, slots):
+    """numpy views of the frame slots in a shared memory buffer."""
+    size = shape[0] * shape[1]
+    return [np.ndarray(shape, dtype=np.uint8, buffer=buf, offset=i * size)
+            for i in range(slots)]
+
+
+def worker_main(shm_name, shape, slots, conn, make_detector, nice):
+    """Body of the worker process: detects faces in the slots it is sent
+    until it gets None.
+
+    """
+    if nice:
+        os.nice(nice)  # let the control loops win the CPU
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        frames = slot_views(shm.buf, shape, slots)
+        detector = make_detector()
+        conn.send('ready')
+        while True:
+            msg = conn.recv()
+            if msg is None:
+                if hasattr(detector, 'skip_ratio'):  # gate.MotionGate
+                    conn.send({'skip_ratio': detector.skip_ratio()})
+                break
+            slot, seq, t_capture = msg
+            faces = detector(frames[slot])
+            conn.send((seq, t_capture, time.perf_counter(),
+                       tuple(tuple(int(v) for v in dims) for dims in faces)))
+    finally:
+        del frames
+        shm.close()
+        conn.close()
+
+
+class VisionWorker():
+    """Runs a detector in a worker process on frames from a frame source.
+    Same interface as face_pipeline.FacePipeline without the display:
+    start(), stop(), results(), run(on_result) and summary(), with the same
+    detection dicts (result['frame'] is the shared memory slot, valid until
+    the caller asks for the next result).
+
+    """
+    def __init__(self, frames, shape, make_detector=default_detector,
+                 slots=5, nice=5):
+        """
+        Args:
+        frames (iterable): Gray frames, e.g. a source from frame_sources.py.
+        shape (tuple): (height, width) of the frames.
+        make_detector (callable): Module level function returning the
+        detector, called in the worker process.
+        slots (int): Frame slots in shared memory, at least 3 (one being
+        detected, one waiting, one being written), plus up to two held
+        for results (the newest and the one being handed out). Frames that
+        find no free slot are dropped.
+        nice (int): Niceness added to the worker process.
+
+        """
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.DEBUG)
+        self.frames = frames
+        self.shape = tuple(shape)
+        self.make_detector = make_detector
+        self.slots = max(slots, 3)
+        self.nice = nice
+        self.lock = threading.Lock()
+        self.holds = [0] * self.slots  # holders of each slot's result
+        self.result_slot = FrameSlot(self.hold, self.release)
+        self.stats = {name: StageStats(name)
+                      for name in ('capture', 'detect', 'results')}
+        self.running = threading.Event()
+        self.threads = list()
+        self.shm = None
+        self.process = None
+        self.detector_stats = dict()  # sent by the worker when it stops
+
+    def start(self):
+        size = self.shape[0] * self.shape[1] * self.slots
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.views = slot_views(self.shm.buf, self.shape, self.slots)
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=worker_main, name='vision',
+            args=(self.shm.name, self.shape, self.slots, child_conn,
+                  self.make_detector, self.nice), daemon=True)
+        self.process.start()
+        child_conn.close()
+        try:
+            ready = self.conn.recv()
+        except EOFError:  # make_detector raised in the worker
+            ready = None
+        if ready != 'ready':
+            self.process.join()
+            self.conn.close()
+            del self.views
+            self.shm.close()
+            self.shm.unlink()
+            raise RuntimeError('Vision worker failed to start')
+        self.in_flight = None  # slot the worker is detecting on
+        self.waiting = None  # (slot, seq, t_capture) of the newest frame
+        self.sent_seq = 0
+        self.running.set()
+        for target in (self.capture, self.receive):
+            thread = threading.Thread(target=target, daemon=True,
+                                      name=target.__name__)
+            thread.start()
+            self.threads.append(thread)
+
+    def slot_of(self, frame):
+        return next(i for i, view in enumerate(self.views) if view is frame)
+
+    def hold(self, result):
+        with self.lock:
+            self.holds[self.slot_of(result['frame'])] += 1
+
+    def release(self, result):
+        with self.lock:
+            self.holds[self.slot_of(result['frame'])] -= 1
+
+    def send_waiting(self):
+        """Sends the newest frame if the worker is idle (lock held)."""
+        if self.in_flight is None and self.waiting is not None:
+            slot, seq, t_capture = self.waiting
+            self.stats['detect'].dropped += seq - self.sent_seq - 1
+            self.conn.send(self.waiting)
+            self.in_flight = slot
+            self.sent_seq = seq
+            self.waiting = None
+
+    def capture(self):
+        stats = self.stats['capture']
+        t_last = time.perf_counter()
+        frames = iter(self.frames)
+        seq = 0
+        try:
+            for frame in frames:
+                if not self.running.is_set():
+                    break
+                with self.lock:
+                    busy = (self.in_flight,
+                            self.waiting and self.waiting[0])
+                    free = [i for i in range(self.slots)
+                            if i not in busy and not self.holds[i]]
+                if not free:
+                    stats.dropped += 1
+                    continue
+                slot = free[0]
+                self.views[slot][:] = frame
+                t_capture = time.perf_counter()
+                seq += 1
+                with self.lock:
+                    self.waiting = (slot, seq, t_capture)
+                    self.send_waiting()
+                stats.record(t_capture - t_last)
+                t_last = t_capture
+        finally:
+            self.running.clear()
+            if hasattr(frames, 'close'):  # generator
+                frames.close()
+            with self.lock:
+                try:
+                    self.conn.send(None)
+                except OSError as e:  # worker gone, don't hide why
+                    self.logger.warning('Could not stop vision worker: '
+                                        '{}'.format(e))
+
+    def receive(self):
+        stats = self.stats['detect']
+        try:
+            while True:
+                try:
+                    msg = self.conn.recv()
+                except EOFError:  # worker done
+                    break
+                except ConnectionResetError:
+                    self.logger.warning('Vision worker died')
+                    break
+                if isinstance(msg, dict):
+                    self.detector_stats = msg
+                    continue
+                seq, t_capture, t_detected, faces = msg
+                with self.lock:
+                    slot = self.in_flight
+                    self.holds[slot] += 1  # until the result slot has it
+                    self.in_flight = None
+                    if self.running.is_set():
+                        self.send_waiting()
+                stats.record(t_detected - t_capture)
+                result = {'seq': seq,
+                          'frame': self.views[slot],
+                          'faces': faces,
+                          't_capture': t_capture,
+                          't_detected': t_detected}
+                self.result_slot.put(result)
+                self.release(result)
+        finally:
+            self.result_slot.close()
+
+    def stop(self):
+        self.running.clear()
+        for thread in self.threads:
+            thread.join()
+        self.threads = list()
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.logger.warning('Vision worker did not stop, terminating')
+            self.process.terminate()
+        self.conn.close()
+        del self.views
+        self.shm.close()
+        self.shm.unlink()
+
+    def results(self, timeout=1.0):
+        """Yields detection dicts as they come back from the worker,
+        skipping ones the caller was too slow to see.
+
+        """
+        stats = self.stats['results']
+        seq = 0
+        while True:
+            new_seq, result = self.result_slot.get(seq, timeout)
+            if result is None:
+                if self.result_slot.closed:
+                    break
+                continue
+            try:
+                stats.dropped += new_seq - seq - 1
+                seq = new_seq
+                stats.record(time.perf_counter() - result['t_capture'])
+                yield result
+            finally:
+                self.release(result)
+
+    def run(self, on_result=None):
+        """Starts the worker and runs it until the frames run out.
+
+        Returns:
+        dict: Stage name --> StageStats.summary(), and 'detector' -->
+        the skip ratio of the worker's motion gate, if it has one.
+
+        """
+        self.start()
+        try:
+            for result in self.results():
+                if on_result is not None:
+                    on_result(result)
+        finally:
+            self.stop()
+        return self.summary()
+
+    def summary(self):
+        summary = {name: stats.summary()
+                   for name, stats in self.stats.items()}
+        summary['detector'] = self.detector_stats
+        return summary
+
+
+if __name__ == "__main__":
+    import frame_sources
+    from face_pipeline import print_result
+    source = frame_sources.PiCameraSource()
+    worker = VisionWorker(source, (source.height, source.width))
+    for name, summary in worker.run(print_result).items():
+        print(name, summary)
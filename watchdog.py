@@ -0,0 +1,174 @@
+import config_log
+import logging
+import collections
+import os
+import threading
+import time
+
+
+class Watchdog():
+    """Safety watchdog for the car base of CARM. Runs in its own (real
+    time priority if allowed) thread and brakes the car when:
+
+      - an IR sensor reports an obstruction while the car moves forwards
+        (handled straight from the sensor's edge callback),
+      - the filtered ultrasonic distance is below min_distance while the
+        car moves forwards,
+      - the control loop stops calling heartbeat() while a motor runs.
+
+    The time from the triggering event to the brake is recorded for every
+    trip so the thresholds can be tuned.
+
+    """
+    def __init__(self, car, irs=(), uls=None, config=None):
+        """
+        Args:
+        car (Car): Car to brake.
+        irs (iterable): IRSensor objects facing forwards.
+        uls (UltrasonicSensor): Forward facing ultrasonic sensor or None.
+        config (dict): configuration dictionary containing string keys
+        for the following (all optional) values:
+            'min_distance' (float): Brake when closer than this (cm).
+            Default 15.
+            'heartbeat_timeout' (float): Brake when heartbeat() hasn't
+            been called for this many seconds. None (default) disables
+            the heartbeat check.
+            'period' (float): Seconds between checks. Default 0.01.
+            'priority' (int): SCHED_FIFO priority of the watchdog thread,
+            None to leave it alone. Default 50.
+            'history' (int): Number of trips kept. Default 256.
+
+        """
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.DEBUG)
+        config = config or dict()
+        self.car = car
+        self.irs = tuple(irs)
+        self.uls = uls
+        self.min_distance = config.get('min_distance', 15)
+        self.heartbeat_timeout = config.get('heartbeat_timeout')
+        self.period = config.get('period', 0.01)
+        self.priority = config.get('priority', 50)
+        self.trips = collections.deque(maxlen=config.get('history', 256))
+        self.last_heartbeat_ns = time.perf_counter_ns()
+        self.brake_lock = threading.Lock()
+        self.running = threading.Event()
+        self.thread = None
+
+    def heartbeat(self):
+        """Called by the control loop to show it's still alive."""
+        self.last_heartbeat_ns = time.perf_counter_ns()
+
+    def moving_forwards(self):
+        return sum(motor.direction for motor in self.car.motor_lst) > 0
+
+    def moving(self):
+        return any(motor.state for motor in self.car.motor_lst)
+
+    def trip(self, reason, event_ns):
+        """Brakes the car and records how long after event_ns it happened.
+
+        Args:
+        reason (str): What triggered the brake.
+        event_ns (int): perf_counter_ns of the triggering event.
+
+        Returns:
+        None
+
+        """
+        with self.brake_lock:
+            self.car.brake()
+            latency = (time.perf_counter_ns() - event_ns) / 1e9
+        self.trips.append((reason, latency))
+        self.logger.info('Braked ({}), reaction {:.2f} ms'.format(
+            reason, latency * 1000))
+
+    def on_ir(self, sensor, level, t_ns):
+        """IRSensor subscriber. 0 means obstruction."""
+        if level == 0 and self.moving_forwards():
+            self.trip('ir {}'.format(sensor.name), t_ns)
+
+    def check(self):
+        """Runs all the checks once (IR edges are also caught by on_ir)."""
+        now = time.perf_counter_ns()
+        if self.moving_forwards():
+            for sensor in self.irs:
+                if sensor.signal == 0:  # obstruction the car drove into
+                    self.trip('ir {}'.format(sensor.name), now)
+                    return
+            if self.uls is not None:
+                distance = self.uls.filter.distance()
+                if distance is not None and distance < self.min_distance:
+                    self.trip('ultrasonic {:.1f} cm'.format(distance),
+                              self.uls.filter.last_ns)
+                    return
+        if self.heartbeat_timeout is not None and self.moving():
+            deadline = self.last_heartbeat_ns + int(self.heartbeat_timeout
+                                                    * 1e9)
+            if now > deadline:
+                self.trip('heartbeat', deadline)
+
+    def start(self):
+        """Starts the watchdog thread (and the ultrasonic sampler)."""
+        if self.thread is not None:
+            return
+        self.heartbeat()
+        for sensor in self.irs:
+            sensor.subscribe(self.on_ir)
+        if self.uls is not None:
+            self.uls.start()
+        self.running.set()
+        self.thread = threading.Thread(target=self.run, name='watchdog',
+                                       daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running.clear()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        for sensor in self.irs:
+            sensor.unsubscribe(self.on_ir)
+        if self.uls is not None:
+            self.uls.stop()
+
+    def raise_priority(self):
+        if self.priority is None:
+            return
+        try:
+            os.sched_setscheduler(threading.get_native_id(), os.SCHED_FIFO,
+                                  os.sched_param(self.priority))
+        except (AttributeError, OSError) as e:
+            self.logger.warning('Watchdog running at normal priority: '
+                                '{}'.format(e))
+
+    def run(self):
+        self.raise_priority()
+        period_ns = int(self.period * 1e9)
+        deadline = time.perf_counter_ns()
+        while self.running.is_set():
+            try:
+                self.check()
+            except Exception:
+                self.logger.exception('Watchdog check failed')
+            deadline += period_ns
+            delay = deadline - time.perf_counter_ns()
+            if delay > 0:
+                time.sleep(delay / 1e9)
+            else:
+                deadline = time.perf_counter_ns()
+
+    def summary(self):
+        """Reaction times of the recorded trips.
+
+        Returns:
+        dict: 'trips' (int), and 'mean' and 'max' reaction time in seconds
+        (None without trips).
+
+        """
+        latencies = [latency for reason, latency in self.trips]
+        if not latencies:
+            return {'trips': 0, 'mean': None, 'max': None}
+        return {'trips': len(latencies),
+                'mean': sum(latencies) / len(latencies),
+                'max': max(latencies)}